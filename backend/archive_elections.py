@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Script para archivar en frío elecciones cerradas.
+
+  archive  exporta los votos (en el orden de la cadena de bloques), los
+           bloques y la participación de elecciones cerradas a ficheros por
+           columna con manifiesto y sumas SHA-256, los verifica y elimina las
+           filas de `votos` y `votantes_eleccion`
+  verify   comprueba sumas, cadena de bloques y escrutinio de un archivo
+  tally    recuenta un archivo y lo compara con el resultado firmado
+
+Las columnas de ancho fijo se leen con memoria mapeada y las de texto
+(voto cifrado, firma) se descomprimen página a página (zstd si el paquete
+`zstandard` está instalado, zlib si no).
+"""
+import argparse
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.database.database import SessionLocal
+from src.models.models import ArchivoEleccion, Election
+from src.services.archive import (
+    ARCHIVE_DIR, ElectionArchive, archive_election, get_archive, open_archive, tally_archive, verify_archive
+)
+
+def load_archive(db, target: str) -> ElectionArchive:
+    """An archive given by directory or by election id"""
+    if os.path.isdir(target):
+        return ElectionArchive(target)
+    record = get_archive(db, uuid.UUID(target))
+    if record is None:
+        raise ValueError(f"La elección {target} no está archivada")
+    return open_archive(record)
+
+def archive(args, db) -> None:
+    election_ids = [uuid.UUID(election_id) for election_id in args.elecciones]
+    if args.cerradas_hace_dias is not None:
+        cutoff = datetime.utcnow() - timedelta(days=args.cerradas_hace_dias)
+        election_ids += [
+            election_id for (election_id,) in db.query(Election.id).outerjoin(
+                ArchivoEleccion, ArchivoEleccion.eleccion_id == Election.id
+            ).filter(
+                Election.estado == "CERRADA",
+                Election.fecha_fin < cutoff,
+                (ArchivoEleccion.eleccion_id.is_(None)) | (ArchivoEleccion.filas_activas == True)
+            )
+        ]
+    if not election_ids:
+        print("ℹ️  No hay elecciones para archivar")
+        return
+
+    failed = 0
+    for election_id in election_ids:
+        election = db.query(Election).filter(Election.id == election_id).first()
+        if not election:
+            print(f"❌ {election_id}: elección no encontrada")
+            failed += 1
+            continue
+        try:
+            record = archive_election(db, election, args.dir, keep_hot_rows=args.conservar_filas)
+        except ValueError as e:
+            db.rollback()
+            print(f"❌ {election_id}: {e}")
+            failed += 1
+            continue
+        print(
+            f"✅ {election.titulo}: {record.votos} votos, {record.votantes} votantes, "
+            f"{record.tamano_bytes / 1024 / 1024:.1f} MB en {record.ruta}"
+        )
+    if failed:
+        sys.exit(1)
+
+def verify(args, db) -> None:
+    result = verify_archive(load_archive(db, args.archivo))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if not result["valid"]:
+        sys.exit(1)
+
+def tally(args, db) -> None:
+    result = tally_archive(load_archive(db, args.archivo))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if not result["matches_snapshot"]:
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Archivar en frío elecciones cerradas")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    archive_parser = commands.add_parser("archive", help="Archivar elecciones cerradas")
+    archive_parser.add_argument("elecciones", nargs="*", help="UUIDs de las elecciones")
+    archive_parser.add_argument("--cerradas-hace-dias", type=int, help="Todas las cerradas hace al menos N días")
+    archive_parser.add_argument("--dir", default=ARCHIVE_DIR, help="Directorio de archivos")
+    archive_parser.add_argument("--conservar-filas", action="store_true", help="No eliminar las filas de las tablas activas")
+    archive_parser.set_defaults(handler=archive)
+
+    for name, handler, help_text in (
+        ("verify", verify, "Verificar un archivo"),
+        ("tally", tally, "Recontar un archivo")
+    ):
+        command_parser = commands.add_parser(name, help=help_text)
+        command_parser.add_argument("archivo", help="UUID de la elección o directorio del archivo")
+        command_parser.set_defaults(handler=handler)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        args.handler(args, db)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Benchmark de ingesta de votos: commit directo vs. log con group commit.
+
+Emite votos concurrentes contra POST /api/v1/votos/ en los dos modos de
+BALLOT_INGESTION_MODE y reporta votos/segundo confirmados al votante y, en
+modo log, el tiempo hasta que todos quedan escritos en `votos`. Luego mide
+solo la capa de almacenamiento (un commit por voto vs. append al log), que
+es donde el group commit ahorra fsyncs.
+
+La concurrencia HTTP no debe superar el pool de conexiones de SQLAlchemy
+(5 + 10 por defecto). Los resultados solo son representativos sobre la base
+de datos y el disco de producción.
+
+Uso:
+    python benchmarks/bench_ballot_ingestion.py --voters 2000 --concurrency 100
+    DATABASE_URL=postgresql://... python benchmarks/bench_ballot_ingestion.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_workdir = tempfile.mkdtemp(prefix="urna_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_workdir}/bench.db")
+os.environ.setdefault("UPLOAD_DIRECTORY", os.path.join(_workdir, "uploads"))
+os.environ.setdefault("BALLOT_LOG_DIR", os.path.join(_workdir, "ballot_log"))
+os.environ["ELECTION_SCHEDULER_ENABLED"] = "false"
+
+import httpx
+
+from src.database.database import Base, SessionLocal, engine
+from src.main import app
+from src.models.models import Candidate, Cargo, Election, Tenant, User, VotanteEleccion, Vote
+from src.services import ballot_log
+from src.utils.auth import create_access_token
+from src.utils.ids import ballot_id
+
+def seed(label: str, voters: int):
+    db = SessionLocal()
+    tenant = Tenant(nombre=f"Bench {label}", email_contacto="bench@bench.com", pais="Ecuador")
+    db.add(tenant)
+    db.flush()
+    now = datetime.utcnow()
+    election = Election(
+        tenant_id=tenant.id, titulo=f"Ingesta {label}", estado="ACTIVA",
+        fecha_inicio=now - timedelta(hours=1), fecha_fin=now + timedelta(hours=8),
+        tipo_votacion="MAYORITARIA", anonima=True
+    )
+    db.add(election)
+    db.flush()
+    cargo = Cargo(eleccion_id=election.id, nombre="Presidente", max_candidatos_a_elegir=1)
+    db.add(cargo)
+    db.flush()
+    candidate = Candidate(cargo_id=cargo.id, nombre="Candidato", apellido="Bench", numero_orden=1)
+    db.add(candidate)
+    users = [
+        User(tenant_id=tenant.id, email=f"{label}{i}@bench.com", password_hash="x", rol="VOTANTE", nombre="V", apellido=str(i))
+        for i in range(voters)
+    ]
+    db.add_all(users)
+    db.flush()
+    db.add_all([VotanteEleccion(eleccion_id=election.id, votante_id=user.id, ha_votado=False) for user in users])
+    db.commit()
+    result = (
+        str(election.id),
+        str(candidate.id),
+        [{"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"} for user in users],
+        [str(user.id) for user in users]
+    )
+    db.close()
+    return result
+
+async def cast_all(election_id: str, candidate_id: str, headers: list, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def cast(voter_headers):
+            async with semaphore:
+                response = await client.post(
+                    "/api/v1/votos/",
+                    json={"eleccion_id": election_id, "candidatos_seleccionados": [candidate_id]},
+                    headers=voter_headers
+                )
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(cast(h) for h in headers))
+        return time.perf_counter() - start
+
+def storage_records(election_id: str, voter_ids: list) -> list:
+    return [
+        {
+            "id": str(ballot_id()),
+            "eleccion_id": election_id,
+            "votante_id": voter_id,
+            "voto_cifrado": "ENCRYPTED:" + "x" * 200,
+            "firma_digital": "f" * 64,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        for voter_id in voter_ids
+    ]
+
+def bench_storage(voters: int, concurrency: int):
+    """Per-vote commits vs. group-committed log appends, without the HTTP layer"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    election_id, _, _, voter_ids = seed("storage-direct", voters)
+    records = storage_records(election_id, voter_ids)
+
+    def commit_one(record):
+        db = SessionLocal()
+        try:
+            ballot_log.write_ballots(db, [record])
+        finally:
+            db.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(commit_one, records))
+    direct = time.perf_counter() - start
+
+    election_id, _, _, voter_ids = seed("storage-log", voters)
+    records = storage_records(election_id, voter_ids)
+    log = ballot_log.BallotLog(os.path.join(_workdir, "storage_log"))
+    log.start()
+
+    async def append_all():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def append(record):
+            async with semaphore:
+                await log.append(record)
+        await asyncio.gather(*(append(record) for record in records))
+
+    start = time.perf_counter()
+    asyncio.run(append_all())
+    acknowledged = time.perf_counter() - start
+    log.stop()
+    drained = time.perf_counter() - start
+
+    print("\n💾 Solo almacenamiento")
+    print(f"   commit por voto : {voters / direct:10.1f} votos/s")
+    print(f"   log + group fsync: {voters / acknowledged:10.1f} votos/s confirmados, "
+          f"{voters / drained:10.1f} votos/s escritos en votos")
+
+def count_votes(election_id: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Vote).filter(Vote.eleccion_id == uuid.UUID(election_id)).count()
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ingesta de votos")
+    parser.add_argument("--voters", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    print(f"\n🗳️ {args.voters} votos, concurrencia {args.concurrency} ({engine.dialect.name})")
+
+    election_id, candidate_id, headers, _ = seed("direct", args.voters)
+    elapsed = asyncio.run(cast_all(election_id, candidate_id, headers, args.concurrency))
+    print(f"   direct : {args.voters / elapsed:10.1f} votos/s confirmados  ({count_votes(election_id)} en votos)")
+
+    ballot_log.BALLOT_INGESTION_MODE = "log"
+    ballot_log.start_ballot_log()
+    election_id, candidate_id, headers, _ = seed("log", args.voters)
+    elapsed = asyncio.run(cast_all(election_id, candidate_id, headers, args.concurrency))
+    drain_start = time.perf_counter()
+    ballot_log.stop_ballot_log()
+    drained = time.perf_counter() - drain_start
+    print(f"   log    : {args.voters / elapsed:10.1f} votos/s confirmados  "
+          f"({count_votes(election_id)} en votos tras {drained:.2f}s de vaciado)")
+
+    bench_storage(args.voters, args.concurrency)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark de escrutinio: descifrar cada voto vs. escrutinio homomórfico.
+
+Compara, sobre N votos en memoria, el camino actual (descifrar cada voto con
+Fernet y contar) con el escrutinio ElGamal exponencial (multiplicar los
+cifrados por candidato y descifrar solo los agregados). Los votos se generan
+a partir de un conjunto de cifrados distintos que se repite, porque el coste
+del escrutinio no depende de que sean únicos y cifrar un millón de votos
+ElGamal tomaría minutos. También mide el coste de cifrar un voto con y sin
+las tablas de base fija.
+
+Uso:
+    python benchmarks/bench_homomorphic_tally.py --ballots 100000 1000000 --candidates 4 --workers 8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# encryption.key se crea en el directorio actual
+os.chdir(tempfile.mkdtemp(prefix="urna_bench_"))
+
+from src.utils import elgamal
+from src.utils.crypto import decrypt_vote, encrypt_vote
+from src.utils.parallel import map_chunks
+
+DISTINCT_BALLOTS = 2000
+
+def symmetric_tally(ballots) -> Counter:
+    counts = Counter()
+    for ballot in ballots:
+        counts.update(json.loads(decrypt_vote(ballot)).get("candidatos", []))
+    return counts
+
+def homomorphic_tally(ballots, private, size: int, total: int, workers: int, chunk: int) -> list:
+    parts, _, _ = map_chunks(elgamal.aggregate_serialized, ballots, chunk, workers, size)
+    return elgamal.decrypt_totals(private, elgamal.combine(size, parts), [total] * size)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de escrutinio homomórfico")
+    parser.add_argument("--ballots", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--candidates", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=20000)
+    args = parser.parse_args()
+
+    candidates = [str(uuid.uuid4()) for _ in range(args.candidates)]
+    private, public = elgamal.generate_keys(args.candidates)
+    bases = [elgamal.FixedBase(h) for h in public]
+
+    choices = [random.randrange(args.candidates) for _ in range(DISTINCT_BALLOTS)]
+    start = time.perf_counter()
+    homomorphic = [
+        elgamal.serialize_ciphertext(elgamal.encrypt_choices(bases, [int(i == choice) for i in range(args.candidates)]))
+        for choice in choices
+    ]
+    fixed_base = (time.perf_counter() - start) / DISTINCT_BALLOTS
+    start = time.perf_counter()
+    for _ in range(100):
+        r = elgamal.random_exponent()
+        pow(elgamal.G, r, elgamal.P)
+        [pow(h, r, elgamal.P) for h in public]
+    naive = (time.perf_counter() - start) / 100
+    symmetric = [
+        encrypt_vote(json.dumps({"eleccion_id": str(uuid.uuid4()), "candidatos": [candidates[choice]]}))
+        for choice in choices
+    ]
+
+    print(f"\n🔐 {args.candidates} candidatos, {args.workers} proceso(s)")
+    print(f"   cifrar un voto ElGamal: {fixed_base * 1000:.2f} ms con tablas de base fija, {naive * 1000:.2f} ms con pow()")
+
+    for count in args.ballots:
+        expected = Counter()
+        for i in range(count):
+            expected[choices[i % DISTINCT_BALLOTS]] += 1
+
+        start = time.perf_counter()
+        counts = symmetric_tally(symmetric[i % DISTINCT_BALLOTS] for i in range(count))
+        symmetric_seconds = time.perf_counter() - start
+        assert sorted(counts.values()) == sorted(expected.values())
+
+        start = time.perf_counter()
+        totals = homomorphic_tally(
+            (homomorphic[i % DISTINCT_BALLOTS] for i in range(count)),
+            private, args.candidates, count, args.workers, args.chunk
+        )
+        homomorphic_seconds = time.perf_counter() - start
+        assert totals == [expected[i] for i in range(args.candidates)]
+
+        print(f"   {count:>8} votos: descifrar todo {symmetric_seconds:7.2f}s ({count / symmetric_seconds:9.0f} votos/s) | "
+              f"homomórfico {homomorphic_seconds:7.2f}s ({count / homomorphic_seconds:9.0f} votos/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización JSON y compresión de respuestas.
+
+Compara la ruta por defecto de FastAPI (validación contra response_model +
+json.dumps) con la serialización directa de filas ORM a bytes, y mide el
+tamaño/latencia de los endpoints de listados y reportes con y sin gzip/brotli.
+
+Uso:
+    python benchmarks/bench_responses.py --rows 5000 --repeat 20
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_workdir = tempfile.mkdtemp(prefix="urna_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/bench.db"
+os.environ.setdefault("UPLOAD_DIRECTORY", os.path.join(_workdir, "uploads"))
+
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from src.database.database import Base, SessionLocal, engine
+from src.main import app
+from src.models.models import Election, Tenant, User
+from src.schemas.schemas import Election as ElectionSchema
+from src.utils.auth import create_access_token
+from src.utils.responses import orm_list_response
+
+def seed(rows: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    tenants = [Tenant(nombre=f"Tenant {i}", email_contacto=f"t{i}@bench.com", pais="Ecuador") for i in range(50)]
+    db.add_all(tenants)
+    db.flush()
+    admin = User(email="bench@bench.com", password_hash="x", rol="SUPER_ADMIN", nombre="Bench", apellido="Admin")
+    db.add(admin)
+    now = datetime.utcnow()
+    db.add_all([
+        Election(
+            tenant_id=tenants[i % len(tenants)].id,
+            titulo=f"Elección {i}",
+            descripcion="Elección de referencia para medir la serialización " * 3,
+            fecha_inicio=now + timedelta(days=1),
+            fecha_fin=now + timedelta(days=2),
+            estado="PENDIENTE",
+            tipo_votacion="MAYORITARIA",
+            anonima=True
+        )
+        for i in range(rows)
+    ])
+    db.commit()
+    admin_id = admin.id
+    db.close()
+    return admin_id
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def bench_serialization(rows: int, repeat: int):
+    db = SessionLocal()
+    elections = db.query(Election).limit(rows).all()
+    adapter = TypeAdapter(List[ElectionSchema])
+
+    def fastapi_default():
+        # validate -> dump to Python -> json.dumps, as FastAPI does with response_model
+        validated = adapter.validate_python(elections, from_attributes=True)
+        json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+    def direct():
+        orm_list_response(ElectionSchema, elections)
+
+    print(f"\n📦 Serialización de {len(elections)} elecciones")
+    print(f"   response_model + json.dumps : {timed(fastapi_default, repeat):8.2f} ms")
+    print(f"   orm_list_response           : {timed(direct, repeat):8.2f} ms")
+    db.close()
+
+def bench_endpoints(client: TestClient, headers: dict, rows: int, repeat: int):
+    endpoints = [
+        f"/api/v1/elecciones/?limit={rows}",
+        "/api/v1/reports/super-admin/uso-plataforma",
+        "/api/v1/reports/super-admin/estadisticas-globales",
+    ]
+    print("\n🌐 Endpoints (latencia media / bytes transferidos)")
+    for endpoint in endpoints:
+        print(f"   {endpoint}")
+        for encoding in ("identity", "gzip", "br"):
+            request_headers = {**headers, "Accept-Encoding": encoding}
+            response = client.get(endpoint, headers=request_headers)
+            # httpx decodes transparently, so measure the raw stream length
+            with client.stream("GET", endpoint, headers=request_headers) as raw:
+                size = sum(len(chunk) for chunk in raw.iter_raw())
+            latency = timed(lambda: client.get(endpoint, headers=request_headers), repeat)
+            print(f"      {encoding:8s} {response.status_code}  {latency:8.2f} ms  {size:>10,d} B")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización y compresión")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    admin_id = seed(args.rows)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(admin_id)})}"}
+
+    bench_serialization(args.rows, args.repeat)
+    bench_endpoints(client, headers, args.rows, args.repeat)
+
+if __name__ == "__main__":
+    main()
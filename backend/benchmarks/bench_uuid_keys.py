@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Benchmark de claves primarias UUIDv4 vs. UUIDv7 en tablas de inserción masiva.
+
+Inserta las mismas filas (con la forma de `votos`) en tres tablas temporales,
+con ids v4, v7 y v7 de ventana (los de elecciones anónimas), y reporta para cada una las filas/segundo
+(en total y en el último 10%, cuando el índice ya no cabe en caché) y el
+tamaño de la tabla y de su índice de clave primaria. En PostgreSQL con la
+extensión `pgstattuple` también la densidad y fragmentación de las hojas.
+
+Después comprueba la privacidad del voto en elecciones anónimas:
+  - los ids de ballot_id(anonymous=True) solo guardan el inicio de su ventana
+    de BALLOT_ID_WINDOW_SECONDS, nunca la hora exacta del voto
+  - dentro de cada ventana el orden de los ids no se correlaciona con el
+    orden en que se emitieron los votos
+  - votos emitidos por POST /api/v1/votos/ en una elección anónima (y
+    directos y por log de votos) quedan con ids de ventana y con esa misma
+    hora en `votos.timestamp`; en una elección no anónima, con la hora exacta
+
+Las tablas temporales se eliminan al terminar.
+
+Uso:
+    python benchmarks/bench_uuid_keys.py --filas 10000000
+    DATABASE_URL=postgresql://... python benchmarks/bench_uuid_keys.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_workdir = tempfile.mkdtemp(prefix="urna_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_workdir}/bench.db")
+os.environ.setdefault("UPLOAD_DIRECTORY", os.path.join(_workdir, "uploads"))
+os.environ.setdefault("BALLOT_LOG_DIR", os.path.join(_workdir, "ballot_log"))
+os.environ["ELECTION_SCHEDULER_ENABLED"] = "false"
+
+import httpx
+import numpy as np
+from sqlalchemy import Column, DateTime, MetaData, Table, Text, insert, text
+from sqlalchemy.dialects.postgresql import UUID
+
+from src.database.database import Base, SessionLocal, engine
+from src.main import app
+from src.models.models import Candidate, Cargo, Election, Tenant, User, VotanteEleccion, Vote
+from src.services import ballot_log
+from src.utils.auth import create_access_token
+from src.utils.ids import BALLOT_ID_WINDOW_SECONDS, uuid7, uuid7_time_ms, windowed_uuid7
+from src.utils.timezones import as_utc
+
+GENERATORS = {"v4": uuid.uuid4, "v7": uuid7, "v7w": windowed_uuid7}
+
+def bench_table(kind: str) -> Table:
+    return Table(
+        f"bench_uuid_{kind}", MetaData(),
+        Column("id", UUID(as_uuid=True), primary_key=True),
+        Column("eleccion_id", UUID(as_uuid=True), nullable=False),
+        Column("voto_cifrado", Text, nullable=False),
+        Column("timestamp", DateTime(timezone=True), nullable=False)
+    )
+
+def relation_sizes(conn, table: Table) -> dict:
+    """Bytes of the table and of its primary key index"""
+    if conn.dialect.name == "postgresql":
+        sizes = conn.execute(text(
+            "SELECT pg_relation_size(:table), pg_relation_size(:index)"
+        ), {"table": table.name, "index": f"{table.name}_pkey"}).one()
+        result = {"table_bytes": sizes[0], "index_bytes": sizes[1]}
+        try:
+            with conn.begin_nested():
+                density, fragmentation = conn.execute(text(
+                    "SELECT avg_leaf_density, leaf_fragmentation FROM pgstatindex(:index)"
+                ), {"index": f"{table.name}_pkey"}).one()
+            result.update(leaf_density=density, leaf_fragmentation=fragmentation)
+        except Exception:
+            pass
+        return result
+    try:
+        rows = dict(conn.execute(text(
+            "SELECT name, SUM(pgsize) FROM dbstat WHERE tbl_name = :table GROUP BY name"
+        ), {"table": table.name}).all())
+    except Exception:
+        # SQLite built without the dbstat table
+        return {}
+    index_bytes = sum(size for name, size in rows.items() if name != table.name)
+    return {"table_bytes": rows.get(table.name, 0), "index_bytes": index_bytes}
+
+def bench_inserts(kind: str, rows: int, batch_size: int) -> dict:
+    table = bench_table(kind)
+    generate = GENERATORS[kind]
+    election_id = uuid.uuid4()
+    payload = "ENCRYPTED:" + "x" * 200
+    now = datetime.utcnow()
+    tail_start = rows - rows // 10
+    tail_seconds = 0.0
+
+    table.drop(bind=engine, checkfirst=True)
+    table.create(bind=engine)
+    try:
+        start = time.perf_counter()
+        inserted = 0
+        while inserted < rows:
+            count = min(batch_size, rows - inserted)
+            batch = [
+                {"id": generate(), "eleccion_id": election_id, "voto_cifrado": payload, "timestamp": now}
+                for _ in range(count)
+            ]
+            batch_start = time.perf_counter()
+            with engine.begin() as conn:
+                conn.execute(insert(table), batch)
+            if inserted >= tail_start:
+                tail_seconds += time.perf_counter() - batch_start
+            inserted += count
+        elapsed = time.perf_counter() - start
+
+        with engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text(f"ANALYZE {table.name}"))
+            sizes = relation_sizes(conn, table)
+    finally:
+        table.drop(bind=engine, checkfirst=True)
+
+    return {
+        "rows_per_second": rows / elapsed,
+        "tail_rows_per_second": (rows - tail_start) / tail_seconds if tail_seconds else None,
+        **sizes
+    }
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    ranks_a = np.argsort(np.argsort(a))
+    ranks_b = np.argsort(np.argsort(b))
+    return float(np.corrcoef(ranks_a, ranks_b)[0, 1])
+
+def check_window_privacy(votes: int, hours: int) -> bool:
+    """Ids generated for votes cast at random times over ``hours``"""
+    rng = np.random.default_rng(7)
+    window_ms = BALLOT_ID_WINDOW_SECONDS * 1000
+    start_ms = int(time.time() * 1000) // window_ms * window_ms
+    cast_ms = np.sort(rng.integers(start_ms, start_ms + hours * 3600 * 1000, votes))
+    ids = [windowed_uuid7(unix_ms=int(ms)) for ms in cast_ms]
+    exact_ids = [uuid7(int(ms)) for ms in cast_ms]
+
+    embedded = np.array([uuid7_time_ms(vote_id) for vote_id in ids])
+    windowed = bool(np.all(embedded % window_ms == 0) and np.all(embedded == cast_ms // window_ms * window_ms))
+
+    id_order = np.array([vote_id.int for vote_id in ids], dtype=object)
+    correlations = []
+    for window in np.unique(embedded):
+        members = np.flatnonzero(embedded == window)
+        if len(members) > 2:
+            # Position of each id among its window's ids vs. its cast order
+            id_ranks = np.argsort(np.argsort(id_order[members]))
+            correlations.append(spearman(id_ranks, members))
+    worst = max(abs(c) for c in correlations) if correlations else 0.0
+    exact_order = spearman(
+        np.argsort(np.argsort(np.array([vote_id.int for vote_id in exact_ids], dtype=object))), np.arange(votes)
+    )
+
+    # |rho| of independent orders shrinks like 1/sqrt(n)
+    per_window = votes / max(len(correlations), 1)
+    threshold = 4 / np.sqrt(per_window)
+    unordered = worst < threshold
+    print("\n🔒 Privacidad de ids en elecciones anónimas (simulado)")
+    print(f"   {votes} votos en {hours} h, ventana de {BALLOT_ID_WINDOW_SECONDS} s")
+    print(f"   {'✅' if windowed else '❌'} los ids solo contienen el inicio de su ventana")
+    print(f"   {'✅' if unordered else '❌'} orden de ids vs. orden de emisión dentro de cada ventana: "
+          f"|rho| máx. {worst:.3f} (umbral {threshold:.3f}; con v7 exacto rho = {exact_order:.3f})")
+    return windowed and unordered
+
+def seed(label: str, anonymous: bool, voters: int):
+    db = SessionLocal()
+    tenant = Tenant(nombre=f"Bench {label}", email_contacto="bench@bench.com", pais="Ecuador")
+    db.add(tenant)
+    db.flush()
+    now = datetime.utcnow()
+    election = Election(
+        tenant_id=tenant.id, titulo=f"Ids {label}", estado="ACTIVA",
+        fecha_inicio=now - timedelta(hours=1), fecha_fin=now + timedelta(hours=8),
+        tipo_votacion="MAYORITARIA", anonima=anonymous
+    )
+    db.add(election)
+    db.flush()
+    cargo = Cargo(eleccion_id=election.id, nombre="Presidente", max_candidatos_a_elegir=1)
+    db.add(cargo)
+    db.flush()
+    candidate = Candidate(cargo_id=cargo.id, nombre="Candidato", apellido="Bench", numero_orden=1)
+    db.add(candidate)
+    users = [
+        User(tenant_id=tenant.id, email=f"{label}{i}@bench.com", password_hash="x", rol="VOTANTE", nombre="V", apellido=str(i))
+        for i in range(voters)
+    ]
+    db.add_all(users)
+    db.flush()
+    db.add_all([VotanteEleccion(eleccion_id=election.id, votante_id=user.id, ha_votado=False) for user in users])
+    db.commit()
+    result = (
+        election.id,
+        str(candidate.id),
+        [{"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"} for user in users]
+    )
+    db.close()
+    return result
+
+async def cast_all(election_id: uuid.UUID, candidate_id: str, headers: list) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for voter_headers in headers:
+            response = await client.post(
+                "/api/v1/votos/",
+                json={"eleccion_id": str(election_id), "candidatos_seleccionados": [candidate_id]},
+                headers=voter_headers
+            )
+            assert response.status_code == 200, response.text
+
+def stored_times(election_id: uuid.UUID) -> list:
+    """(time in the id, stored timestamp) of each vote, in Unix milliseconds"""
+    db = SessionLocal()
+    try:
+        return [
+            (uuid7_time_ms(vote_id), int(as_utc(timestamp).timestamp() * 1000))
+            for vote_id, timestamp in db.query(Vote.id, Vote.timestamp).filter(Vote.eleccion_id == election_id)
+        ]
+    finally:
+        db.close()
+
+def check_cast_votes(voters: int) -> bool:
+    """Ids of votes cast through the API, in both ingestion modes"""
+    window_ms = BALLOT_ID_WINDOW_SECONDS * 1000
+    ok = True
+    print("\n🗳️ Ids de votos emitidos por la API")
+    for mode in ("direct", "log"):
+        if mode == "log":
+            ballot_log.BALLOT_INGESTION_MODE = "log"
+            ballot_log.start_ballot_log()
+        for anonymous in (True, False):
+            election_id, candidate_id, headers = seed(f"{mode}-{anonymous}", anonymous, voters)
+            before_ms = int(time.time() * 1000)
+            asyncio.run(cast_all(election_id, candidate_id, headers))
+            after_ms = int(time.time() * 1000)
+            if mode == "log":
+                ballot_log.stop_ballot_log()
+                ballot_log.start_ballot_log()
+            times = stored_times(election_id)
+            stored_as_id = all(id_ms == stored_ms for id_ms, stored_ms in times)
+            if anonymous:
+                passed = stored_as_id and len(times) == voters and all(ms % window_ms == 0 and ms <= after_ms for ms, _ in times)
+                detail = "solo el inicio de la ventana (id y timestamp)"
+            else:
+                passed = stored_as_id and len(times) == voters and all(before_ms <= ms <= after_ms for ms, _ in times)
+                detail = "hora exacta de inserción"
+            ok = ok and passed
+            label = "anónima   " if anonymous else "no anónima"
+            print(f"   {'✅' if passed else '❌'} {mode:6} elección {label}: {len(times)} votos, {detail}")
+        if mode == "log":
+            ballot_log.stop_ballot_log()
+            ballot_log.BALLOT_INGESTION_MODE = "direct"
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de claves primarias UUIDv4 vs. UUIDv7")
+    parser.add_argument("--filas", type=int, default=10_000_000)
+    parser.add_argument("--lote", type=int, default=10_000)
+    parser.add_argument("--votos-privacidad", type=int, default=100_000)
+    parser.add_argument("--votantes", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    print(f"\n🔑 {args.filas} filas por tabla, lotes de {args.lote} ({engine.dialect.name})")
+    results = {}
+    for kind in GENERATORS:
+        results[kind] = result = bench_inserts(kind, args.filas, args.lote)
+        line = f"   {kind}: {result['rows_per_second']:10.1f} filas/s"
+        if result["tail_rows_per_second"]:
+            line += f", último 10%: {result['tail_rows_per_second']:10.1f} filas/s"
+        if result.get("index_bytes"):
+            line += f", tabla {result['table_bytes'] / 1024 / 1024:.1f} MB, índice PK {result['index_bytes'] / 1024 / 1024:.1f} MB"
+        if "leaf_density" in result:
+            line += f", densidad de hojas {result['leaf_density']:.1f}%, fragmentación {result['leaf_fragmentation']:.1f}%"
+        print(line)
+    for kind in ("v7", "v7w"):
+        if results["v4"].get("index_bytes") and results[kind].get("index_bytes"):
+            print(f"   índice {kind} / v4: {results[kind]['index_bytes'] / results['v4']['index_bytes']:.2f}x, "
+                  f"inserción {kind} / v4: {results[kind]['rows_per_second'] / results['v4']['rows_per_second']:.2f}x")
+
+    private = check_window_privacy(args.votos_privacidad, 24)
+    private = check_cast_votes(args.votantes) and private
+    if not private:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark del escrutinio vectorizado (NumPy) frente al conteo con Counter.
+
+Genera N votos sintéticos ya descifrados (listas de ids de candidatos y peso
+del votante) y mide:
+
+  * conteo en Python puro con Counter (votos y votos ponderados),
+  * conversión a arrays de índices + bincount (`tally_ballots`),
+  * solo la parte vectorizada sobre arrays ya construidos,
+  * sumas por lista y reparto de escaños D'Hondt / resto mayor.
+
+El descifrado de los votos no se incluye: es el mismo en ambos caminos.
+
+Uso:
+    python benchmarks/bench_vectorized_tally.py --ballots 1000000 5000000 --candidates 12 --listas 5
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.tally import (
+    CandidateIndex, apportion, candidate_totals, cargo_lista_sums, group_sums, tally_ballots, DHONDT, RESTO_MAYOR
+)
+
+def python_tally(ballots):
+    votes = Counter()
+    weighted = Counter()
+    for candidates, weight in ballots:
+        for candidate_id in candidates:
+            votes[candidate_id] += 1
+            weighted[candidate_id] += weight
+    return votes, weighted
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de escrutinio vectorizado")
+    parser.add_argument("--ballots", type=int, nargs="+", default=[1000000, 5000000])
+    parser.add_argument("--candidates", type=int, default=12)
+    parser.add_argument("--listas", type=int, default=5)
+    parser.add_argument("--seats", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    candidate_ids = [str(uuid.uuid4()) for _ in range(args.candidates)]
+    cargo_id = str(uuid.uuid4())
+    lista_ids = [str(uuid.uuid4()) for _ in range(args.listas)]
+    index = CandidateIndex(candidate_ids, [cargo_id] * args.candidates, [lista_ids[i % args.listas] for i in range(args.candidates)])
+    popularity = rng.dirichlet(np.ones(args.candidates))
+
+    print(f"\n🧮 {args.candidates} candidatos, {args.listas} listas, {args.seats} escaños")
+    for count in args.ballots:
+        choices = rng.choice(args.candidates, size=count, p=popularity)
+        weights = rng.integers(1, 4, size=count)
+        ballots = [([candidate_ids[c]], int(w)) for c, w in zip(choices.tolist(), weights.tolist())]
+
+        start = time.perf_counter()
+        expected_votes, expected_weighted = python_tally(ballots)
+        python_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        votes, weighted = tally_ballots(ballots, index)
+        stream_seconds = time.perf_counter() - start
+        assert [expected_votes[c] for c in candidate_ids] == votes.tolist()
+        assert [expected_weighted[c] for c in candidate_ids] == weighted.tolist()
+
+        start = time.perf_counter()
+        candidate_totals(choices, weights, args.candidates)
+        vector_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        group_sums(weighted, index.lista_of, args.listas)
+        per_lista = cargo_lista_sums(weighted, index)[0]
+        dhondt_seats = apportion(per_lista, args.seats, DHONDT)
+        remainder_seats = apportion(per_lista, args.seats, RESTO_MAYOR)
+        apportion_seconds = time.perf_counter() - start
+
+        print(f"   {count:>9} votos: Counter {python_seconds:6.2f}s | tally_ballots {stream_seconds:6.2f}s | "
+              f"bincount sobre arrays {vector_seconds * 1000:7.1f} ms | listas + escaños {apportion_seconds * 1000:5.2f} ms")
+        print(f"             D'Hondt {dhondt_seats.tolist()}  resto mayor {remainder_seats.tolist()}")
+
+if __name__ == "__main__":
+    main()
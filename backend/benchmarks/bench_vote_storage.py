@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Benchmark del almacenamiento por voto: esquema anterior vs. compactado.
+
+Crea `votos` y `votos_simulacro` con el esquema anterior a
+compact_ballot_schema.py (hexadecimal y base64 en texto, índice único
+redundante en la clave primaria de votos_simulacro) y con el de models.py,
+inserta los mismos votos reales (cifrados y firmados) en ambos y reporta:
+
+  - bytes por voto de la tabla y de sus índices
+  - votos/segundo insertando por lotes y con un commit por voto (el camino
+    de POST /api/v1/votos/ en modo directo)
+  - en PostgreSQL, bytes de WAL por voto
+
+Con SQLite cada tabla de cada esquema va en su propio fichero, cuyo tamaño es
+la medida;
+con PostgreSQL (DATABASE_URL) se usan tablas temporales que se eliminan al
+terminar. Los votos HOMOMORFICO se generan a partir de un conjunto de
+cifrados distintos que se repite: el tamaño no depende de que sean únicos.
+
+Uso:
+    python benchmarks/bench_vote_storage.py --votos 100000 --cifrado SIMETRICO
+    DATABASE_URL=postgresql://... python benchmarks/bench_vote_storage.py --cifrado HOMOMORFICO
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# encryption.key y ballot_signing.key se crean en el directorio actual
+_workdir = tempfile.mkdtemp(prefix="urna_bench_")
+os.chdir(_workdir)
+
+from sqlalchemy import Column, Index, MetaData, PrimaryKeyConstraint, Table, UniqueConstraint, create_engine, insert, text
+
+from compact_ballot_schema import LEGACY_COLUMN_TYPES
+from src.database.database import DATABASE_URL
+from src.models.models import Vote, VotoSimulacro
+from src.utils import elgamal
+from src.utils.crypto import create_vote_signature, encrypt_votes
+from src.utils.ids import ballot_id, uuid7
+
+SCHEMAS = ("antes", "despues")
+DISTINCT_HOMOMORPHIC = 200
+
+def bench_tables(metadata: MetaData, schema: str) -> dict:
+    """votos and votos_simulacro as they were (antes) or are now (despues)"""
+    tables = {}
+    for model in (Vote, VotoSimulacro):
+        source = model.__table__
+        name = f"bench_{source.name}_{schema}"
+        columns = [
+            Column(column.name, LEGACY_COLUMN_TYPES.get((source.name, column.name), column.type) if schema == "antes" else column.type)
+            for column in source.columns
+        ]
+        constraints = [PrimaryKeyConstraint(*[column.name for column in source.primary_key.columns])]
+        if schema == "antes" and source is VotoSimulacro.__table__:
+            # unique=True next to primary_key=True
+            constraints.append(UniqueConstraint("id"))
+        indexes = [Index(f"ix_{name}_{column.name}", column.name) for column in source.columns if column.index]
+        tables[source.name] = Table(name, metadata, *columns, *constraints, *indexes)
+    return tables
+
+def ballot_texts(count: int, method: str) -> list:
+    if method == "SIMETRICO":
+        contents = [
+            json.dumps({
+                "eleccion_id": str(uuid.uuid4()),
+                "candidatos": [str(uuid.uuid4())],
+                "timestamp": datetime.utcnow().isoformat(),
+                "votante_hash": uuid.uuid4().hex[:16],
+                "peso": 1
+            })
+            for _ in range(count)
+        ]
+        return encrypt_votes(contents)
+    _, public = elgamal.generate_keys(4)
+    bases = [elgamal.FixedBase(base) for base in public]
+    distinct = [
+        elgamal.serialize_ciphertext(elgamal.encrypt_choices(bases, [1 if j == i % 4 else 0 for j in range(4)]))
+        for i in range(min(count, DISTINCT_HOMOMORPHIC))
+    ]
+    return [distinct[i % len(distinct)] for i in range(count)]
+
+def vote_rows(count: int, method: str) -> tuple:
+    """Rows for votos and votos_simulacro"""
+    election_id = uuid.uuid4()
+    now = datetime.utcnow()
+    ballots = ballot_texts(count, method)
+    votes, simulation = [], []
+    block_hash = hashlib.sha256(b"genesis").hexdigest()
+    for i, ballot in enumerate(ballots):
+        voter_id = uuid.uuid4()
+        if i % 500 == 0:
+            block_hash = hashlib.sha256(block_hash.encode()).hexdigest()
+        votes.append({
+            "id": ballot_id(), "eleccion_id": election_id, "votante_id": voter_id, "voto_cifrado": ballot,
+            "firma_digital": create_vote_signature(ballot, str(voter_id)), "timestamp": now,
+            "hash_bloque": block_hash, "bloque_id": None
+        })
+        simulation.append({
+            "id": uuid7(), "simulacro_id": election_id, "votante_prueba": f"sintetico-{i}",
+            "voto_cifrado": ballot, "timestamp": now
+        })
+    return votes, simulation
+
+def schema_engine(schema: str):
+    if DATABASE_URL.startswith("sqlite"):
+        path = os.path.join(_workdir, f"{schema}.db")
+        return create_engine(f"sqlite:///{path}"), path
+    return create_engine(DATABASE_URL), None
+
+def relation_bytes(engine, table: Table, path) -> dict:
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(f"ANALYZE {table.name}"))
+            table_bytes, index_bytes = conn.execute(text(
+                "SELECT pg_table_size(:table), pg_indexes_size(:table)"
+            ), {"table": table.name}).one()
+            return {"table": table_bytes, "indexes": index_bytes}
+        try:
+            rows = dict(conn.execute(text(
+                "SELECT name, SUM(pgsize) FROM dbstat WHERE tbl_name = :table GROUP BY name"
+            ), {"table": table.name}).all())
+            return {"table": rows.pop(table.name, 0), "indexes": sum(rows.values())}
+        except Exception:
+            # SQLite built without dbstat: the whole file (one table per file)
+            return {"table": None, "total": os.path.getsize(path)}
+
+def wal_position(conn):
+    return conn.execute(text("SELECT pg_current_wal_lsn()")).scalar()
+
+def measure(engine, table: Table, rows: list, batch_size: int, commits: int, path) -> dict:
+    table.create(bind=engine)
+    result = {}
+    with engine.connect() as conn:
+        postgres = conn.dialect.name == "postgresql"
+        if postgres:
+            wal_start = wal_position(conn)
+            conn.commit()
+        start = time.perf_counter()
+        for i in range(0, len(rows), batch_size):
+            conn.execute(insert(table), rows[i:i + batch_size])
+            conn.commit()
+        result["batch_rows_per_second"] = len(rows) / (time.perf_counter() - start)
+        if postgres:
+            result["wal_bytes"] = conn.execute(
+                text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), :start)"), {"start": wal_start}
+            ).scalar()
+            conn.commit()
+
+    sizes = relation_bytes(engine, table, path)
+
+    # One transaction per vote, on fresh keys
+    single = [{**row, "id": uuid7() if "simulacro_id" in row else ballot_id()} for row in rows[:commits]]
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for row in single:
+            conn.execute(insert(table), row)
+            conn.commit()
+        result["commits_per_second"] = len(single) / (time.perf_counter() - start) if single else None
+    return {**result, **sizes}
+
+def report(label: str, votes: int, results: dict) -> None:
+    print(f"\n📦 {label}")
+    for schema in SCHEMAS:
+        result = results[schema]
+        if result.get("table") is not None:
+            sizes = (f"tabla {result['table'] / votes:7.1f} B/voto, índices {result['indexes'] / votes:6.1f} B/voto, "
+                     f"total {(result['table'] + result['indexes']) / votes:7.1f} B/voto")
+        else:
+            sizes = f"fichero {result['total'] / votes:7.1f} B/voto"
+        line = (f"   {schema:8}: {sizes}, {result['batch_rows_per_second']:9.1f} votos/s por lotes, "
+                f"{result['commits_per_second'] or 0:8.1f} votos/s con commit por voto")
+        if "wal_bytes" in result:
+            line += f", WAL {result['wal_bytes'] / votes:7.1f} B/voto"
+        print(line)
+
+    def total(result):
+        return result["total"] if result.get("table") is None else result["table"] + result["indexes"]
+    before, after = results["antes"], results["despues"]
+    print(f"   después / antes: tamaño {total(after) / total(before):.2f}x, "
+          f"inserción por lotes {after['batch_rows_per_second'] / before['batch_rows_per_second']:.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del almacenamiento por voto")
+    parser.add_argument("--votos", type=int, default=100_000)
+    parser.add_argument("--lote", type=int, default=1000)
+    parser.add_argument("--commits", type=int, default=2000, help="Votos insertados con un commit cada uno")
+    parser.add_argument("--cifrado", choices=["SIMETRICO", "HOMOMORFICO"], default="SIMETRICO")
+    args = parser.parse_args()
+
+    print(f"\n🗳️ Generando {args.votos} votos {args.cifrado} cifrados y firmados...")
+    votes, simulation = vote_rows(args.votos, args.cifrado)
+
+    results = {"votos": {}, "votos_simulacro": {}}
+    for schema in SCHEMAS:
+        engine, path = schema_engine(schema)
+        metadata = MetaData()
+        tables = bench_tables(metadata, schema)
+        try:
+            for name, rows in (("votos", votes), ("votos_simulacro", simulation)):
+                if path:
+                    # One table per file, so the file size is the table's
+                    engine.dispose()
+                    if os.path.exists(path):
+                        os.remove(path)
+                results[name][schema] = measure(engine, tables[name], rows, args.lote, args.commits, path)
+        finally:
+            if not path:
+                metadata.drop_all(bind=engine)
+            engine.dispose()
+
+    print(f"   ({engine.dialect.name})")
+    for name in results:
+        report(name, args.votos, results[name])
+
+if __name__ == "__main__":
+    main()
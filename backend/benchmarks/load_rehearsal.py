@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Ensayo general de una elección: carga de extremo a extremo contra un servidor.
+
+Provisiona directamente en la base de datos (como init_db.py) un tenant y una
+elección de ensayo con N votantes virtuales, la activa con el administrador
+del tenant a través de la API y luego, contra un servidor levantado
+localmente (uvicorn en un subproceso) o uno ya en marcha (--url, que debe
+usar la misma DATABASE_URL):
+
+  * cada votante inicia sesión, descarga la boleta y vota por el camino real
+    POST /api/v1/votos/ según una curva de llegadas (pico de apertura de
+    urnas seguido de llegadas uniformes, o solo uniformes),
+  * en paralelo, varios administradores consultan los paneles de métricas.
+
+Reporta por endpoint: solicitudes, tasa de error, throughput, percentiles e
+histograma de latencias. Con --json guarda el reporte completo.
+
+Con más conexiones (--connections) que el pool de SQLAlchemy del servidor
+(5 + 10 por defecto), los endpoints async que consultan la base de datos de
+forma síncrona pueden bloquear el event loop esperando una conexión: es uno
+de los cuellos de botella que el ensayo debe poner en evidencia.
+
+Todos los votantes comparten contraseña para no pagar un hash bcrypt por
+votante al provisionar; el servidor sí verifica bcrypt en cada login.
+
+Uso:
+    python benchmarks/load_rehearsal.py --voters 1000 --duration 60 --spike-fraction 0.6 --spike-seconds 5
+    DATABASE_URL=postgresql://... python benchmarks/load_rehearsal.py --server-workers 4
+    DATABASE_URL=postgresql://... python benchmarks/load_rehearsal.py --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_workdir = tempfile.mkdtemp(prefix="urna_ensayo_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_workdir}/ensayo.db")
+os.environ.setdefault("UPLOAD_DIRECTORY", os.path.join(_workdir, "uploads"))
+os.environ.setdefault("BALLOT_LOG_DIR", os.path.join(_workdir, "ballot_log"))
+# encryption.key y la clave de firma se crean en el directorio actual
+_invocation_dir = os.getcwd()
+os.chdir(_workdir)
+
+import httpx
+
+from src.database.database import Base, SessionLocal, engine
+from src.models.models import Candidate, Cargo, Election, Tenant, User, VotanteEleccion, Vote
+from src.utils.auth import get_password_hash
+
+API = "/api/v1"
+PASSWORD = "ensayo123"
+
+# Límites superiores (en segundos) de los intervalos del histograma
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.errors = 0
+
+    def record(self, seconds: float, status: str, ok: bool):
+        self.latencies.append(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def percentile(self, fraction: float) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def histogram(self) -> List[int]:
+        counts = [0] * (len(BUCKETS) + 1)
+        for seconds in self.latencies:
+            counts[next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))] += 1
+        return counts
+
+    def report(self, elapsed: float) -> dict:
+        total = len(self.latencies)
+        return {
+            "requests": total,
+            "errors": self.errors,
+            "error_rate": round(self.errors / total, 4) if total else 0,
+            "throughput": round(total / elapsed, 1) if elapsed > 0 else 0,
+            "p50_ms": round(self.percentile(0.5) * 1000, 1) if total else None,
+            "p90_ms": round(self.percentile(0.9) * 1000, 1) if total else None,
+            "p99_ms": round(self.percentile(0.99) * 1000, 1) if total else None,
+            "max_ms": round(max(self.latencies) * 1000, 1) if total else None,
+            "statuses": self.statuses,
+            "histogram": self.histogram()
+        }
+
+class Recorder:
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointStats] = {}
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """Send a request and record its latency under ``name``; connection
+        failures count as errors and return None"""
+        stats = self.endpoints.setdefault(name, EndpointStats())
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            stats.record(time.perf_counter() - start, type(e).__name__, False)
+            return None
+        stats.record(time.perf_counter() - start, str(response.status_code), response.status_code < 400)
+        return response
+
+def provision(voters: int, candidates: int, duration: float) -> dict:
+    """Shadow tenant, admin, PENDIENTE election and registered voters"""
+    db = SessionLocal()
+    label = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    password_hash = get_password_hash(PASSWORD)
+    tenant = Tenant(nombre=f"Ensayo {label}", email_contacto=f"ensayo{label}@ensayo.com", pais="Ecuador")
+    db.add(tenant)
+    db.flush()
+    admin = User(
+        tenant_id=tenant.id, email=f"admin{label}@ensayo.com", password_hash=password_hash,
+        rol="TENANT_ADMIN", nombre="Admin", apellido="Ensayo"
+    )
+    # Inicio lejano para que el planificador no la abra: la apertura de urnas
+    # es la activación manual del ensayo
+    opening = datetime.utcnow() + timedelta(days=1)
+    election = Election(
+        tenant_id=tenant.id, titulo=f"[ENSAYO] {label}", estado="PENDIENTE",
+        fecha_inicio=opening, fecha_fin=opening + timedelta(seconds=duration, hours=1),
+        tipo_votacion="MAYORITARIA", anonima=True
+    )
+    db.add_all([admin, election])
+    db.flush()
+    cargo = Cargo(eleccion_id=election.id, nombre="Presidente", max_candidatos_a_elegir=1)
+    db.add(cargo)
+    db.flush()
+    db.add_all([
+        Candidate(cargo_id=cargo.id, nombre=f"Candidato {i + 1}", apellido="Ensayo", numero_orden=i + 1)
+        for i in range(candidates)
+    ])
+    users = [
+        User(
+            tenant_id=tenant.id, email=f"v{i}.{label}@ensayo.com", password_hash=password_hash,
+            rol="VOTANTE", nombre="Votante", apellido=str(i)
+        )
+        for i in range(voters)
+    ]
+    db.add_all(users)
+    db.flush()
+    db.add_all([VotanteEleccion(eleccion_id=election.id, votante_id=user.id, ha_votado=False) for user in users])
+    db.commit()
+    result = {
+        "tenant_id": str(tenant.id),
+        "election_id": str(election.id),
+        "admin_email": admin.email,
+        "voter_emails": [user.email for user in users]
+    }
+    db.close()
+    return result
+
+def arrival_times(voters: int, duration: float, curve: str, spike_fraction: float, spike_seconds: float, rng: random.Random) -> List[float]:
+    """Seconds after poll opening at which each voter arrives"""
+    if curve == "uniform":
+        return sorted(rng.uniform(0, duration) for _ in range(voters))
+    spike = round(voters * spike_fraction)
+    times = [rng.uniform(0, spike_seconds) for _ in range(spike)]
+    times += [rng.uniform(spike_seconds, max(duration, spike_seconds)) for _ in range(voters - spike)]
+    return sorted(times)
+
+async def login(client: httpx.AsyncClient, recorder: Recorder, email: str) -> Optional[dict]:
+    response = await recorder.request(client, "POST /auth/login", "POST", f"{API}/auth/login", json={"email": email, "password": PASSWORD})
+    if response is None or response.status_code != 200:
+        return None
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def voter(client: httpx.AsyncClient, recorder: Recorder, email: str, election_id: str, delay: float, rng: random.Random) -> bool:
+    await asyncio.sleep(delay)
+    headers = await login(client, recorder, email)
+    if headers is None:
+        return False
+    response = await recorder.request(client, "GET /elecciones/{id}/boleta", "GET", f"{API}/elecciones/{election_id}/boleta", headers=headers)
+    if response is None or response.status_code != 200:
+        return False
+    selection = [
+        rng.choice(cargo["candidatos"])["id"]
+        for cargo in response.json()["cargos"] if cargo["candidatos"]
+    ]
+    response = await recorder.request(
+        client, "POST /votos/", "POST", f"{API}/votos/",
+        json={"eleccion_id": election_id, "candidatos_seleccionados": selection},
+        headers={**headers, "Idempotency-Key": str(uuid.uuid4())}
+    )
+    return response is not None and response.status_code == 200
+
+async def dashboard(client: httpx.AsyncClient, recorder: Recorder, headers: dict, ids: dict, interval: float, done: asyncio.Event):
+    endpoints = [
+        ("GET /metricas/eleccion/{id}/tiempo-real", f"{API}/metricas/eleccion/{ids['election_id']}/tiempo-real"),
+        ("GET /votos/eleccion/{id}/participacion", f"{API}/votos/eleccion/{ids['election_id']}/participacion"),
+        ("GET /metricas/tenant/{id}/resumen", f"{API}/metricas/tenant/{ids['tenant_id']}/resumen")
+    ]
+    while not done.is_set():
+        for name, url in endpoints:
+            await recorder.request(client, name, "GET", url, headers=headers)
+        try:
+            await asyncio.wait_for(done.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+async def rehearse(base_url: str, ids: dict, args) -> dict:
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        admin = await login(client, recorder, ids["admin_email"])
+        if admin is None:
+            raise SystemExit("❌ El administrador de ensayo no pudo iniciar sesión")
+        response = await client.post(f"{API}/elecciones/{ids['election_id']}/activate", headers=admin)
+        if response.status_code != 200:
+            raise SystemExit(f"❌ No se pudo activar la elección: {response.status_code} {response.text}")
+        # El login del administrador no forma parte de la carga medida
+        recorder.endpoints.clear()
+
+        arrivals = arrival_times(
+            len(ids["voter_emails"]), args.duration, args.curve, args.spike_fraction, args.spike_seconds, rng
+        )
+        done = asyncio.Event()
+        start = time.perf_counter()
+        pollers = [
+            asyncio.create_task(dashboard(client, recorder, admin, ids, args.poll_interval, done))
+            for _ in range(args.pollers)
+        ]
+        outcomes = await asyncio.gather(*(
+            voter(client, recorder, email, ids["election_id"], delay, random.Random(rng.random()))
+            for email, delay in zip(ids["voter_emails"], arrivals)
+        ))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*pollers)
+
+    return {
+        "voters": len(outcomes),
+        "successful_votes": sum(outcomes),
+        "elapsed_seconds": round(elapsed, 2),
+        "votes_per_second": round(sum(outcomes) / elapsed, 1) if elapsed > 0 else 0,
+        "endpoints": {name: stats.report(elapsed) for name, stats in recorder.endpoints.items()}
+    }
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=_workdir, env=env
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("❌ El servidor terminó al arrancar")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("❌ El servidor no respondió a /health")
+
+def print_report(report: dict):
+    print(f"\n🗳️ {report['successful_votes']}/{report['voters']} votos en {report['elapsed_seconds']}s "
+          f"({report['votes_per_second']} votos/s)")
+    labels = [f"≤{int(b * 1000)}ms" if b < 1 else f"≤{b:g}s" for b in BUCKETS] + [f">{BUCKETS[-1]:g}s"]
+    for name, stats in report["endpoints"].items():
+        print(f"\n   {name}")
+        print(f"     {stats['requests']} solicitudes, {stats['throughput']}/s, errores {stats['error_rate'] * 100:.2f}% {stats['statuses']}")
+        print(f"     p50 {stats['p50_ms']} ms | p90 {stats['p90_ms']} ms | p99 {stats['p99_ms']} ms | máx {stats['max_ms']} ms")
+        peak = max(stats["histogram"]) or 1
+        for label, count in zip(labels, stats["histogram"]):
+            if count:
+                print(f"     {label:>8} {'█' * max(1, round(40 * count / peak))} {count}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Ensayo general de carga de una elección")
+    parser.add_argument("--voters", type=int, default=500)
+    parser.add_argument("--candidates", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=60, help="segundos en los que llegan todos los votantes")
+    parser.add_argument("--curve", choices=["spike", "uniform"], default="spike")
+    parser.add_argument("--spike-fraction", type=float, default=0.5, help="fracción de votantes en el pico de apertura")
+    parser.add_argument("--spike-seconds", type=float, default=5)
+    parser.add_argument("--pollers", type=int, default=3, help="administradores consultando métricas")
+    parser.add_argument("--poll-interval", type=float, default=2)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--url", default=None, help="servidor ya en marcha (misma DATABASE_URL)")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--json", default=None, help="archivo donde guardar el reporte")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    ids = provision(args.voters, args.candidates, args.duration)
+    print(f"🧪 Elección de ensayo {ids['election_id']} con {args.voters} votantes ({engine.dialect.name})")
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        server = start_server(port, args.server_workers)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        report = asyncio.run(rehearse(base_url, ids, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    db = SessionLocal()
+    report["votes_stored"] = db.query(Vote).filter(Vote.eleccion_id == uuid.UUID(ids["election_id"])).count()
+    db.close()
+    report["election_id"] = ids["election_id"]
+    print_report(report)
+    print(f"\n   {report['votes_stored']} votos en la tabla votos")
+    if args.json:
+        with open(os.path.join(_invocation_dir, args.json), "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Script para compactar el esquema de votos de una base existente (SQLite y
+PostgreSQL) al de models.py.
+
+  - elimina el índice único redundante que `unique=True` creaba junto a la
+    clave primaria de cada tabla
+  - guarda firma_digital, hash_bloque (votos) y hash (nodos_merkle) como
+    binario de ancho fijo en lugar de hexadecimal
+  - guarda voto_cifrado (votos y votos_simulacro) empaquetado: el token
+    Fernet sin sus dos capas de base64 y los cifrados ElGamal como elementos
+    de ancho fijo (ver src/database/types.py)
+
+Los valores leídos siguen siendo los mismos textos, así que recibos, bloques
+y árboles de Merkle no cambian.
+
+  status   muestra qué queda por migrar
+  migrate  aplica la migración
+
+En PostgreSQL los índices se eliminan con ALTER TABLE (las claves foráneas
+que dependían de ellos se vuelven a crear sobre la clave primaria) y las
+columnas cambian de tipo en sitio; voto_cifrado se convierte por lotes en
+una columna nueva. SQLite no permite eliminar esos índices ni cambiar tipos,
+así que cada tabla afectada se reconstruye. En ambos casos se reescriben
+`votos` y `votos_simulacro`: ejecutarlo en una ventana de mantenimiento,
+sin votaciones activas.
+
+Uso:
+    python compact_ballot_schema.py status
+    python compact_ballot_schema.py migrate --lote 5000
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from sqlalchemy import (
+    Column, LargeBinary, MetaData, String, Table, Text, bindparam, inspect, insert, select, text, tuple_, update
+)
+from sqlalchemy.schema import CreateTable
+
+from src.database.database import engine
+from src.database.types import HexDigest, PackedCiphertext, pack_ciphertext
+from src.models.models import Base
+
+# Column types before this migration, to read the legacy rows with
+LEGACY_COLUMN_TYPES = {
+    ("votos", "voto_cifrado"): Text(),
+    ("votos", "firma_digital"): Text(),
+    ("votos", "hash_bloque"): String(255),
+    ("votos_simulacro", "voto_cifrado"): Text(),
+    ("nodos_merkle", "hash"): String(64)
+}
+
+def redundant_unique_constraints(inspector, table: Table) -> list:
+    """Unique constraints on exactly the primary key columns"""
+    primary_key = {column.name for column in table.primary_key.columns}
+    return [
+        constraint for constraint in inspector.get_unique_constraints(table.name)
+        if set(constraint["column_names"]) == primary_key
+    ]
+
+def pending_columns(inspector, table: Table) -> list:
+    """Columns still stored as text that the models store as binary"""
+    existing = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+    return [
+        column.name for column in table.columns
+        if isinstance(column.type, (HexDigest, PackedCiphertext))
+        and column.name in existing
+        and not isinstance(existing[column.name], column.type.impl.__class__)
+    ]
+
+def migration_plan(conn) -> list:
+    """(table, redundant unique constraints, columns to convert) per table"""
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    plan = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        constraints = redundant_unique_constraints(inspector, table)
+        columns = pending_columns(inspector, table)
+        if constraints or columns:
+            plan.append((table, constraints, columns))
+    return plan
+
+def typed_table(name: str, table: Table, legacy: bool) -> Table:
+    """Bare table (no keys or indexes) named ``name`` with ``table``'s
+    columns, typed as before the migration when ``legacy``"""
+    return Table(name, MetaData(), *[
+        Column(column.name, LEGACY_COLUMN_TYPES.get((table.name, column.name), column.type) if legacy else column.type)
+        for column in table.columns
+    ])
+
+def keyset_batches(conn, table: Table, keys: list, batch_size: int, *criteria):
+    last = None
+    while True:
+        query = select(table).where(*criteria)
+        if last is not None:
+            query = query.where(tuple_(*keys) > tuple_(*last) if len(keys) > 1 else keys[0] > last[0])
+        rows = conn.execute(query.order_by(*keys).limit(batch_size)).mappings().all()
+        if not rows:
+            return
+        yield rows
+        last = [rows[-1][key.name] for key in keys]
+
+# SQLite: rebuild each table
+
+def rebuild_sqlite_table(conn, table: Table, columns: list, batch_size: int) -> int:
+    """Recreate ``table`` from the models and copy its rows (converting
+    ``columns`` to their binary form). Returns the number of rows copied."""
+    new_name = f"{table.name}__new"
+    create = str(CreateTable(table).compile(dialect=conn.dialect))
+    conn.execute(text(create.replace(f"CREATE TABLE {table.name} (", f"CREATE TABLE {new_name} (", 1)))
+
+    copied = 0
+    if columns:
+        # Legacy values go through the new column types on insert
+        legacy = typed_table(table.name, table, legacy=True)
+        target = typed_table(new_name, table, legacy=False)
+        keys = [legacy.c[column.name] for column in table.primary_key.columns]
+        for rows in keyset_batches(conn, legacy, keys, batch_size):
+            conn.execute(insert(target), [dict(row) for row in rows])
+            copied += len(rows)
+    else:
+        names = ", ".join(column.name for column in table.columns)
+        copied = conn.execute(text(f"INSERT INTO {new_name} ({names}) SELECT {names} FROM {table.name}")).rowcount
+
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {new_name} RENAME TO {table.name}"))
+    for index in table.indexes:
+        index.create(bind=conn)
+    return copied
+
+def migrate_sqlite(plan: list, batch_size: int) -> None:
+    with engine.connect() as conn:
+        # Children keep referencing the rebuilt tables by name
+        conn.execute(text("PRAGMA foreign_keys = OFF"))
+        conn.commit()
+        for table, _, columns in plan:
+            start = time.perf_counter()
+            # pysqlite only opens transactions before DML; the DDL must be in it too
+            conn.execute(text("BEGIN"))
+            try:
+                copied = rebuild_sqlite_table(conn, table, columns, batch_size)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            print(f"✅ {table.name}: reconstruida, {copied} filas en {time.perf_counter() - start:.1f}s")
+        conn.execute(text("VACUUM"))
+        conn.commit()
+
+# PostgreSQL: alter in place
+
+def drop_unique_constraint(conn, table: str, constraint: str) -> int:
+    """Drop a unique constraint, re-creating the foreign keys that used its
+    index on the primary key instead. Returns the number of foreign keys."""
+    foreign_keys = conn.execute(text(
+        "SELECT fk.conname, fk.conrelid::regclass::text, pg_get_constraintdef(fk.oid) "
+        "FROM pg_constraint fk JOIN pg_constraint uq ON fk.conindid = uq.conindid "
+        "WHERE fk.contype = 'f' AND uq.conname = :constraint AND uq.conrelid = CAST(:table AS regclass)"
+    ), {"constraint": constraint, "table": table}).all()
+    for name, child, _ in foreign_keys:
+        conn.execute(text(f'ALTER TABLE {child} DROP CONSTRAINT "{name}"'))
+    conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"'))
+    for name, child, definition in foreign_keys:
+        conn.execute(text(f'ALTER TABLE {child} ADD CONSTRAINT "{name}" {definition}'))
+    return len(foreign_keys)
+
+def convert_ciphertexts(table: Table, column: str, batch_size: int) -> int:
+    """Fill ``{column}_bin`` with the packed ciphertexts, committing each
+    batch; rows already converted by an interrupted run are skipped"""
+    staging = f"{column}_bin"
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {staging} bytea"))
+
+    keys = [key.name for key in table.primary_key.columns]
+    source = Table(
+        table.name, MetaData(),
+        *[Column(key, table.c[key].type) for key in keys],
+        Column(column, Text()),
+        Column(staging, LargeBinary())
+    )
+    key_columns = [source.c[key] for key in keys]
+    statement = update(source).where(
+        *[source.c[key] == bindparam(f"key_{key}") for key in keys]
+    ).values({staging: bindparam("packed")})
+
+    converted = 0
+    with engine.connect() as conn:
+        for rows in keyset_batches(conn, source, key_columns, batch_size, source.c[staging].is_(None)):
+            conn.execute(statement, [
+                {**{f"key_{key}": row[key] for key in keys}, "packed": pack_ciphertext(row[column])} for row in rows
+            ])
+            conn.commit()
+            converted += len(rows)
+    return converted
+
+def migrate_postgresql(plan: list, batch_size: int) -> None:
+    for table, constraints, columns in plan:
+        if constraints:
+            with engine.begin() as conn:
+                recreated = sum(drop_unique_constraint(conn, table.name, constraint["name"]) for constraint in constraints)
+            print(f"✅ {table.name}: índice único redundante eliminado ({recreated} claves foráneas recreadas)")
+        if not columns:
+            continue
+
+        start = time.perf_counter()
+        packed = [name for name in columns if isinstance(table.c[name].type, PackedCiphertext)]
+        for name in packed:
+            converted = convert_ciphertexts(table, name, batch_size)
+            print(f"   {table.name}.{name}: {converted} filas empaquetadas")
+        with engine.begin() as conn:
+            changes = [
+                f"ALTER COLUMN {name} TYPE bytea USING decode({name}, 'hex')"
+                for name in columns if isinstance(table.c[name].type, HexDigest)
+            ] + [f"DROP COLUMN {name}" for name in packed]
+            # A single rewrite of the table (and its partitions)
+            conn.execute(text(f"ALTER TABLE {table.name} {', '.join(changes)}"))
+            for name in packed:
+                conn.execute(text(f"ALTER TABLE {table.name} RENAME COLUMN {name}_bin TO {name}"))
+                if not table.c[name].nullable:
+                    conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {name} SET NOT NULL"))
+        print(f"✅ {table.name}: {', '.join(columns)} en binario ({time.perf_counter() - start:.1f}s)")
+
+def status(args) -> None:
+    with engine.connect() as conn:
+        plan = migration_plan(conn)
+    if not plan:
+        print("✅ El esquema ya está compactado")
+        return
+    for table, constraints, columns in plan:
+        pending = []
+        if constraints:
+            pending.append("índice único redundante en la clave primaria")
+        if columns:
+            pending.append(f"a binario: {', '.join(columns)}")
+        print(f"ℹ️  {table.name}: {'; '.join(pending)}")
+
+def migrate(args) -> None:
+    with engine.connect() as conn:
+        plan = migration_plan(conn)
+    if not plan:
+        print("✅ El esquema ya está compactado")
+        return
+    if engine.dialect.name == "postgresql":
+        migrate_postgresql(plan, args.lote)
+    elif engine.dialect.name == "sqlite":
+        migrate_sqlite(plan, args.lote)
+    else:
+        raise ValueError(f"Base de datos no soportada: {engine.dialect.name}")
+    print("\n✅ Migración completada")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compactar el esquema de votos")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Mostrar qué queda por migrar").set_defaults(handler=status)
+    migrate_parser = commands.add_parser("migrate", help="Aplicar la migración")
+    migrate_parser.add_argument("--lote", type=int, default=5000, help="Filas por lote al convertir")
+    migrate_parser.set_defaults(handler=migrate)
+    args = parser.parse_args()
+
+    try:
+        args.handler(args)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, Foreign
 from src.database.database import engine
 from src.models.models import Base, Tenant, User, Election, Candidate, Cargo
 from src.utils.auth import get_password_hash
+from src.services.partitions import create_election_partitions
 from datetime import datetime, timedelta
 import uuid
 
@@ -136,6 +137,7 @@ try:
     
     # Commit all changes
     db.commit()
+    create_election_partitions(db, test_election.id)
     
     print("✅ Base de datos inicializada exitosamente!")
     print("\n📋 Usuarios creados:")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Script para administrar las particiones por elección de `votos` y
+`votantes_eleccion` (solo PostgreSQL).
+
+  migrate  convierte las tablas existentes en tablas particionadas por
+           eleccion_id, con una partición por elección y una DEFAULT
+  create   crea las particiones de elecciones que no la tienen, moviendo
+           sus filas desde la partición DEFAULT
+  detach   separa las particiones de una elección (quedan como tablas sueltas)
+  list     muestra las particiones y sus filas estimadas
+
+`migrate` copia todas las filas dentro de una sola transacción que bloquea
+ambas tablas: ejecutarlo en una ventana de mantenimiento, sin votaciones activas.
+"""
+import argparse
+import os
+import sys
+import uuid
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from sqlalchemy import text
+
+from src.database.database import SessionLocal, engine
+from src.models.models import Base, Election
+from src.services.partitions import (
+    PARTITIONED_TABLES, PARTITION_LOCK_TIMEOUT, detach_election_partitions, election_partition,
+    list_election_partitions, partition_name, partitioning_enabled
+)
+
+def migrate_table(conn, table: str, election_ids) -> int:
+    """Swap ``table`` for a partitioned copy with the same rows; returns the
+    number of rows copied"""
+    legacy = f"{table}_legacy"
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    # Free the index names (the primary key constraint follows its index)
+    indexes = conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :table"
+    ), {"table": legacy}).scalars().all()
+    for index in indexes:
+        conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index}_legacy"'))
+
+    # Creates the partitioned table, its indexes and its DEFAULT partition
+    Base.metadata.tables[table].create(bind=conn)
+    for election_id in election_ids:
+        conn.execute(text(
+            f'CREATE TABLE "{partition_name(table, election_id)}" '
+            f"PARTITION OF {table} FOR VALUES IN ('{election_id}')"
+        ))
+
+    columns = ", ".join(column.name for column in Base.metadata.tables[table].columns)
+    copied = conn.execute(text(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy}")).rowcount
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    return copied
+
+def migrate(args) -> None:
+    with engine.begin() as conn:
+        if conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid "
+            "WHERE pg_class.relname = :table"
+        ), {"table": PARTITIONED_TABLES[0]}).scalar():
+            print("ℹ️  Las tablas ya están particionadas")
+            return
+        election_ids = conn.execute(text(f"SELECT id FROM {Election.__tablename__}")).scalars().all()
+        for table in PARTITIONED_TABLES:
+            copied = migrate_table(conn, table, election_ids)
+            print(f"✅ {table}: {copied} filas en {len(election_ids)} particiones")
+
+def attach_partition(db, table: str, election_id: uuid.UUID) -> int:
+    """Create the partition of an election that has rows in the DEFAULT
+    partition: they are moved into a standalone table that is then attached
+    (uncommitted). Returns the number of rows moved."""
+    partition = partition_name(table, election_id)
+    db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    db.execute(text(f'CREATE TABLE "{partition}" (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    moved = db.execute(text(
+        f'WITH moved AS (DELETE FROM {table}_default WHERE eleccion_id = :election_id RETURNING *) '
+        f'INSERT INTO "{partition}" SELECT * FROM moved'
+    ), {"election_id": election_id}).rowcount
+    db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION \"{partition}\" FOR VALUES IN ('{election_id}')"))
+    return moved
+
+def create(args) -> None:
+    db = SessionLocal()
+    try:
+        if not partitioning_enabled(db):
+            print("❌ Las tablas no están particionadas: ejecutar primero `migrate`")
+            sys.exit(1)
+        query = db.query(Election.id)
+        if args.eleccion:
+            query = query.filter(Election.id == uuid.UUID(args.eleccion))
+        for (election_id,) in query.all():
+            for table in PARTITIONED_TABLES:
+                if election_partition(db, table, election_id) is not None:
+                    continue
+                moved = attach_partition(db, table, election_id)
+                db.commit()
+                print(f"✅ {partition_name(table, election_id)}: {moved} filas movidas")
+    finally:
+        db.close()
+
+def detach(args) -> None:
+    db = SessionLocal()
+    try:
+        detached = detach_election_partitions(db, uuid.UUID(args.eleccion))
+        if not detached:
+            print("ℹ️  La elección no tiene particiones propias")
+        for table, partition in detached.items():
+            print(f"✅ {table}: {partition} separada")
+    finally:
+        db.close()
+
+def list_partitions(args) -> None:
+    db = SessionLocal()
+    try:
+        for partition in list_election_partitions(db):
+            print(f"{partition['tabla']:<20} {partition['particion']:<60} {partition['filas_estimadas']:>10}  {partition['limite']}")
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Administrar las particiones por elección")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="Particionar las tablas existentes").set_defaults(handler=migrate)
+    create_parser = commands.add_parser("create", help="Crear las particiones que falten")
+    create_parser.add_argument("--eleccion", help="Solo esta elección (UUID)")
+    create_parser.set_defaults(handler=create)
+    detach_parser = commands.add_parser("detach", help="Separar las particiones de una elección")
+    detach_parser.add_argument("eleccion", help="UUID de la elección")
+    detach_parser.set_defaults(handler=detach)
+    commands.add_parser("list", help="Listar las particiones").set_defaults(handler=list_partitions)
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("❌ El particionado solo está disponible en PostgreSQL")
+        sys.exit(1)
+    try:
+        args.handler(args)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
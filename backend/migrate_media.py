@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Script para migrar las fotos de candidatos y logos de listas al backend de
+almacenamiento configurado (STORAGE_BACKEND).
+
+Los registros antiguos guardan rutas locales (``uploads/candidates/<uuid>.jpg``);
+tras la migración guardan la clave del objeto (``candidates/<uuid>.jpg``).
+"""
+import argparse
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.database.database import SessionLocal
+from src.models.models import Candidate, ListaPartido
+from src.services.storage import get_storage, LocalStorage
+
+LEGACY_DIRS = {
+    "candidates": "uploads/candidates",
+    "listas": "uploads/listas",
+}
+
+def legacy_key(value: str, prefix: str, source_dir: str):
+    """Map a legacy file path to (local path, storage key), or None if already a key"""
+    legacy_dir = os.path.normpath(LEGACY_DIRS[prefix])
+    normalized = os.path.normpath(value)
+    if not normalized.startswith(legacy_dir + os.sep):
+        return None
+    filename = os.path.basename(normalized)
+    local_path = os.path.join(source_dir, prefix, filename)
+    return local_path, f"{prefix}/{filename}"
+
+def migrate_rows(db, storage, rows, attr, prefix, source_dir, delete_source, dry_run):
+    migrated = missing = 0
+    for row in rows:
+        value = getattr(row, attr)
+        mapping = legacy_key(value, prefix, source_dir)
+        if mapping is None:
+            continue
+        local_path, key = mapping
+
+        if not os.path.isfile(local_path):
+            print(f"   ⚠️  Archivo no encontrado: {local_path}")
+            missing += 1
+            continue
+
+        if not dry_run:
+            if not storage.exists(key):
+                with open(local_path, "rb") as f:
+                    storage.save(key, f)
+            setattr(row, attr, key)
+            db.commit()
+            # The local backend may map the key onto the very same file
+            same_file = isinstance(storage, LocalStorage) and \
+                os.path.abspath(local_path) == os.path.join(storage.base_dir, key)
+            if delete_source and not same_file:
+                os.remove(local_path)
+        migrated += 1
+    return migrated, missing
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrar archivos multimedia al backend de almacenamiento")
+    parser.add_argument("--source-dir", default="uploads", help="Directorio local con los archivos existentes")
+    parser.add_argument("--delete-source", action="store_true", help="Eliminar los archivos locales tras copiarlos")
+    parser.add_argument("--dry-run", action="store_true", help="Mostrar lo que se migraría sin modificar nada")
+    args = parser.parse_args()
+
+    storage = get_storage()
+    db = SessionLocal()
+    try:
+        print(f"📦 Migrando medios a {type(storage).__name__}...")
+
+        candidates = db.query(Candidate).filter(Candidate.foto_url.isnot(None)).all()
+        migrated, missing = migrate_rows(
+            db, storage, candidates, "foto_url", "candidates",
+            args.source_dir, args.delete_source, args.dry_run
+        )
+        print(f"✅ Fotos de candidatos: {migrated} migradas, {missing} faltantes")
+
+        listas = db.query(ListaPartido).filter(ListaPartido.logo_url.isnot(None)).all()
+        migrated, missing = migrate_rows(
+            db, storage, listas, "logo_url", "listas",
+            args.source_dir, args.delete_source, args.dry_run
+        )
+        print(f"✅ Logos de listas: {migrated} migrados, {missing} faltantes")
+
+        if args.dry_run:
+            print("\nℹ️  Modo simulación: no se modificó ningún registro")
+    except Exception as e:
+        print(f"❌ Error durante la migración: {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
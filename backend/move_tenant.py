@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Script para mover un tenant a otra base de datos (shard) sin parar el servicio.
+
+  1. Copia en línea: copia por lotes las filas del tenant que faltan en el
+     destino y actualiza las que cambiaron, mientras el tenant sigue operando
+  2. Congelado: marca el tenant como MOVIENDO en el mapa de shards (sus
+     peticiones reciben 503 con Retry-After), espera SHARD_MAP_TTL para que
+     todos los procesos lo vean y repite la copia, que ahora solo transfiere
+     los cambios recientes, eliminando del destino lo que ya no existe
+  3. Cambio: apunta el mapa al destino (ACTIVO) y elimina por lotes las filas
+     del origen. Si el origen es "default" se conserva la fila del tenant,
+     que forma parte del directorio.
+
+Las elecciones activas deben cerrarse antes: sus votos en vuelo (registro
+de votos con escritura diferida) podrían llegar al origen tras el cambio.
+
+Uso:
+    python move_tenant.py <tenant_id> <shard_destino>
+    python move_tenant.py <tenant_id> default
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from sqlalchemy import insert, tuple_, update
+
+from src.database.database import DEFAULT_SHARD, SessionLocal, session_for_shard, shard_names
+from src.database.shards import ACTIVE, MOVING, SHARD_MAP_TTL, invalidate_shard_map, tenant_placement
+from src.models.models import Base, Election, ShardTenant, Tenant
+from src.services.partitions import create_election_partitions
+from src.services.purge import PURGE_BATCH_SIZE, PURGE_PAUSE_SECONDS, _tenant_steps, delete_batch
+
+def row_values(row, attributes) -> dict:
+    return {attribute.key: getattr(row, attribute.key) for attribute in attributes}
+
+def keyset_pages(db, model, criteria: list, batch_size: int):
+    """Rows of ``model`` matching ``criteria`` in primary key order, one page
+    per query"""
+    keys = list(model.__mapper__.primary_key)
+    last = None
+    while True:
+        query = db.query(model).filter(*criteria)
+        if last is not None:
+            query = query.filter(tuple_(*keys) > tuple_(*last) if len(keys) > 1 else keys[0] > last[0])
+        rows = query.order_by(*keys).limit(batch_size).all()
+        if not rows:
+            return
+        yield rows
+        last = model.__mapper__.primary_key_from_instance(rows[-1])
+
+def sync_step(source, target, model, criteria: list, batch_size: int) -> tuple:
+    """Copy the rows of one step missing on the target and update the ones that
+    differ; returns (inserted, updated)"""
+    mapper = model.__mapper__
+    attributes = list(mapper.column_attrs)
+    inserted = updated = 0
+    for rows in keyset_pages(source, model, criteria, batch_size):
+        keys = [tuple(mapper.primary_key_from_instance(row)) for row in rows]
+        pk = list(mapper.primary_key)
+        condition = tuple_(*pk).in_(keys) if len(pk) > 1 else pk[0].in_([key[0] for key in keys])
+        existing = {
+            tuple(mapper.primary_key_from_instance(row)): row_values(row, attributes)
+            for row in target.query(model).filter(condition)
+        }
+        new_rows, changed_rows = [], []
+        for key, row in zip(keys, rows):
+            values = row_values(row, attributes)
+            if key not in existing:
+                new_rows.append(values)
+            elif existing[key] != values:
+                changed_rows.append(values)
+        if new_rows:
+            target.execute(insert(model), new_rows)
+        if changed_rows:
+            target.execute(update(model), changed_rows)
+        target.commit()
+        # Don't keep the copied pages in the identity maps
+        source.expunge_all()
+        target.expunge_all()
+        inserted += len(new_rows)
+        updated += len(changed_rows)
+    return inserted, updated
+
+def prune_step(source, target, model, criteria: list, batch_size: int) -> int:
+    """Delete target rows of one step that no longer exist on the source"""
+    mapper = model.__mapper__
+    pk = list(mapper.primary_key)
+    deleted = 0
+    for rows in keyset_pages(target, model, criteria, batch_size):
+        keys = [tuple(mapper.primary_key_from_instance(row)) for row in rows]
+        condition = tuple_(*pk).in_(keys) if len(pk) > 1 else pk[0].in_([key[0] for key in keys])
+        present = {tuple(row) for row in source.query(*pk).filter(condition)}
+        gone = [key for key in keys if key not in present]
+        target.expunge_all()
+        if gone:
+            condition = tuple_(*pk).in_(gone) if len(pk) > 1 else pk[0].in_([key[0] for key in gone])
+            target.query(model).filter(condition).delete(synchronize_session=False)
+            target.commit()
+            deleted += len(gone)
+    return deleted
+
+def copy_plan(db, tenant_id: uuid.UUID) -> list:
+    """(model, criteria) to copy, parents first: the purge plan reversed"""
+    return [
+        (model, criteria) for model, criteria, _ in reversed(_tenant_steps(db, tenant_id))
+        if model is not ShardTenant
+    ]
+
+def sync_tenant(source, target, tenant_id: uuid.UUID, batch_size: int, prune: bool = False) -> None:
+    for election_id in [election_id for (election_id,) in source.query(Election.id).filter(Election.tenant_id == tenant_id)]:
+        create_election_partitions(target, election_id)
+
+    for model, criteria in copy_plan(source, tenant_id):
+        inserted, updated = sync_step(source, target, model, criteria, batch_size)
+        if inserted or updated:
+            print(f"   {model.__tablename__}: {inserted} copiadas, {updated} actualizadas")
+    if prune:
+        # Children first, over the target's own rows
+        for model, criteria, _ in _tenant_steps(target, tenant_id):
+            if model is ShardTenant:
+                continue
+            deleted = prune_step(source, target, model, criteria, batch_size)
+            if deleted:
+                print(f"   {model.__tablename__}: {deleted} eliminadas del destino")
+
+def set_placement(directory, tenant_id: uuid.UUID, shard: str, estado: str) -> None:
+    placement = directory.query(ShardTenant).filter(ShardTenant.tenant_id == tenant_id).first()
+    if placement is None:
+        placement = ShardTenant(tenant_id=tenant_id)
+        directory.add(placement)
+    placement.shard = shard
+    placement.estado = estado
+    directory.commit()
+    invalidate_shard_map()
+
+def delete_source_rows(source, tenant_id: uuid.UUID, keep_tenant: bool) -> int:
+    deleted = 0
+    for model, criteria, _ in _tenant_steps(source, tenant_id):
+        if model is ShardTenant or (keep_tenant and model is Tenant):
+            continue
+        while True:
+            count = delete_batch(source, model, criteria)
+            if not count:
+                break
+            source.commit()
+            deleted += count
+            time.sleep(PURGE_PAUSE_SECONDS)
+    return deleted
+
+def main():
+    parser = argparse.ArgumentParser(description="Mover un tenant a otro shard")
+    parser.add_argument("tenant_id", help="UUID del tenant")
+    parser.add_argument("destino", help=f"Shard de destino ({', '.join(shard_names())})")
+    parser.add_argument("--lote", type=int, default=PURGE_BATCH_SIZE, help="Filas por lote")
+    args = parser.parse_args()
+
+    tenant_id = uuid.UUID(args.tenant_id)
+    if args.destino not in shard_names():
+        print(f"❌ Shard desconocido: {args.destino}")
+        sys.exit(1)
+
+    invalidate_shard_map()
+    origin, _ = tenant_placement(tenant_id)
+    if origin == args.destino:
+        print(f"ℹ️  El tenant ya está en {origin}")
+        return
+
+    directory = SessionLocal()
+    source = session_for_shard(origin)
+    target = session_for_shard(args.destino)
+    frozen = False
+    try:
+        if not source.query(Tenant.id).filter(Tenant.id == tenant_id).first():
+            print(f"❌ Tenant no encontrado en {origin}")
+            sys.exit(1)
+        if source.query(Election.id).filter(Election.tenant_id == tenant_id, Election.estado == "ACTIVA").first():
+            print("❌ Cierre las elecciones activas del tenant antes de moverlo")
+            sys.exit(1)
+        Base.metadata.create_all(bind=target.get_bind())
+
+        print(f"ℹ️  Copiando el tenant de {origin} a {args.destino} (en línea)...")
+        sync_tenant(source, target, tenant_id, args.lote)
+
+        print(f"ℹ️  Congelando el tenant y esperando {SHARD_MAP_TTL:.0f}s a que todos los procesos lo vean...")
+        set_placement(directory, tenant_id, origin, MOVING)
+        frozen = True
+        time.sleep(SHARD_MAP_TTL)
+        sync_tenant(source, target, tenant_id, args.lote, prune=True)
+
+        set_placement(directory, tenant_id, args.destino, ACTIVE)
+        frozen = False
+        print(f"✅ Tenant activo en {args.destino}")
+
+        deleted = delete_source_rows(source, tenant_id, keep_tenant=origin == DEFAULT_SHARD)
+        print(f"✅ {deleted} filas eliminadas de {origin}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        if frozen:
+            directory.rollback()
+            set_placement(directory, tenant_id, origin, ACTIVE)
+            print(f"ℹ️  El tenant sigue activo en {origin}")
+        sys.exit(1)
+    finally:
+        directory.close()
+        source.close()
+        target.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 from sqlalchemy import create_engine, MetaData
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from dotenv import load_dotenv
+from fastapi import Request
+from typing import Dict, List
+import threading
 import os
 
 # Cargar el archivo .env
@@ -9,23 +13,60 @@ load_dotenv()
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./urna_virtual.db")
 
+# Extra databases tenants can be placed on ("name=url,name=url"). DATABASE_URL
+# is the "default" shard: it holds the shard map, super admins and every
+# tenant not mapped elsewhere (see shards.py)
+DEFAULT_SHARD = "default"
+SHARD_URLS: Dict[str, str] = {DEFAULT_SHARD: DATABASE_URL}
+for _entry in filter(None, os.getenv("DATABASE_SHARDS", "").split(",")):
+    _name, _, _url = _entry.strip().partition("=")
+    SHARD_URLS[_name.strip()] = _url.strip()
+
+def _create_engine(url: str) -> Engine:
+    return create_engine(
+        url,
+        connect_args={"check_same_thread": False} if "sqlite" in url else {}
+    )
+
 # Create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+engine = _create_engine(DATABASE_URL)
 
 # Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, info={"shard": DEFAULT_SHARD})
+
+_sessionmakers: Dict[str, sessionmaker] = {DEFAULT_SHARD: SessionLocal}
+_sessionmakers_lock = threading.Lock()
+
+def shard_names() -> List[str]:
+    return list(SHARD_URLS)
+
+def session_for_shard(shard: str) -> Session:
+    """New session on a shard; engines are created on first use"""
+    factory = _sessionmakers.get(shard)
+    if factory is None:
+        if shard not in SHARD_URLS:
+            raise KeyError(f"Unknown database shard: {shard}")
+        with _sessionmakers_lock:
+            factory = _sessionmakers.get(shard)
+            if factory is None:
+                factory = sessionmaker(
+                    autocommit=False, autoflush=False, bind=_create_engine(SHARD_URLS[shard]), info={"shard": shard}
+                )
+                _sessionmakers[shard] = factory
+    return factory()
+
+def shard_of(db: Session) -> str:
+    return db.info.get("shard", DEFAULT_SHARD)
 
 # Create Base class
 Base = declarative_base()
 
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    # The shard map is a model, imported here to avoid a cycle
+    from src.database.shards import shard_for_request
+    db = session_for_shard(shard_for_request(request))
     try:
         yield db
     finally:
         db.close()
-
@@ -0,0 +1,131 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import uuid
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy.orm import Session
+
+from src.database.database import DEFAULT_SHARD, SessionLocal, session_for_shard, shard_names
+from src.models.models import ShardTenant, Tenant
+from src.utils.auth import verify_token
+
+# Every process reloads the (small) shard map at most every SHARD_MAP_TTL
+# seconds; a tenant move waits that long after freezing the tenant
+SHARD_MAP_TTL = float(os.getenv("SHARD_MAP_TTL", "30"))
+SHARD_FANOUT_WORKERS = int(os.getenv("SHARD_FANOUT_WORKERS", "8"))
+
+ACTIVE = "ACTIVO"
+MOVING = "MOVIENDO"
+
+_placements: Dict[uuid.UUID, Tuple[str, str]] = {}
+_loaded_at: Optional[float] = None
+_map_lock = threading.Lock()
+
+def _shard_map() -> Dict[uuid.UUID, Tuple[str, str]]:
+    global _placements, _loaded_at
+    if _loaded_at is not None and time.monotonic() - _loaded_at < SHARD_MAP_TTL:
+        return _placements
+    with _map_lock:
+        if _loaded_at is None or time.monotonic() - _loaded_at >= SHARD_MAP_TTL:
+            db = SessionLocal()
+            try:
+                rows = db.query(ShardTenant.tenant_id, ShardTenant.shard, ShardTenant.estado).all()
+            finally:
+                db.close()
+            _placements = {tenant_id: (shard, estado) for tenant_id, shard, estado in rows}
+            _loaded_at = time.monotonic()
+    return _placements
+
+def invalidate_shard_map() -> None:
+    global _loaded_at
+    with _map_lock:
+        _loaded_at = None
+
+def tenant_placement(tenant_id: uuid.UUID) -> Tuple[str, str]:
+    """(shard, estado) of a tenant"""
+    if len(shard_names()) == 1:
+        return DEFAULT_SHARD, ACTIVE
+    return _shard_map().get(tenant_id, (DEFAULT_SHARD, ACTIVE))
+
+def shard_for_tenant(tenant_id: Optional[uuid.UUID]) -> str:
+    return tenant_placement(tenant_id)[0] if tenant_id else DEFAULT_SHARD
+
+def session_for_tenant(tenant_id: Optional[uuid.UUID]) -> Session:
+    return session_for_shard(shard_for_tenant(tenant_id))
+
+def shard_for_request(request: Request) -> str:
+    """Shard of the tenant in the request's access token. Super admins (no
+    tenant) use the default shard unless they name a tenant with the
+    X-Tenant-ID header. Invalid tokens fall through to the default shard,
+    where authentication rejects them."""
+    if len(shard_names()) == 1:
+        return DEFAULT_SHARD
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return DEFAULT_SHARD
+    payload = verify_token(token, "access")
+    if payload is None:
+        return DEFAULT_SHARD
+
+    tenant_id = payload.get("tenant_id")
+    if payload.get("rol") == "SUPER_ADMIN":
+        tenant_id = request.headers.get("x-tenant-id")
+    if not tenant_id:
+        return DEFAULT_SHARD
+    try:
+        tenant_uuid = uuid.UUID(tenant_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid X-Tenant-ID header")
+
+    shard, estado = tenant_placement(tenant_uuid)
+    if estado == MOVING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Tenant is being moved, retry shortly",
+            headers={"Retry-After": str(int(SHARD_MAP_TTL))}
+        )
+    return shard
+
+def home_tenant_criteria(shard: str) -> list:
+    """Filter on Tenant.id for the tenants whose home is ``shard``. The
+    default shard keeps a row for every tenant, so tenants placed elsewhere
+    are excluded there."""
+    if len(shard_names()) == 1:
+        return []
+    placements = _shard_map()
+    if shard == DEFAULT_SHARD:
+        elsewhere = [tenant_id for tenant_id, (home, _) in placements.items() if home != DEFAULT_SHARD]
+        return [Tenant.id.notin_(elsewhere)] if elsewhere else []
+    return [Tenant.id.in_([tenant_id for tenant_id, (home, _) in placements.items() if home == shard])]
+
+def other_shards() -> List[str]:
+    return [shard for shard in shard_names() if shard != DEFAULT_SHARD]
+
+def fan_out(func: Callable[..., Any], *args, db: Optional[Session] = None, shards: Optional[List[str]] = None) -> List[Tuple[str, Any]]:
+    """Run ``func(shard_db, *args)`` on every shard (or on ``shards``) in
+    parallel threads and return (shard, result) pairs in shard order.
+    Without extra shards it runs on ``db`` (or a default session) in the
+    calling thread."""
+    names = shard_names() if shards is None else shards
+    if not names:
+        return []
+    if names == [DEFAULT_SHARD] and db is not None:
+        return [(DEFAULT_SHARD, func(db, *args))]
+
+    def run(shard: str):
+        session = session_for_shard(shard)
+        try:
+            return func(session, *args)
+        finally:
+            session.close()
+
+    if len(names) == 1:
+        return [(names[0], run(names[0]))]
+    # Each thread runs in a copy of the caller's context (request metrics)
+    contexts = [contextvars.copy_context() for _ in names]
+    with ThreadPoolExecutor(max_workers=min(len(names), SHARD_FANOUT_WORKERS), thread_name_prefix="shard-fanout") as executor:
+        return list(zip(names, executor.map(lambda context, shard: context.run(run, shard), contexts, names)))
@@ -0,0 +1,87 @@
+import base64
+import binascii
+import json
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+from src.utils.elgamal import ELEMENT_BYTES
+
+class HexDigest(TypeDecorator):
+    """Digest or signature used as a lowercase hex string and stored as its
+    raw bytes (half the size in the row and in any index on it)"""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else bytes.fromhex(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else bytes(value).hex()
+
+# First byte of a packed ciphertext
+TEXT = 0
+FERNET = 1
+ELGAMAL = 2
+
+# Fernet token version byte
+_FERNET_VERSION = 0x80
+
+def _pack_fernet(value: str) -> Optional[bytes]:
+    # encrypt_vote stores the (urlsafe base64) token base64-encoded again
+    raw = base64.urlsafe_b64decode(base64.b64decode(value, validate=True))
+    return raw if raw[:1] == bytes([_FERNET_VERSION]) else None
+
+def _unpack_fernet(raw: bytes) -> str:
+    return base64.b64encode(base64.urlsafe_b64encode(raw)).decode()
+
+def _pack_elgamal(value: str) -> Optional[bytes]:
+    if not value.startswith('{"c1"'):
+        return None
+    data = json.loads(value)
+    elements = [base64.b64decode(element, validate=True) for element in [data["c1"], *data["c2"]]]
+    if any(len(element) != ELEMENT_BYTES for element in elements):
+        return None
+    return b"".join(elements)
+
+def _unpack_elgamal(raw: bytes) -> str:
+    elements = [base64.b64encode(raw[i:i + ELEMENT_BYTES]).decode() for i in range(0, len(raw), ELEMENT_BYTES)]
+    return json.dumps({"c1": elements[0], "c2": elements[1:]})
+
+_PACKERS: Tuple[Tuple[int, Callable[[str], Optional[bytes]], Callable[[bytes], str]], ...] = (
+    (FERNET, _pack_fernet, _unpack_fernet),
+    (ELGAMAL, _pack_elgamal, _unpack_elgamal)
+)
+_UNPACKERS = {tag: unpack for tag, _, unpack in _PACKERS}
+
+def pack_ciphertext(value: str) -> bytes:
+    """Binary form of a stored ballot. Only used when it gives back exactly
+    the same text, which receipts and block hashes are computed from."""
+    for tag, pack, unpack in _PACKERS:
+        try:
+            raw = pack(value)
+        except (ValueError, binascii.Error, KeyError, TypeError, IndexError):
+            continue
+        if raw and unpack(raw) == value:
+            return bytes([tag]) + raw
+    return bytes([TEXT]) + value.encode()
+
+def unpack_ciphertext(packed: bytes) -> str:
+    tag, raw = packed[0], packed[1:]
+    if tag == TEXT:
+        return raw.decode()
+    return _UNPACKERS[tag](raw)
+
+class PackedCiphertext(TypeDecorator):
+    """Ballot ciphertext used as its text form (what receipts hash) and stored
+    packed: Fernet tokens without their two base64 layers, ElGamal ciphertexts
+    as fixed-width elements, anything else as UTF-8"""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else pack_ciphertext(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else unpack_ciphertext(bytes(value))
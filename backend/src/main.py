@@ -3,10 +3,11 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 import uvicorn
 
 # Import routes
@@ -21,15 +22,44 @@ from src.routes.votes import votes_router
 from src.routes.simulacros import simulacros_router
 from src.routes.metrics import metrics_router
 from src.routes.reports import reports_router
+from src.routes.media import media_router
+from src.routes.purges import purges_router
 
 # Import database
 from src.database.database import engine, Base
+from src.utils.responses import DefaultJSONResponse, CompressionMiddleware
+from src.utils.request_metrics import PROMETHEUS_CONTENT_TYPE, RequestMetricsMiddleware, request_metrics
+from src.services.scheduler import start_scheduler, stop_scheduler
+from src.services.ballot_log import start_ballot_log, stop_ballot_log
+from src.services.sealer import start_sealer, stop_sealer
+from src.services.purge import start_purger, stop_purger
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open and close elections automatically at their scheduled times
+    start_scheduler()
+    # Replay and resume the write-behind ballot log (BALLOT_INGESTION_MODE=log)
+    start_ballot_log()
+    # Seal stored ballots into hash-linked blocks
+    start_sealer()
+    # Resume purges interrupted by a restart
+    start_purger()
+    yield
+    stop_purger()
+    stop_ballot_log()
+    stop_sealer()
+    stop_scheduler()
 
 # Create FastAPI app
 app = FastAPI(
     title="Urna Virtual API",
     description="API REST para el sistema de voto electrónico Urna Virtual",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=DefaultJSONResponse,
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -41,6 +71,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large payloads (reports, listings) with brotli or gzip
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
+# Outermost: per-route latency and SQL statement metrics (GET /metrics) and
+# the slow request log (SLOW_REQUEST_MS)
+app.add_middleware(RequestMetricsMiddleware)
+
 # Include all routers
 app.include_router(auth_router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(tenants_router, prefix="/api/v1/tenants", tags=["Tenants"])
@@ -53,6 +90,8 @@ app.include_router(votes_router, prefix="/api/v1/votos", tags=["Votes"])
 app.include_router(simulacros_router, prefix="/api/v1/simulacros", tags=["Simulacros"])
 app.include_router(metrics_router, prefix="/api/v1/metricas", tags=["Metrics"])
 app.include_router(reports_router, prefix="/api/v1/reports", tags=["Reports"])
+app.include_router(media_router, prefix="/api/v1/media", tags=["Media"])
+app.include_router(purges_router, prefix="/api/v1/purgas", tags=["Purges"])
 
 # Serve static files
 static_folder = os.path.join(os.path.dirname(__file__), 'static')
@@ -72,6 +111,11 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "Urna Virtual API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Request metrics of this process in Prometheus text format"""
+    return Response(content=request_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == '__main__':
     uvicorn.run(
         "main:app",
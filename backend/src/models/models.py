@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Text, Integer, ForeignKey, DECIMAL
+from sqlalchemy import Column, String, Boolean, DateTime, Text, Integer, BigInteger, ForeignKey, DECIMAL, Index, UniqueConstraint, DDL, event
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -6,11 +6,13 @@ from sqlalchemy.sql import func
 import uuid
 
 from src.database.database import Base
+from src.database.types import HexDigest, PackedCiphertext
+from src.utils.ids import ballot_id, uuid7
 
 class Tenant(Base):
     __tablename__ = "tenants"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     nombre = Column(String(255), nullable=False, unique=True)
     email_contacto = Column(String(255), nullable=False)
     fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -27,7 +29,7 @@ class Tenant(Base):
 class User(Base):
     __tablename__ = "usuarios"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=True)  # NULL for super admin
     email = Column(String(255), nullable=False, unique=True)
     password_hash = Column(String(255), nullable=False)
@@ -45,7 +47,7 @@ class User(Base):
 class ListaPartido(Base):
     __tablename__ = "listas_partidos"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
     nombre = Column(String(255), nullable=False)
     descripcion = Column(Text, nullable=True)
@@ -59,7 +61,7 @@ class ListaPartido(Base):
 class Election(Base):
     __tablename__ = "elecciones"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
     titulo = Column(String(255), nullable=False)
     descripcion = Column(Text, nullable=True)
@@ -68,6 +70,8 @@ class Election(Base):
     estado = Column(String(50), nullable=False)  # PENDIENTE, ACTIVA, CERRADA, CANCELADA
     tipo_votacion = Column(String(50), nullable=False)  # MAYORITARIA, PONDERADA
     anonima = Column(Boolean, nullable=False)
+    cifrado_votos = Column(String(50), default="SIMETRICO", nullable=False)  # SIMETRICO, HOMOMORFICO
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Relationships
     tenant = relationship("Tenant", back_populates="elecciones")
@@ -79,10 +83,12 @@ class Election(Base):
 class Cargo(Base):
     __tablename__ = "cargos"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), nullable=False)
     nombre = Column(String(255), nullable=False)
     max_candidatos_a_elegir = Column(Integer, nullable=False)
+    escanos = Column(Integer, nullable=True)  # Escaños a repartir entre listas (opcional)
+    metodo_reparto = Column(String(50), default="DHONDT", nullable=False)  # DHONDT, RESTO_MAYOR
     
     # Relationships
     eleccion = relationship("Election", back_populates="cargos")
@@ -91,7 +97,7 @@ class Cargo(Base):
 class Candidate(Base):
     __tablename__ = "candidatos"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     cargo_id = Column(UUID(as_uuid=True), ForeignKey("cargos.id"), nullable=False)
     lista_id = Column(UUID(as_uuid=True), ForeignKey("listas_partidos.id"), nullable=True)
     nombre = Column(String(255), nullable=False)
@@ -106,14 +112,23 @@ class Candidate(Base):
 
 class Vote(Base):
     __tablename__ = "votos"
+    # En PostgreSQL, una partición por elección (ver services/partitions.py);
+    # la clave primaria debe incluir la clave de partición
+    __table_args__ = (
+        {"postgresql_partition_by": "LIST (eleccion_id)"},
+    )
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
-    eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), nullable=False)
+    # UUIDv7 (ordenado por tiempo); sin la hora exacta en elecciones anónimas
+    id = Column(UUID(as_uuid=True), primary_key=True, default=ballot_id, nullable=False)
+    eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), primary_key=True, nullable=False)
     votante_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=False)
-    voto_cifrado = Column(Text, nullable=False)
-    firma_digital = Column(Text, nullable=False)
+    # Se usan como texto y se guardan en binario (ver database/types.py)
+    voto_cifrado = Column(PackedCiphertext, nullable=False)
+    firma_digital = Column(HexDigest(64), nullable=False)  # Ed25519 (64 bytes) o sha256 heredado (32)
+    # La hora que lleva el id: en elecciones anónimas, el inicio de su ventana
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    hash_bloque = Column(String(255), nullable=True)
+    hash_bloque = Column(HexDigest(32), nullable=True)  # Hash del bloque, asignado al sellar
+    bloque_id = Column(UUID(as_uuid=True), ForeignKey("bloques_votos.id"), nullable=True, index=True)
     
     # Relationships
     eleccion = relationship("Election", back_populates="votos")
@@ -121,23 +136,34 @@ class Vote(Base):
 
 class VotanteEleccion(Base):
     __tablename__ = "votantes_eleccion"
+    __table_args__ = (
+        {"postgresql_partition_by": "LIST (eleccion_id)"},
+    )
     
     eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), primary_key=True, nullable=False)
     votante_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), primary_key=True, nullable=False)
     ha_votado = Column(Boolean, default=False, nullable=False)
+    peso = Column(Integer, default=1, nullable=False)  # Peso del voto en elecciones PONDERADA
     
     # Relationships
     eleccion = relationship("Election", back_populates="votantes_eleccion")
     votante = relationship("User", back_populates="votantes_eleccion")
 
+# Filas de elecciones sin partición propia (creadas antes de particionar)
+for _partitioned in (Vote.__table__, VotanteEleccion.__table__):
+    event.listen(_partitioned, "after_create", DDL(
+        f"CREATE TABLE {_partitioned.name}_default PARTITION OF {_partitioned.name} DEFAULT"
+    ).execute_if(dialect="postgresql"))
+
 class Simulacro(Base):
     __tablename__ = "simulacros"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), nullable=False)
     nombre = Column(String(255), nullable=False)
     fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     activo = Column(Boolean, default=True, nullable=False)
+    total_votos = Column(Integer, default=0, nullable=False)  # Mantenido al insertar votos de simulacro
     
     # Relationships
     eleccion = relationship("Election", back_populates="simulacros")
@@ -146,19 +172,26 @@ class Simulacro(Base):
 class VotoSimulacro(Base):
     __tablename__ = "votos_simulacro"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7, nullable=False)
     simulacro_id = Column(UUID(as_uuid=True), ForeignKey("simulacros.id"), nullable=False)
     votante_prueba = Column(String(255), nullable=False)
-    voto_cifrado = Column(Text, nullable=False)
+    voto_cifrado = Column(PackedCiphertext, nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Relationships
     simulacro = relationship("Simulacro", back_populates="votos_simulacro")
 
+class ConteoSimulacro(Base):
+    __tablename__ = "conteos_simulacro"
+    
+    simulacro_id = Column(UUID(as_uuid=True), ForeignKey("simulacros.id"), primary_key=True, nullable=False)
+    candidato_id = Column(UUID(as_uuid=True), ForeignKey("candidatos.id"), primary_key=True, nullable=False)
+    votos = Column(Integer, default=0, nullable=False)
+
 class MetricaUso(Base):
     __tablename__ = "metricas_uso"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
     periodo = Column(DateTime, nullable=False)  # año-mes
     elecciones_creadas = Column(Integer, default=0, nullable=False)
@@ -170,3 +203,143 @@ class MetricaUso(Base):
     # Relationships
     tenant = relationship("Tenant", back_populates="metricas_uso")
 
+
+class BoletaEleccion(Base):
+    __tablename__ = "boletas_eleccion"
+    
+    eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), primary_key=True, nullable=False)
+    version = Column(Integer, default=1, nullable=False)
+    etag = Column(String(64), nullable=False)
+    contenido = Column(Text, nullable=False)  # JSON serializado de la boleta
+    fecha_generacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class TrabajoReporte(Base):
+    __tablename__ = "trabajos_reporte"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
+    tipo = Column(String(50), nullable=False)  # USO_PLATAFORMA, ACTIVIDAD_TENANT
+    parametros = Column(Text, nullable=False)  # JSON
+    estado = Column(String(50), default="PENDIENTE", nullable=False)  # PENDIENTE, EN_PROCESO, COMPLETADO, FALLIDO
+    solicitado_por = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=False)
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=True)
+    artefacto = Column(String(500), nullable=True)  # Clave en el almacenamiento
+    error = Column(Text, nullable=True)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    fecha_inicio = Column(DateTime(timezone=True), nullable=True)
+    fecha_fin = Column(DateTime(timezone=True), nullable=True)
+
+class TrabajoPurga(Base):
+    __tablename__ = "trabajos_purga"
+    
+    # Sin claves foráneas: el trabajo sobrevive a las filas que elimina
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
+    tipo = Column(String(50), nullable=False)  # SIMULACRO, ELECCION, TENANT
+    objetivo_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    tenant_id = Column(UUID(as_uuid=True), nullable=True)
+    solicitado_por = Column(UUID(as_uuid=True), nullable=False)
+    estado = Column(String(50), default="PENDIENTE", nullable=False)  # PENDIENTE, EN_PROCESO, COMPLETADO, FALLIDO
+    paso_actual = Column(String(100), nullable=True)  # Tabla que se está purgando
+    filas_eliminadas = Column(Integer, default=0, nullable=False)
+    particiones_eliminadas = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    fecha_inicio = Column(DateTime(timezone=True), nullable=True)
+    fecha_fin = Column(DateTime(timezone=True), nullable=True)
+
+class BloqueoPlanificador(Base):
+    __tablename__ = "bloqueos_planificador"
+    
+    nombre = Column(String(100), primary_key=True, nullable=False)
+    propietario = Column(String(255), nullable=False)  # Nodo que tiene el lease
+    expira = Column(DateTime(timezone=True), nullable=False)
+
+class VersionPlanificador(Base):
+    __tablename__ = "versiones_planificador"
+    
+    nombre = Column(String(100), primary_key=True, nullable=False)
+    version = Column(Integer, default=0, nullable=False)  # Se incrementa al crear o cambiar elecciones
+
+class ResultadoEleccion(Base):
+    __tablename__ = "resultados_eleccion"
+    
+    eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), primary_key=True, nullable=False)
+    contenido = Column(Text, nullable=False)  # JSON serializado de los resultados
+    etag = Column(String(64), nullable=False)
+    firma = Column(String(128), nullable=False)  # HMAC-SHA256 del contenido
+    fecha_generacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class ClaveIdempotencia(Base):
+    __tablename__ = "claves_idempotencia"
+    
+    clave = Column(String(64), primary_key=True, nullable=False)  # sha256(usuario, ruta, Idempotency-Key)
+    huella = Column(String(64), nullable=False)  # sha256 de la petición original
+    estado = Column(String(50), nullable=False)  # EN_PROCESO, COMPLETADO
+    codigo_estado = Column(Integer, nullable=True)
+    respuesta = Column(Text, nullable=True)
+    expira = Column(DateTime(timezone=True), nullable=False, index=True)  # Las vencidas se borran periódicamente
+
+class ArbolMerkle(Base):
+    __tablename__ = "arboles_merkle"
+    
+    eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), primary_key=True, nullable=False)
+    tamano = Column(Integer, default=0, nullable=False)  # Número de hojas (votos)
+    raiz = Column(String(64), nullable=False)
+    fecha_actualizacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class NodoMerkle(Base):
+    __tablename__ = "nodos_merkle"
+    __table_args__ = (
+        Index("ix_nodos_merkle_hash", "eleccion_id", "hash"),
+    )
+    
+    eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), primary_key=True, nullable=False)
+    nivel = Column(Integer, primary_key=True, nullable=False)  # 0 = hojas
+    indice = Column(Integer, primary_key=True, nullable=False)
+    hash = Column(HexDigest(32), nullable=False)
+
+class BloqueVotos(Base):
+    __tablename__ = "bloques_votos"
+    __table_args__ = (
+        UniqueConstraint("eleccion_id", "numero", name="uq_bloques_votos_numero"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
+    eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), nullable=False)
+    numero = Column(Integer, nullable=False)  # Posición en la cadena de la elección, desde 0
+    hash_anterior = Column(String(64), nullable=False)  # "genesis" para el primer bloque
+    hash_bloque = Column(String(64), nullable=False)
+    raiz_merkle = Column(String(64), nullable=False)  # Raíz del árbol tras añadir el bloque
+    cantidad_votos = Column(Integer, nullable=False)
+    firma = Column(String(128), nullable=False)  # HMAC-SHA256 de hash_bloque
+    fecha_sellado = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class ClaveEleccion(Base):
+    __tablename__ = "claves_eleccion"
+    
+    eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), primary_key=True, nullable=False)
+    candidatos = Column(Text, nullable=False)  # JSON: ids de candidatos en el orden de los cifrados
+    claves_publicas = Column(Text, nullable=False)  # JSON: una clave ElGamal por candidato
+    clave_privada = Column(Text, nullable=False)  # Claves privadas, cifradas con la clave de votos
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class ArchivoEleccion(Base):
+    __tablename__ = "archivos_eleccion"
+    
+    eleccion_id = Column(UUID(as_uuid=True), ForeignKey("elecciones.id"), primary_key=True, nullable=False)
+    ruta = Column(String(500), nullable=False)  # Directorio del archivo (services/archive.py)
+    sha256_manifiesto = Column(String(64), nullable=False)
+    votos = Column(Integer, nullable=False)
+    votantes = Column(Integer, nullable=False)
+    votantes_votaron = Column(Integer, nullable=False)
+    tamano_bytes = Column(BigInteger, nullable=False)  # Tamaño total de los ficheros
+    filas_activas = Column(Boolean, default=True, nullable=False)  # Quedan filas en las tablas activas
+    fecha_archivo = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class ShardTenant(Base):
+    __tablename__ = "shards_tenants"
+    
+    # Vive en la base "default"; los tenants sin fila están en "default"
+    tenant_id = Column(UUID(as_uuid=True), primary_key=True, nullable=False)
+    shard = Column(String(100), nullable=False)  # Nombre en DATABASE_SHARDS
+    estado = Column(String(50), default="ACTIVO", nullable=False)  # ACTIVO, MOVIENDO
+    fecha_actualizacion = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -5,16 +5,29 @@ from src.models.models import User
 from src.schemas.schemas import LoginRequest, LoginResponse, Token, UserCreate, User as UserSchema
 from src.utils.auth import verify_password, get_password_hash, create_access_token, create_refresh_token, verify_token
 from src.utils.dependencies import get_current_user
+from src.database.shards import fan_out, other_shards, session_for_tenant
 from datetime import timedelta
+from typing import List
+import uuid
 
 auth_router = APIRouter()
 
+def _users_by_email(db: Session, email: str) -> List[User]:
+    return db.query(User).filter(User.email == email).all()
+
 @auth_router.post("/login", response_model=LoginResponse)
 async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     """Authenticate user and return JWT tokens"""
-    user = db.query(User).filter(User.email == login_data.email).first()
+    users = db.query(User).filter(User.email == login_data.email).all()
+    if not users:
+        # Users of tenants placed on other shards
+        users = [
+            found for _, shard_users in fan_out(_users_by_email, login_data.email, shards=other_shards())
+            for found in shard_users
+        ]
+    user = next((found for found in users if verify_password(login_data.password, found.password_hash)), None)
     
-    if not user or not verify_password(login_data.password, user.password_hash):
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -53,7 +66,7 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     }
 
 @auth_router.post("/refresh", response_model=Token)
-async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+async def refresh_token(refresh_token: str):
     """Refresh access token using refresh token"""
     payload = verify_token(refresh_token, "refresh")
     
@@ -64,7 +77,10 @@ async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
         )
     
     user_id = payload.get("sub")
-    user = db.query(User).filter(User.id == user_id).first()
+    tenant_id = payload.get("tenant_id")
+    # Users of a tenant live on its shard
+    with session_for_tenant(uuid.UUID(tenant_id) if tenant_id else None) as db:
+        user = db.query(User).filter(User.id == user_id).first()
     
     if not user or not user.activo:
         raise HTTPException(
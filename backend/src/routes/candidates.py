@@ -1,24 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from typing import List
+import io
 import os
-import uuid as uuid_lib
 from PIL import Image
 from src.database.database import get_db
 from src.models.models import Candidate, Cargo, Election, ListaPartido
 from src.schemas.schemas import CandidateCreate, CandidateUpdate, Candidate as CandidateSchema, MessageResponse
 from src.utils.dependencies import require_tenant_admin, get_current_active_user
+from src.utils.responses import orm_list_response
+from src.services.storage import get_storage, new_media_key, read_upload_limited
+from src.services.ballot import publish_ballot
 import uuid
 
 candidates_router = APIRouter()
 
 # Configuration for image uploads
-UPLOAD_DIR = "uploads/candidates"
+MEDIA_PREFIX = "candidates"
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 @candidates_router.post("/", response_model=CandidateSchema)
 async def create_candidate(
     candidate_data: CandidateCreate,
@@ -40,7 +42,14 @@ async def create_candidate(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Cannot create candidate for different tenant"
         )
-    
+
+    # Cannot add candidates once the ballot is published (active or closed election)
+    if cargo.eleccion.estado in ["ACTIVA", "CERRADA"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot create candidate in active or closed election"
+        )
+
     # Validate lista if provided
     if candidate_data.lista_id:
         lista = db.query(ListaPartido).filter(ListaPartido.id == candidate_data.lista_id).first()
@@ -88,7 +97,7 @@ async def get_candidates(
         query = query.filter(Candidate.cargo_id == cargo_id)
     
     candidates = query.offset(skip).limit(limit).all()
-    return candidates
+    return orm_list_response(CandidateSchema, candidates)
 
 @candidates_router.get("/{candidate_id}", response_model=CandidateSchema)
 async def get_candidate(
@@ -204,10 +213,7 @@ async def delete_candidate(
     
     # Delete photo file if exists
     if candidate.foto_url:
-        try:
-            os.remove(candidate.foto_url)
-        except OSError:
-            pass  # File might not exist
+        get_storage().delete(candidate.foto_url)
     
     db.delete(candidate)
     db.commit()
@@ -249,56 +255,84 @@ async def upload_candidate_photo(
             detail="Invalid file format. Allowed: JPG, PNG, WebP"
         )
     
-    # Check file size
-    file_content = await file.read()
-    if len(file_content) > MAX_FILE_SIZE:
+    # Check file size while spooling the upload in chunks
+    upload = read_upload_limited(file.file, MAX_FILE_SIZE)
+    if upload is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="File too large. Maximum size: 5MB"
         )
     
-    # Generate unique filename
-    filename = f"{uuid_lib.uuid4()}{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
+    storage = get_storage()
+    key = new_media_key(MEDIA_PREFIX, ".jpg")
     
-    # Save and process image
+    # Process and store image
     try:
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-        
         # Resize and optimize image
-        with Image.open(file_path) as img:
+        output = io.BytesIO()
+        with Image.open(upload) as img:
             # Convert to RGB if necessary
             if img.mode in ("RGBA", "P"):
                 img = img.convert("RGB")
             
             # Resize to 300x400 (3:4 ratio)
             img.thumbnail((300, 400), Image.Resampling.LANCZOS)
-            img.save(file_path, "JPEG", quality=85, optimize=True)
+            img.save(output, "JPEG", quality=85, optimize=True)
+        output.seek(0)
+        storage.save(key, output, "image/jpeg")
         
         # Delete old photo if exists
         if candidate.foto_url:
-            try:
-                os.remove(candidate.foto_url)
-            except OSError:
-                pass
+            storage.delete(candidate.foto_url)
         
         # Update candidate
-        candidate.foto_url = file_path
+        candidate.foto_url = key
         db.commit()
         
+        # Active ballots embed the photo URL
+        if candidate.cargo.eleccion.estado == "ACTIVA":
+            publish_ballot(db, candidate.cargo.eleccion)
+        
         return {"message": "Photo uploaded successfully"}
     
     except Exception as e:
         # Clean up file if error occurred
-        try:
-            os.remove(file_path)
-        except OSError:
-            pass
+        storage.delete(key)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error processing image"
         )
+    finally:
+        upload.close()
+
+@candidates_router.get("/{candidate_id}/foto")
+async def get_candidate_photo(
+    candidate_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """Redirect to a short-lived URL serving the candidate photo directly from storage"""
+    candidate = db.query(Candidate).join(Cargo).join(Election).filter(Candidate.id == candidate_id).first()
+    if not candidate:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Candidate not found"
+        )
+    
+    # Check tenant access
+    if current_user.rol != "SUPER_ADMIN" and current_user.tenant_id != candidate.cargo.eleccion.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access candidate from different tenant"
+        )
+    
+    if not candidate.foto_url:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No photo found"
+        )
+    
+    return RedirectResponse(get_storage().url(candidate.foto_url))
 
 @candidates_router.delete("/{candidate_id}/foto", response_model=MessageResponse)
 async def delete_candidate_photo(
@@ -328,14 +362,14 @@ async def delete_candidate_photo(
         )
     
     # Delete file
-    try:
-        os.remove(candidate.foto_url)
-    except OSError:
-        pass  # File might not exist
+    get_storage().delete(candidate.foto_url)
     
     # Update candidate
     candidate.foto_url = None
     db.commit()
     
+    if candidate.cargo.eleccion.estado == "ACTIVA":
+        publish_ballot(db, candidate.cargo.eleccion)
+    
     return {"message": "Photo deleted successfully"}
 
@@ -5,6 +5,8 @@ from src.database.database import get_db
 from src.models.models import Cargo, Election
 from src.schemas.schemas import CargoCreate, Cargo as CargoSchema, MessageResponse
 from src.utils.dependencies import require_tenant_admin, get_current_active_user
+from src.utils.responses import orm_list_response
+from src.services.tally import APPORTIONMENT_METHODS
 import uuid
 
 cargos_router = APIRouter()
@@ -76,7 +78,7 @@ async def get_cargos(
         query = query.filter(Cargo.eleccion_id == eleccion_id)
     
     cargos = query.offset(skip).limit(limit).all()
-    return cargos
+    return orm_list_response(CargoSchema, cargos)
 
 @cargos_router.get("/{cargo_id}", response_model=CargoSchema)
 async def get_cargo(
@@ -130,8 +132,14 @@ async def update_cargo(
             detail="Cannot update cargo in active or closed election"
         )
     
+    if "metodo_reparto" in cargo_update and cargo_update["metodo_reparto"] not in APPORTIONMENT_METHODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid apportionment method"
+        )
+    
     # Update cargo fields
-    allowed_fields = ["nombre", "descripcion", "max_candidatos_a_elegir"]
+    allowed_fields = ["nombre", "descripcion", "max_candidatos_a_elegir", "escanos", "metodo_reparto"]
     for field, value in cargo_update.items():
         if field in allowed_fields:
             setattr(cargo, field, value)
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
 import pytz
 from src.database.database import get_db
 from src.models.models import Election, User, Tenant
-from src.schemas.schemas import ElectionCreate, ElectionUpdate, Election as ElectionSchema, MessageResponse
+from src.schemas.schemas import ElectionCreate, ElectionUpdate, Election as ElectionSchema, MessageResponse, PurgeJob
 from src.utils.dependencies import require_tenant_admin, get_current_active_user, require_same_tenant
+from src.utils.responses import orm_list_response
+from src.services.ballot import get_ballot, publish_ballot, evict_ballot
+from src.services.scheduler import publish_closed_election, schedule_election, schedule_results
+from src.services.purge import request_purge
+from src.services.partitions import create_election_partitions
+from src.utils.timezones import to_utc, as_utc
 import uuid
 
 elections_router = APIRouter()
@@ -33,6 +40,10 @@ async def create_election(
             detail="Tenant not found"
         )
     
+    # Dates without an offset are local times of the tenant; store them in UTC
+    election_data.fecha_inicio = to_utc(election_data.fecha_inicio, tenant.zona_horaria)
+    election_data.fecha_fin = to_utc(election_data.fecha_fin, tenant.zona_horaria)
+    
     # Validate dates
     if election_data.fecha_inicio >= election_data.fecha_fin:
         raise HTTPException(
@@ -58,7 +69,9 @@ async def create_election(
     db.add(db_election)
     db.commit()
     db.refresh(db_election)
+    create_election_partitions(db, db_election.id)
     
+    schedule_election(db_election)
     return db_election
 
 @elections_router.get("/", response_model=List[ElectionSchema])
@@ -81,7 +94,7 @@ async def get_elections(
         query = query.filter(Election.tenant_id == current_user.tenant_id)
     
     elections = query.offset(skip).limit(limit).all()
-    return elections
+    return orm_list_response(ElectionSchema, elections)
 
 @elections_router.get("/{election_id}", response_model=ElectionSchema)
 async def get_election(
@@ -106,6 +119,36 @@ async def get_election(
     
     return election
 
+@elections_router.get("/{election_id}/boleta")
+async def get_election_ballot(
+    election_id: uuid.UUID,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the full ballot (cargos, candidates, listas and media URLs) in one call"""
+    election = db.query(Election).filter(Election.id == election_id).first()
+    if not election:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Election not found"
+        )
+    
+    # Check tenant access
+    if current_user.rol != "SUPER_ADMIN" and current_user.tenant_id != election.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access election from different tenant"
+        )
+    
+    etag, body = get_ballot(db, election)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+    
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @elections_router.put("/{election_id}", response_model=ElectionSchema)
 async def update_election(
     election_id: uuid.UUID,
@@ -140,8 +183,11 @@ async def update_election(
     
     # Validate dates if provided
     if "fecha_inicio" in update_data or "fecha_fin" in update_data:
-        fecha_inicio = update_data.get("fecha_inicio", election.fecha_inicio)
-        fecha_fin = update_data.get("fecha_fin", election.fecha_fin)
+        for field in ("fecha_inicio", "fecha_fin"):
+            if update_data.get(field):
+                update_data[field] = to_utc(update_data[field], election.tenant.zona_horaria)
+        fecha_inicio = update_data.get("fecha_inicio") or as_utc(election.fecha_inicio)
+        fecha_fin = update_data.get("fecha_fin") or as_utc(election.fecha_fin)
         
         if fecha_inicio >= fecha_fin:
             raise HTTPException(
@@ -154,9 +200,11 @@ async def update_election(
     
     db.commit()
     db.refresh(election)
+    
+    schedule_election(election)
     return election
 
-@elections_router.delete("/{election_id}", response_model=MessageResponse)
+@elections_router.delete("/{election_id}", response_model=PurgeJob, status_code=status.HTTP_202_ACCEPTED)
 async def delete_election(
     election_id: uuid.UUID,
     db: Session = Depends(get_db),
@@ -184,9 +232,10 @@ async def delete_election(
             detail="Cannot delete active or closed election"
         )
     
-    db.delete(election)
-    db.commit()
-    return {"message": "Election deleted successfully"}
+    # Cancelled first so the scheduler never opens it; dependent rows are
+    # deleted in batches by a background purge job
+    election.estado = "CANCELADA"
+    return request_purge(db, "ELECCION", election.id, election.tenant_id, current_user.id)
 
 @elections_router.post("/{election_id}/activate", response_model=MessageResponse)
 async def activate_election(
@@ -217,6 +266,10 @@ async def activate_election(
     
     election.estado = "ACTIVA"
     db.commit()
+    
+    # Build the ballot once so voters are served from the published snapshot
+    publish_ballot(db, election)
+    schedule_election(election)
     return {"message": "Election activated successfully"}
 
 @elections_router.post("/{election_id}/close", response_model=MessageResponse)
@@ -248,5 +301,12 @@ async def close_election(
     
     election.estado = "CERRADA"
     db.commit()
+    
+    evict_ballot(db, election.id)
+    # Close the audit chain and publish the results once every ballot already
+    # acknowledged to a voter is stored (write-behind logs on any node)
+    if not await run_in_threadpool(publish_closed_election, db, election.id):
+        schedule_results(election)
+        return {"message": "Election closed; results will be published once its remaining ballots are stored"}
     return {"message": "Election closed successfully"}
 
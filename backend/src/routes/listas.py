@@ -1,24 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import io
 import os
-import uuid as uuid_lib
 from PIL import Image
 from src.database.database import get_db
 from src.models.models import ListaPartido
 from src.schemas.schemas import ListaPartidoCreate, ListaPartidoUpdate, ListaPartido as ListaPartidoSchema, MessageResponse
 from src.utils.dependencies import require_tenant_admin, get_current_active_user
+from src.utils.responses import orm_list_response
+from src.services.storage import get_storage, new_media_key, read_upload_limited
+from src.services.ballot import refresh_tenant_ballots
 import uuid
 
 listas_router = APIRouter()
 
 # Configuration for logo uploads
-UPLOAD_DIR = "uploads/listas"
+MEDIA_PREFIX = "listas"
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".svg"}
 MAX_FILE_SIZE = 2 * 1024 * 1024  # 2MB
 
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 @listas_router.post("/", response_model=ListaPartidoSchema)
 async def create_lista(
     lista_data: ListaPartidoCreate,
@@ -72,7 +74,7 @@ async def get_listas(
         query = query.filter(ListaPartido.tenant_id == current_user.tenant_id)
     
     listas = query.offset(skip).limit(limit).all()
-    return listas
+    return orm_list_response(ListaPartidoSchema, listas)
 
 @listas_router.get("/{lista_id}", response_model=ListaPartidoSchema)
 async def get_lista(
@@ -140,6 +142,9 @@ async def update_lista(
     
     db.commit()
     db.refresh(lista)
+    
+    # Active ballots embed lista names and colors
+    refresh_tenant_ballots(db, lista.tenant_id)
     return lista
 
 @listas_router.delete("/{lista_id}", response_model=MessageResponse)
@@ -174,10 +179,7 @@ async def delete_lista(
     
     # Delete logo file if exists
     if lista.logo_url:
-        try:
-            os.remove(lista.logo_url)
-        except OSError:
-            pass  # File might not exist
+        get_storage().delete(lista.logo_url)
     
     db.delete(lista)
     db.commit()
@@ -219,57 +221,84 @@ async def upload_lista_logo(
             detail="Invalid file format. Allowed: JPG, PNG, WebP, SVG"
         )
     
-    # Check file size
-    file_content = await file.read()
-    if len(file_content) > MAX_FILE_SIZE:
+    # Check file size while spooling the upload in chunks
+    upload = read_upload_limited(file.file, MAX_FILE_SIZE)
+    if upload is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="File too large. Maximum size: 2MB"
         )
     
-    # Generate unique filename
-    filename = f"{uuid_lib.uuid4()}{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
+    storage = get_storage()
+    key = new_media_key(MEDIA_PREFIX, ".svg" if file_ext == ".svg" else ".jpg")
     
-    # Save and process image
+    # Process and store image
     try:
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-        
         # Resize and optimize image (skip for SVG)
         if file_ext != ".svg":
-            with Image.open(file_path) as img:
+            output = io.BytesIO()
+            with Image.open(upload) as img:
                 # Convert to RGB if necessary
                 if img.mode in ("RGBA", "P"):
                     img = img.convert("RGB")
                 
                 # Resize to 200x200 (square logo)
                 img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-                img.save(file_path, "JPEG", quality=90, optimize=True)
+                img.save(output, "JPEG", quality=90, optimize=True)
+            output.seek(0)
+            storage.save(key, output, "image/jpeg")
+        else:
+            storage.save(key, upload, "image/svg+xml")
         
         # Delete old logo if exists
         if lista.logo_url:
-            try:
-                os.remove(lista.logo_url)
-            except OSError:
-                pass
+            storage.delete(lista.logo_url)
         
         # Update lista
-        lista.logo_url = file_path
+        lista.logo_url = key
         db.commit()
+        refresh_tenant_ballots(db, lista.tenant_id)
         
         return {"message": "Logo uploaded successfully"}
     
     except Exception as e:
         # Clean up file if error occurred
-        try:
-            os.remove(file_path)
-        except OSError:
-            pass
+        storage.delete(key)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error processing image"
         )
+    finally:
+        upload.close()
+
+@listas_router.get("/{lista_id}/logo")
+async def get_lista_logo(
+    lista_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """Redirect to a short-lived URL serving the lista logo directly from storage"""
+    lista = db.query(ListaPartido).filter(ListaPartido.id == lista_id).first()
+    if not lista:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Lista not found"
+        )
+    
+    # Check tenant access
+    if current_user.rol != "SUPER_ADMIN" and current_user.tenant_id != lista.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access lista from different tenant"
+        )
+    
+    if not lista.logo_url:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No logo found"
+        )
+    
+    return RedirectResponse(get_storage().url(lista.logo_url))
 
 @listas_router.delete("/{lista_id}/logo", response_model=MessageResponse)
 async def delete_lista_logo(
@@ -299,14 +328,12 @@ async def delete_lista_logo(
         )
     
     # Delete file
-    try:
-        os.remove(lista.logo_url)
-    except OSError:
-        pass  # File might not exist
+    get_storage().delete(lista.logo_url)
     
     # Update lista
     lista.logo_url = None
     db.commit()
+    refresh_tenant_ballots(db, lista.tenant_id)
     
     return {"message": "Logo deleted successfully"}
 
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
+import mimetypes
+import time
+from src.services.storage import get_storage, verify_media_signature, StorageError
+
+media_router = APIRouter()
+
+@media_router.get("/{key:path}")
+async def get_media(
+    key: str,
+    expires: int,
+    signature: str
+):
+    """Stream a media object using a signed URL (local storage backend)"""
+    if not verify_media_signature(key, expires, signature):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired media URL"
+        )
+
+    try:
+        chunks = get_storage().open(key)
+    except StorageError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Media not found"
+        )
+
+    media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Cache-Control": f"private, max-age={max(expires - int(time.time()), 0)}"}
+    )
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from sqlalchemy import desc
+from typing import List
+from src.database.database import get_db
+from src.models.models import TrabajoPurga, User
+from src.schemas.schemas import PurgeJob as PurgeJobSchema
+from src.utils.dependencies import require_tenant_admin
+import uuid
+
+purges_router = APIRouter()
+
+@purges_router.get("/", response_model=List[PurgeJobSchema])
+async def list_purge_jobs(
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_tenant_admin)
+):
+    """List purge jobs (of the current tenant for tenant admins)"""
+    query = db.query(TrabajoPurga)
+    if current_user.rol != "SUPER_ADMIN":
+        query = query.filter(TrabajoPurga.tenant_id == current_user.tenant_id)
+    return query.order_by(desc(TrabajoPurga.fecha_creacion)).offset(skip).limit(limit).all()
+
+@purges_router.get("/{job_id}", response_model=PurgeJobSchema)
+async def get_purge_job(
+    job_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_tenant_admin)
+):
+    """Get the progress of a purge job"""
+    job = db.query(TrabajoPurga).filter(TrabajoPurga.id == job_id).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Purge job not found"
+        )
+    
+    if current_user.rol != "SUPER_ADMIN" and job.tenant_id != current_user.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return job
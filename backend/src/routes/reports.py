@@ -1,14 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, desc
-from typing import Dict, Any, List, Optional
+from sqlalchemy import and_, desc
+from typing import List, Optional
 from datetime import datetime, timedelta
-from src.database.database import get_db
+from src.database.database import get_db, shard_of
+from src.database.shards import fan_out
 from src.models.models import (
     Election, Vote, VotanteEleccion, User, Tenant, 
-    Simulacro, VotoSimulacro, Candidate, Cargo
+    Candidate, Cargo, TrabajoReporte
 )
+from src.schemas.schemas import ReportJobCreate, ReportJob as ReportJobSchema
 from src.utils.dependencies import require_super_admin, get_current_active_user
+from src.utils.responses import DefaultJSONResponse
+from src.services.reports import (
+    parse_report_period, build_platform_usage_report, build_tenant_activity_report, shard_statistics
+)
+from src.services.report_jobs import FINISHED_STATES, enqueue_report_job
+from src.services.storage import get_storage
+from src.services.results import ResultsNotReady, get_results_snapshot
+from src.services.exports import (
+    EXPORT_FORMATS, export_response,
+    participation_rows, PARTICIPATION_COLUMNS,
+    voter_roll_rows, VOTER_ROLL_COLUMNS,
+    hourly_activity_rows, HOURLY_ACTIVITY_COLUMNS,
+    results_rows, RESULTS_COLUMNS
+)
+import asyncio
+import json
 import uuid
 
 reports_router = APIRouter()
@@ -22,115 +41,9 @@ async def get_platform_usage_report(
 ):
     """Get platform usage report for billing purposes"""
     
-    # Parse dates
-    if fecha_inicio:
-        start_date = datetime.fromisoformat(fecha_inicio.replace('Z', '+00:00'))
-    else:
-        start_date = datetime.utcnow() - timedelta(days=30)
-    
-    if fecha_fin:
-        end_date = datetime.fromisoformat(fecha_fin.replace('Z', '+00:00'))
-    else:
-        end_date = datetime.utcnow()
-    
-    # Get usage data per tenant
-    tenant_usage = []
-    tenants = db.query(Tenant).all()
-    
-    for tenant in tenants:
-        # Elections in period
-        elections_query = db.query(Election).filter(
-            and_(
-                Election.tenant_id == tenant.id,
-                Election.fecha_creacion >= start_date,
-                Election.fecha_creacion <= end_date
-            )
-        )
-        
-        total_elections = elections_query.count()
-        completed_elections = elections_query.filter(Election.estado == "CERRADA").count()
-        
-        # Voters registered in period
-        voters_registered = db.query(VotanteEleccion).join(Election).filter(
-            and_(
-                Election.tenant_id == tenant.id,
-                Election.fecha_creacion >= start_date,
-                Election.fecha_creacion <= end_date
-            )
-        ).count()
-        
-        # Actual votes cast
-        votes_cast = db.query(Vote).join(Election).filter(
-            and_(
-                Election.tenant_id == tenant.id,
-                Vote.timestamp >= start_date,
-                Vote.timestamp <= end_date
-            )
-        ).count()
-        
-        # Simulations run
-        simulations_run = db.query(Simulacro).join(Election).filter(
-            and_(
-                Election.tenant_id == tenant.id,
-                Simulacro.fecha_creacion >= start_date,
-                Simulacro.fecha_creacion <= end_date
-            )
-        ).count()
-        
-        # Calculate billing metrics
-        # Base pricing model (example)
-        base_cost = 50.0  # Base monthly cost
-        election_cost = total_elections * 25.0  # $25 per election
-        voter_cost = voters_registered * 0.10  # $0.10 per registered voter
-        vote_cost = votes_cast * 0.05  # $0.05 per vote cast
-        simulation_cost = simulations_run * 5.0  # $5 per simulation
-        
-        total_cost = base_cost + election_cost + voter_cost + vote_cost + simulation_cost
-        
-        tenant_usage.append({
-            "tenant_id": str(tenant.id),
-            "tenant_name": tenant.nombre,
-            "tenant_email": tenant.email_contacto,
-            "tenant_country": tenant.pais,
-            "tenant_active": tenant.activo,
-            "usage_metrics": {
-                "total_elections": total_elections,
-                "completed_elections": completed_elections,
-                "voters_registered": voters_registered,
-                "votes_cast": votes_cast,
-                "simulations_run": simulations_run
-            },
-            "billing": {
-                "base_cost": base_cost,
-                "election_cost": election_cost,
-                "voter_cost": voter_cost,
-                "vote_cost": vote_cost,
-                "simulation_cost": simulation_cost,
-                "total_cost": round(total_cost, 2)
-            }
-        })
-    
-    # Calculate totals
-    total_metrics = {
-        "total_tenants": len(tenants),
-        "active_tenants": sum(1 for t in tenant_usage if t["tenant_active"]),
-        "total_elections": sum(t["usage_metrics"]["total_elections"] for t in tenant_usage),
-        "total_voters": sum(t["usage_metrics"]["voters_registered"] for t in tenant_usage),
-        "total_votes": sum(t["usage_metrics"]["votes_cast"] for t in tenant_usage),
-        "total_simulations": sum(t["usage_metrics"]["simulations_run"] for t in tenant_usage),
-        "total_revenue": sum(t["billing"]["total_cost"] for t in tenant_usage)
-    }
+    start_date, end_date = parse_report_period(fecha_inicio, fecha_fin)
     
-    return {
-        "report_period": {
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat(),
-            "days": (end_date - start_date).days
-        },
-        "summary": total_metrics,
-        "tenant_details": tenant_usage,
-        "generated_at": datetime.utcnow().isoformat()
-    }
+    return DefaultJSONResponse(build_platform_usage_report(db, start_date, end_date))
 
 @reports_router.get("/tenant/{tenant_id}/actividad")
 async def get_tenant_activity_report(
@@ -161,104 +74,9 @@ async def get_tenant_activity_report(
             detail="Tenant not found"
         )
     
-    # Parse dates
-    if fecha_inicio:
-        start_date = datetime.fromisoformat(fecha_inicio.replace('Z', '+00:00'))
-    else:
-        start_date = datetime.utcnow() - timedelta(days=30)
-    
-    if fecha_fin:
-        end_date = datetime.fromisoformat(fecha_fin.replace('Z', '+00:00'))
-    else:
-        end_date = datetime.utcnow()
-    
-    # Get elections in period
-    elections = db.query(Election).filter(
-        and_(
-            Election.tenant_id == tenant_id,
-            Election.fecha_creacion >= start_date,
-            Election.fecha_creacion <= end_date
-        )
-    ).all()
-    
-    election_details = []
-    for election in elections:
-        # Get participation data
-        total_registered = db.query(VotanteEleccion).filter(
-            VotanteEleccion.eleccion_id == election.id
-        ).count()
-        
-        total_voted = db.query(VotanteEleccion).filter(
-            and_(
-                VotanteEleccion.eleccion_id == election.id,
-                VotanteEleccion.ha_votado == True
-            )
-        ).count()
-        
-        participation_rate = (total_voted / total_registered * 100) if total_registered > 0 else 0
-        
-        # Get candidates count
-        candidates_count = db.query(Candidate).join(Cargo).filter(
-            Cargo.eleccion_id == election.id
-        ).count()
-        
-        election_details.append({
-            "election_id": str(election.id),
-            "title": election.titulo,
-            "description": election.descripcion,
-            "status": election.estado,
-            "start_date": election.fecha_inicio.isoformat() if election.fecha_inicio else None,
-            "end_date": election.fecha_fin.isoformat() if election.fecha_fin else None,
-            "created_date": election.fecha_creacion.isoformat(),
-            "participation": {
-                "registered_voters": total_registered,
-                "votes_cast": total_voted,
-                "participation_rate": round(participation_rate, 2)
-            },
-            "candidates_count": candidates_count
-        })
-    
-    # Get user activity
-    users_created = db.query(User).filter(
-        and_(
-            User.tenant_id == tenant_id,
-            User.fecha_creacion >= start_date,
-            User.fecha_creacion <= end_date
-        )
-    ).count()
+    start_date, end_date = parse_report_period(fecha_inicio, fecha_fin)
     
-    # Get simulations
-    simulations = db.query(Simulacro).join(Election).filter(
-        and_(
-            Election.tenant_id == tenant_id,
-            Simulacro.fecha_creacion >= start_date,
-            Simulacro.fecha_creacion <= end_date
-        )
-    ).count()
-    
-    return {
-        "tenant_info": {
-            "tenant_id": str(tenant_id),
-            "name": tenant.nombre,
-            "email": tenant.email_contacto,
-            "country": tenant.pais,
-            "timezone": tenant.zona_horaria,
-            "active": tenant.activo
-        },
-        "report_period": {
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat()
-        },
-        "summary": {
-            "total_elections": len(elections),
-            "completed_elections": len([e for e in elections if e.estado == "CERRADA"]),
-            "active_elections": len([e for e in elections if e.estado == "ACTIVA"]),
-            "total_simulations": simulations,
-            "new_users": users_created
-        },
-        "elections": election_details,
-        "generated_at": datetime.utcnow().isoformat()
-    }
+    return DefaultJSONResponse(build_tenant_activity_report(db, tenant, start_date, end_date))
 
 @reports_router.get("/eleccion/{election_id}/completo")
 async def get_complete_election_report(
@@ -317,6 +135,14 @@ async def get_complete_election_report(
     
     participation_rate = (total_voted / total_registered * 100) if total_registered > 0 else 0
     
+    # Vote counts come from the close-time results snapshot
+    results = {}
+    if incluir_resultados and election.estado == "CERRADA":
+        try:
+            results = json.loads(get_results_snapshot(db, election).contenido)["results"]
+        except ResultsNotReady as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
     # Get candidates and cargos
     cargos = db.query(Cargo).filter(Cargo.eleccion_id == election_id).all()
     cargo_details = []
@@ -329,23 +155,21 @@ async def get_complete_election_report(
             candidate_info = {
                 "candidate_id": str(candidate.id),
                 "name": f"{candidate.nombre} {candidate.apellido}",
-                "party": candidate.partido,
+                "party": candidate.lista.nombre if candidate.lista else None,
                 "has_photo": candidate.foto_url is not None
             }
             
             # Add vote count if results are included
             if incluir_resultados and election.estado == "CERRADA":
-                # Simplified vote counting
-                vote_count = 0  # In production, decrypt and count actual votes
-                candidate_info["votes"] = vote_count
-                candidate_info["percentage"] = 0.0
+                candidate_result = results.get(str(candidate.id), {})
+                candidate_info["votes"] = candidate_result.get("votes", 0)
+                candidate_info["percentage"] = candidate_result.get("percentage", 0.0)
             
             candidate_list.append(candidate_info)
         
         cargo_details.append({
             "cargo_id": str(cargo.id),
             "name": cargo.nombre,
-            "description": cargo.descripcion,
             "max_candidates": cargo.max_candidatos_a_elegir,
             "candidates": candidate_list
         })
@@ -402,48 +226,151 @@ async def get_complete_election_report(
         "includes_results": incluir_resultados and election.estado == "CERRADA"
     }
     
-    return report
+    return DefaultJSONResponse(report)
 
-@reports_router.get("/super-admin/estadisticas-globales")
-async def get_global_statistics(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_super_admin)
-):
-    """Get global platform statistics"""
+def _validate_export_format(formato: str):
+    if formato not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format. Allowed: {', '.join(EXPORT_FORMATS)}"
+        )
+
+def _get_exportable_election(db: Session, election_id: uuid.UUID, current_user: User) -> Election:
+    election = db.query(Election).filter(Election.id == election_id).first()
+    if not election:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Election not found"
+        )
     
-    # Get overall statistics
-    total_tenants = db.query(Tenant).count()
-    active_tenants = db.query(Tenant).filter(Tenant.activo == True).count()
+    if current_user.rol not in ["SUPER_ADMIN", "TENANT_ADMIN"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
     
-    total_elections = db.query(Election).count()
-    active_elections = db.query(Election).filter(Election.estado == "ACTIVA").count()
-    completed_elections = db.query(Election).filter(Election.estado == "CERRADA").count()
+    # Check tenant access
+    if current_user.rol != "SUPER_ADMIN" and current_user.tenant_id != election.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access election from different tenant"
+        )
+    return election
+
+@reports_router.get("/tenant/{tenant_id}/exportar/participacion")
+async def export_tenant_participation(
+    tenant_id: uuid.UUID,
+    formato: str = "csv",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream per-election participation of a tenant as CSV or NDJSON"""
+    _validate_export_format(formato)
     
-    total_users = db.query(User).count()
-    total_voters = db.query(User).filter(User.rol == "VOTANTE").count()
+    # Check permissions
+    if current_user.rol == "SUPER_ADMIN":
+        pass
+    elif current_user.rol == "TENANT_ADMIN" and current_user.tenant_id == tenant_id:
+        pass
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
     
-    total_votes = db.query(Vote).count()
-    total_simulations = db.query(Simulacro).count()
+    if not db.query(Tenant.id).filter(Tenant.id == tenant_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tenant not found"
+        )
     
-    # Get statistics by country
-    country_stats = db.query(
-        Tenant.pais,
-        func.count(Tenant.id).label('tenants'),
-        func.count(Election.id).label('elections')
-    ).outerjoin(Election).group_by(Tenant.pais).all()
+    return export_response(
+        participation_rows(tenant_id, shard_of(db)), PARTICIPATION_COLUMNS, formato, f"participacion_{tenant_id}"
+    )
+
+@reports_router.get("/eleccion/{election_id}/exportar/padron")
+async def export_voter_roll(
+    election_id: uuid.UUID,
+    formato: str = "csv",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream the voter roll of an election (with ha_votado) as CSV or NDJSON"""
+    _validate_export_format(formato)
+    _get_exportable_election(db, election_id, current_user)
     
-    # Get recent activity (last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    return export_response(
+        voter_roll_rows(election_id, shard_of(db)), VOTER_ROLL_COLUMNS, formato, f"padron_{election_id}"
+    )
+
+@reports_router.get("/eleccion/{election_id}/exportar/actividad-horaria")
+async def export_hourly_activity(
+    election_id: uuid.UUID,
+    formato: str = "csv",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream votes cast per hour for an election as CSV or NDJSON"""
+    _validate_export_format(formato)
+    _get_exportable_election(db, election_id, current_user)
     
-    recent_elections = db.query(Election).filter(
-        Election.fecha_creacion >= thirty_days_ago
-    ).count()
+    return export_response(
+        hourly_activity_rows(election_id, shard_of(db)), HOURLY_ACTIVITY_COLUMNS, formato, f"actividad_{election_id}"
+    )
+
+@reports_router.get("/eleccion/{election_id}/exportar/resultados")
+async def export_election_results(
+    election_id: uuid.UUID,
+    formato: str = "csv",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream per-candidate results of a closed election as CSV or NDJSON"""
+    _validate_export_format(formato)
+    election = _get_exportable_election(db, election_id, current_user)
     
-    recent_votes = db.query(Vote).filter(
-        Vote.timestamp >= thirty_days_ago
-    ).count()
+    if election.estado != "CERRADA":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Results only available for closed elections"
+        )
+    # Build (or refuse) the snapshot before the response starts streaming
+    try:
+        get_results_snapshot(db, election)
+    except ResultsNotReady as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    return export_response(
+        results_rows(election_id, shard_of(db)), RESULTS_COLUMNS, formato, f"resultados_{election_id}"
+    )
+
+@reports_router.get("/super-admin/estadisticas-globales")
+async def get_global_statistics(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_super_admin)
+):
+    """Get global platform statistics"""
     
-    return {
+    # Counts are per shard; add them up
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    totals: dict = {}
+    countries: dict = {}
+    for _, (counts, country_stats) in fan_out(shard_statistics, thirty_days_ago, db=db):
+        for key, value in counts.items():
+            totals[key] = totals.get(key, 0) + value
+        for country, tenants, elections in country_stats:
+            merged = countries.setdefault(country, [0, 0])
+            merged[0] += tenants
+            merged[1] += elections or 0
+    
+    total_tenants, active_tenants = totals["total_tenants"], totals["active_tenants"]
+    total_elections, active_elections = totals["total_elections"], totals["active_elections"]
+    completed_elections = totals["completed_elections"]
+    total_users, total_voters = totals["total_users"], totals["total_voters"]
+    total_votes, total_simulations = totals["total_votes"], totals["total_simulations"]
+    recent_elections, recent_votes = totals["recent_elections"], totals["recent_votes"]
+    
+    return DefaultJSONResponse({
         "global_statistics": {
             "tenants": {
                 "total": total_tenants,
@@ -474,8 +401,132 @@ async def get_global_statistics(
                 "tenants": tenants,
                 "elections": elections or 0
             }
-            for country, tenants, elections in country_stats
+            for country, (tenants, elections) in countries.items()
         ],
         "generated_at": datetime.utcnow().isoformat()
-    }
+    })
+
+
+# Background report jobs
 
+# Upper bound for the long-poll wait on a job, in seconds
+REPORT_JOB_MAX_WAIT = 30
+REPORT_JOB_POLL_INTERVAL = 0.5
+
+def _get_report_job(db: Session, job_id: uuid.UUID, current_user: User) -> TrabajoReporte:
+    job = db.query(TrabajoReporte).filter(TrabajoReporte.id == job_id).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report job not found"
+        )
+    
+    if current_user.rol != "SUPER_ADMIN" and job.solicitado_por != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return job
+
+@reports_router.post("/jobs", response_model=ReportJobSchema, status_code=status.HTTP_202_ACCEPTED)
+async def create_report_job(
+    job_data: ReportJobCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue a report to be built in the background"""
+    
+    # Check permissions
+    if job_data.tipo == "USO_PLATAFORMA":
+        if current_user.rol != "SUPER_ADMIN":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+    else:
+        if not job_data.tenant_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="tenant_id is required for this report"
+            )
+        if current_user.rol != "SUPER_ADMIN" and not (
+            current_user.rol == "TENANT_ADMIN" and current_user.tenant_id == job_data.tenant_id
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        if not db.query(Tenant.id).filter(Tenant.id == job_data.tenant_id).first():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Tenant not found"
+            )
+    
+    # Reject malformed periods now rather than failing inside the worker
+    try:
+        parse_report_period(job_data.fecha_inicio, job_data.fecha_fin)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format"
+        )
+    
+    job = TrabajoReporte(
+        tipo=job_data.tipo.value,
+        parametros=json.dumps({"fecha_inicio": job_data.fecha_inicio, "fecha_fin": job_data.fecha_fin}),
+        solicitado_por=current_user.id,
+        tenant_id=job_data.tenant_id if job_data.tipo == "ACTIVIDAD_TENANT" else None
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    
+    enqueue_report_job(job.id, shard_of(db))
+    return job
+
+@reports_router.get("/jobs", response_model=List[ReportJobSchema])
+async def list_report_jobs(
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """List report jobs requested by the current user"""
+    jobs = db.query(TrabajoReporte).filter(
+        TrabajoReporte.solicitado_por == current_user.id
+    ).order_by(desc(TrabajoReporte.fecha_creacion)).offset(skip).limit(limit).all()
+    return jobs
+
+@reports_router.get("/jobs/{job_id}", response_model=ReportJobSchema)
+async def get_report_job(
+    job_id: uuid.UUID,
+    esperar: int = 0,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get a report job; with ?esperar=N, wait up to N seconds for it to finish"""
+    job = _get_report_job(db, job_id, current_user)
+    
+    deadline = asyncio.get_running_loop().time() + min(max(esperar, 0), REPORT_JOB_MAX_WAIT)
+    while job.estado not in FINISHED_STATES and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(REPORT_JOB_POLL_INTERVAL)
+        db.refresh(job)
+    
+    return job
+
+@reports_router.get("/jobs/{job_id}/descargar")
+async def download_report_job(
+    job_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Redirect to the stored report artifact of a completed job"""
+    job = _get_report_job(db, job_id, current_user)
+    
+    if job.estado != "COMPLETADO" or not job.artefacto:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Report is not ready"
+        )
+    
+    return RedirectResponse(get_storage().url(job.artefacto))
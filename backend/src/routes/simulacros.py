@@ -1,13 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
 import json
 from src.database.database import get_db
-from src.models.models import Simulacro, VotoSimulacro, Election, User
-from src.schemas.schemas import SimulacroCreate, Simulacro as SimulacroSchema, MessageResponse
+from src.models.models import Simulacro, VotoSimulacro, Election, User, Candidate, Cargo
+from src.schemas.schemas import SimulacroCreate, Simulacro as SimulacroSchema, MessageResponse, SimulationLoad, PurgeJob
 from src.utils.dependencies import require_tenant_admin, get_current_active_user
+from src.utils.responses import orm_list_response
 from src.utils.crypto import encrypt_vote
+from src.services.idempotency import IdempotencyGuard, idempotency_guard
+from src.services.purge import request_purge
+from src.services.simulation import SIMULATION_MAX_BALLOTS, add_to_tally, generate_simulation_votes, simulation_tally
 import uuid
 
 simulacros_router = APIRouter()
@@ -61,7 +66,7 @@ async def get_simulacros(
         query = query.filter(Simulacro.eleccion_id == eleccion_id)
     
     simulacros = query.offset(skip).limit(limit).all()
-    return simulacros
+    return orm_list_response(SimulacroSchema, simulacros)
 
 @simulacros_router.get("/{simulacro_id}", response_model=SimulacroSchema)
 async def get_simulacro(
@@ -92,9 +97,13 @@ async def cast_simulation_vote(
     candidatos_seleccionados: List[uuid.UUID],
     votante_prueba: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    idempotency: IdempotencyGuard = Depends(idempotency_guard)
 ):
     """Cast a vote in a simulation"""
+    if idempotency.replay is not None:
+        return idempotency.replay
+    
     # Validate simulation exists and is active
     simulacro = db.query(Simulacro).join(Election).filter(Simulacro.id == simulacro_id).first()
     if not simulacro:
@@ -116,6 +125,18 @@ async def cast_simulation_vote(
             detail="Simulation is not active"
         )
     
+    # Validate candidates exist and belong to the simulated election
+    selected = set(candidatos_seleccionados)
+    valid = db.query(Candidate.id).join(Cargo).filter(
+        Candidate.id.in_(selected),
+        Cargo.eleccion_id == simulacro.eleccion_id
+    ).count()
+    if valid != len(selected):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="One or more candidates not found or don't belong to this election"
+        )
+    
     # Create simulation vote data
     vote_content = {
         "simulacro_id": str(simulacro_id),
@@ -134,9 +155,58 @@ async def cast_simulation_vote(
         voto_cifrado=voto_cifrado
     )
     db.add(db_vote)
+    add_to_tally(db, simulacro_id, {str(c_id): 1 for c_id in selected}, 1)
     db.commit()
     
-    return {"message": "Simulation vote cast successfully"}
+    return idempotency.store({"message": "Simulation vote cast successfully"})
+
+@simulacros_router.post("/{simulacro_id}/generar")
+async def generate_simulation_load(
+    simulacro_id: uuid.UUID,
+    load: SimulationLoad,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_tenant_admin)
+):
+    """Generate synthetic ballots for a simulation from the election's ballot definition"""
+    simulacro = db.query(Simulacro).join(Election).filter(Simulacro.id == simulacro_id).first()
+    if not simulacro:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Simulation not found"
+        )
+    
+    # Check tenant access
+    if current_user.rol != "SUPER_ADMIN" and current_user.tenant_id != simulacro.eleccion.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot generate votes for simulation from different tenant"
+        )
+    
+    if not simulacro.activo:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Simulation is not active"
+        )
+    
+    if load.cantidad > SIMULATION_MAX_BALLOTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot generate more than {SIMULATION_MAX_BALLOTS} votes per request"
+        )
+    
+    distribution = None
+    if load.distribucion is not None:
+        distribution = {str(candidate_id): weight for candidate_id, weight in load.distribucion.items()}
+    
+    try:
+        return await run_in_threadpool(
+            generate_simulation_votes, db, simulacro, load.cantidad, distribution, load.prefijo_votante, load.semilla
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 @simulacros_router.get("/{simulacro_id}/resultados")
 async def get_simulation_results(
@@ -160,23 +230,8 @@ async def get_simulation_results(
             detail="Cannot access simulation from different tenant"
         )
     
-    # Get all simulation votes
-    votes = db.query(VotoSimulacro).filter(VotoSimulacro.simulacro_id == simulacro_id).all()
-    
-    # Count votes (simplified)
-    results = {}
-    total_votes = len(votes)
-    
-    for vote in votes:
-        try:
-            # Simplified vote counting
-            vote_data = json.loads(vote.voto_cifrado.replace("ENCRYPTED:", ""))
-            for candidate_id in vote_data.get("candidatos", []):
-                if candidate_id not in results:
-                    results[candidate_id] = 0
-                results[candidate_id] += 1
-        except:
-            continue
+    # Counters are kept up to date as simulation votes are inserted
+    total_votes, results = simulation_tally(db, simulacro)
     
     return {
         "simulacro_id": str(simulacro_id),
@@ -212,7 +267,7 @@ async def toggle_simulation(
     status_text = "activated" if simulacro.activo else "deactivated"
     return {"message": f"Simulation {status_text} successfully"}
 
-@simulacros_router.delete("/{simulacro_id}", response_model=MessageResponse)
+@simulacros_router.delete("/{simulacro_id}", response_model=PurgeJob, status_code=status.HTTP_202_ACCEPTED)
 async def delete_simulation(
     simulacro_id: uuid.UUID,
     db: Session = Depends(get_db),
@@ -233,12 +288,7 @@ async def delete_simulation(
             detail="Cannot delete simulation from different tenant"
         )
     
-    # Delete all simulation votes first
-    db.query(VotoSimulacro).filter(VotoSimulacro.simulacro_id == simulacro_id).delete()
-    
-    # Delete simulation
-    db.delete(simulacro)
-    db.commit()
-    
-    return {"message": "Simulation deleted successfully"}
+    # Votes and counters are deleted in batches by a background purge job
+    simulacro.activo = False
+    return request_purge(db, "SIMULACRO", simulacro.id, simulacro.eleccion.tenant_id, current_user.id)
 
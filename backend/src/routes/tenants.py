@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
-from src.database.database import get_db
-from src.models.models import Tenant, User
-from src.schemas.schemas import TenantCreate, TenantUpdate, Tenant as TenantSchema, MessageResponse
+from src.database.database import get_db, session_for_shard, shard_of
+from src.database.shards import shard_for_tenant
+from src.models.models import Election, Tenant, User
+from src.schemas.schemas import TenantCreate, TenantUpdate, Tenant as TenantSchema, PurgeJob
 from src.utils.dependencies import require_super_admin
+from src.utils.responses import orm_list_response
+from src.services.purge import request_purge
 import uuid
 
 tenants_router = APIRouter()
@@ -41,7 +44,7 @@ async def get_tenants(
 ):
     """Get all tenants (Super Admin only)"""
     tenants = db.query(Tenant).offset(skip).limit(limit).all()
-    return tenants
+    return orm_list_response(TenantSchema, tenants)
 
 @tenants_router.get("/{tenant_id}", response_model=TenantSchema)
 async def get_tenant(
@@ -82,7 +85,7 @@ async def update_tenant(
     db.refresh(tenant)
     return tenant
 
-@tenants_router.delete("/{tenant_id}", response_model=MessageResponse)
+@tenants_router.delete("/{tenant_id}", response_model=PurgeJob, status_code=status.HTTP_202_ACCEPTED)
 async def delete_tenant(
     tenant_id: uuid.UUID,
     db: Session = Depends(get_db),
@@ -96,15 +99,34 @@ async def delete_tenant(
             detail="Tenant not found"
         )
     
-    # Check if tenant has users or elections
-    user_count = db.query(User).filter(User.tenant_id == tenant_id).count()
-    if user_count > 0:
+    home = shard_for_tenant(tenant_id)
+    if home == shard_of(db):
+        return _purge_tenant(db, tenant_id, current_user)
+    
+    # The tenant's data lives on another shard: purge it there, then the
+    # directory row (and shard map entry) kept on this one
+    home_db = session_for_shard(home)
+    try:
+        job = _purge_tenant(home_db, tenant_id, current_user)
+    finally:
+        home_db.close()
+    _purge_tenant(db, tenant_id, current_user)
+    return job
+
+def _purge_tenant(db: Session, tenant_id: uuid.UUID, current_user: User):
+    # Active elections must be closed first
+    if db.query(Election.id).filter(Election.tenant_id == tenant_id, Election.estado == "ACTIVA").first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Cannot delete tenant with existing users"
+            detail="Cannot delete tenant with active elections"
         )
     
-    db.delete(tenant)
-    db.commit()
-    return {"message": "Tenant deleted successfully"}
+    # Deactivated now; elections, listas, users and the tenant itself are
+    # deleted in batches by a background purge job
+    db.query(Tenant).filter(Tenant.id == tenant_id).update({"activo": False}, synchronize_session=False)
+    db.query(Election).filter(
+        Election.tenant_id == tenant_id,
+        Election.estado == "PENDIENTE"
+    ).update({"estado": "CANCELADA"}, synchronize_session=False)
+    return request_purge(db, "TENANT", tenant_id, tenant_id, current_user.id)
 
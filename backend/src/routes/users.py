@@ -5,7 +5,9 @@ from src.database.database import get_db
 from src.models.models import User, Tenant
 from src.schemas.schemas import UserCreate, UserUpdate, User as UserSchema, MessageResponse
 from src.utils.dependencies import require_tenant_admin, require_super_admin, get_current_active_user
+from src.utils.responses import orm_list_response
 from src.utils.auth import get_password_hash
+from src.services.idempotency import IdempotencyGuard, idempotency_guard
 import uuid
 
 users_router = APIRouter()
@@ -14,9 +16,13 @@ users_router = APIRouter()
 async def create_user(
     user_data: UserCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_tenant_admin)
+    current_user: User = Depends(require_tenant_admin),
+    idempotency: IdempotencyGuard = Depends(idempotency_guard)
 ):
     """Create a new user"""
+    if idempotency.replay is not None:
+        return idempotency.replay
+    
     # Check if email already exists
     existing_user = db.query(User).filter(User.email == user_data.email).first()
     if existing_user:
@@ -51,14 +57,14 @@ async def create_user(
     
     # Create user
     user_dict = user_data.dict()
-    user_dict["password"] = get_password_hash(user_data.password)
+    user_dict["password_hash"] = get_password_hash(user_dict.pop("password"))
     
     db_user = User(**user_dict)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
     
-    return db_user
+    return idempotency.store(UserSchema.model_validate(db_user))
 
 @users_router.get("/", response_model=List[UserSchema])
 async def get_users(
@@ -84,7 +90,7 @@ async def get_users(
         query = query.filter(User.rol == rol)
     
     users = query.offset(skip).limit(limit).all()
-    return users
+    return orm_list_response(UserSchema, users)
 
 @users_router.get("/{user_id}", response_model=UserSchema)
 async def get_user(
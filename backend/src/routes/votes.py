@@ -1,25 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
 from datetime import datetime
 import json
 import hashlib
 import uuid as uuid_lib
-from src.database.database import get_db
+from src.database.database import get_db, shard_of
 from src.models.models import Vote, Election, User, VotanteEleccion, Candidate, Cargo
-from src.schemas.schemas import VoteCreate, Vote as VoteSchema, MessageResponse
+from src.schemas.schemas import VoteCreate, Vote as VoteSchema, VoteReceipt, VoterWeight, MessageResponse
 from src.utils.dependencies import get_current_active_user
-from src.utils.crypto import encrypt_vote, create_vote_signature
+from src.utils.ids import ballot_id, ballot_timestamp
+from src.utils.crypto import encrypt_vote, create_vote_signature, ballot_receipt, get_signing_public_key_pem
+from src.services.ballot_log import get_ballot_log, relax_commit_durability
+from src.services.merkle import EMPTY_ROOT, get_tree, inclusion_proof
+from src.services.sealer import notify_ballots
+from src.services.homomorphic import encrypt_ballot
+from src.services.results import ResultsNotReady, get_results_snapshot
+from src.services.idempotency import IdempotencyGuard, idempotency_guard
 
 votes_router = APIRouter()
 
-@votes_router.post("/", response_model=MessageResponse)
+@votes_router.post("/", response_model=VoteReceipt)
 async def cast_vote(
     vote_data: VoteCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    idempotency: IdempotencyGuard = Depends(idempotency_guard)
 ):
     """Cast a vote in an election"""
+    # A retried request gets the original response without being re-processed
+    if idempotency.replay is not None:
+        return idempotency.replay
+    
     # Validate election exists and is active
     election = db.query(Election).filter(Election.id == vote_data.eleccion_id).first()
     if not election:
@@ -90,45 +102,106 @@ async def cast_vote(
                 detail=f"Too many candidates selected for cargo: {cargo.nombre}"
             )
     
-    # Create vote data structure
-    vote_content = {
-        "eleccion_id": str(vote_data.eleccion_id),
-        "candidatos": [str(c_id) for c_id in vote_data.candidatos_seleccionados],
-        "timestamp": datetime.utcnow().isoformat(),
-        "votante_hash": hashlib.sha256(str(current_user.id).encode()).hexdigest()[:16]
-    }
+    # Consume the voter's eligibility atomically. Concurrent requests from the
+    # same voter (double click, retries) race on this conditional UPDATE and
+    # only one of them matches the row; the rest are rejected before writing.
+    # It also requires the election to still be active, so no ballot is
+    # accepted once closing has started waiting for the stored ones.
+    still_active = db.query(Election.id).filter(
+        Election.id == vote_data.eleccion_id,
+        Election.estado == "ACTIVA"
+    ).exists()
+    consumed = db.query(VotanteEleccion).filter(
+        VotanteEleccion.eleccion_id == vote_data.eleccion_id,
+        VotanteEleccion.votante_id == current_user.id,
+        VotanteEleccion.ha_votado == False,
+        still_active
+    ).update({"ha_votado": True}, synchronize_session=False)
+    
+    if not consumed:
+        db.rollback()
+        closed = not db.query(still_active).scalar()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Election is not active" if closed else "User has already voted in this election"
+        )
     
-    # Encrypt vote
-    voto_cifrado = encrypt_vote(json.dumps(vote_content))
+    if election.cifrado_votos == "HOMOMORFICO":
+        # Tallied without ever decrypting this ballot
+        voto_cifrado = encrypt_ballot(db, election, vote_data.candidatos_seleccionados, votante_eleccion.peso)
+    else:
+        # Create vote data structure
+        vote_content = {
+            "eleccion_id": str(vote_data.eleccion_id),
+            "candidatos": [str(c_id) for c_id in vote_data.candidatos_seleccionados],
+            "timestamp": datetime.utcnow().isoformat(),
+            "votante_hash": hashlib.sha256(str(current_user.id).encode()).hexdigest()[:16],
+            "peso": votante_eleccion.peso
+        }
+        
+        # Encrypt vote
+        voto_cifrado = encrypt_vote(json.dumps(vote_content))
     
     # Create digital signature
     firma_digital = create_vote_signature(voto_cifrado, str(current_user.id))
+    receipt = ballot_receipt(voto_cifrado, firma_digital)
+    
+    ballot_log = get_ballot_log()
+    if ballot_log:
+        # Write-behind mode: the ballot is made durable by the log's group
+        # fsync and reaches `votos` in the writer's next batch
+        vote_id = ballot_id(election.anonima)
+        record = {
+            "id": str(vote_id),
+            "eleccion_id": str(vote_data.eleccion_id),
+            "votante_id": str(current_user.id),
+            "voto_cifrado": voto_cifrado,
+            "firma_digital": firma_digital,
+            "timestamp": ballot_timestamp(vote_id).isoformat(),
+            "shard": shard_of(db)
+        }
+        relax_commit_durability(db)
+        db.commit()
+        # Don't hold a pooled connection while waiting for the group fsync
+        db.close()
+        try:
+            await ballot_log.append(record)
+        except Exception:
+            # Give the voter their eligibility back: the ballot was not stored
+            db.query(VotanteEleccion).filter(
+                VotanteEleccion.eleccion_id == vote_data.eleccion_id,
+                VotanteEleccion.votante_id == uuid_lib.UUID(record["votante_id"])
+            ).update({"ha_votado": False}, synchronize_session=False)
+            db.commit()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Vote could not be recorded, please retry"
+            )
+        return idempotency.store({"message": "Vote cast successfully", "receipt": receipt})
     
-    # Create blockchain hash (simplified)
-    previous_vote = db.query(Vote).filter(Vote.eleccion_id == vote_data.eleccion_id).order_by(Vote.timestamp.desc()).first()
-    previous_hash = previous_vote.hash_bloque if previous_vote else "genesis"
-    current_hash = hashlib.sha256(f"{previous_hash}{voto_cifrado}{firma_digital}".encode()).hexdigest()
-    
-    # Save vote
+    # Save vote unchained; the sealer adds it to the election's next block
+    # and Merkle tree, so concurrent votes don't contend on a chain head
+    vote_id = ballot_id(election.anonima)
     db_vote = Vote(
+        id=vote_id,
         eleccion_id=vote_data.eleccion_id,
         votante_id=current_user.id,
         voto_cifrado=voto_cifrado,
         firma_digital=firma_digital,
-        hash_bloque=current_hash
+        timestamp=ballot_timestamp(vote_id)
     )
     db.add(db_vote)
     
-    # Mark user as voted
-    votante_eleccion.ha_votado = True
-    
+    # Vote and eligibility consumption commit together
     db.commit()
+    notify_ballots(vote_data.eleccion_id)
     
-    return {"message": "Vote cast successfully"}
+    return idempotency.store({"message": "Vote cast successfully", "receipt": receipt})
 
 @votes_router.get("/eleccion/{election_id}/resultados")
 async def get_election_results(
     election_id: uuid_lib.UUID,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -155,48 +228,21 @@ async def get_election_results(
             detail="Results only available for closed elections"
         )
     
-    # Get all votes for this election
-    votes = db.query(Vote).filter(Vote.eleccion_id == election_id).all()
-    
-    # Decrypt and count votes (simplified - in production use proper decryption)
-    results = {}
-    total_votes = len(votes)
-    
-    # Get all candidates for this election
-    candidates = db.query(Candidate).join(Cargo).filter(Cargo.eleccion_id == election_id).all()
-    
-    # Initialize results
-    for candidate in candidates:
-        results[str(candidate.id)] = {
-            "candidate_name": f"{candidate.nombre} {candidate.apellido}",
-            "cargo": candidate.cargo.nombre,
-            "votes": 0,
-            "percentage": 0.0
-        }
+    # Closed elections are immutable: serve the signed close-time snapshot
+    try:
+        snapshot = get_results_snapshot(db, election)
+    except ResultsNotReady as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    headers = {
+        "ETag": f'"{snapshot.etag}"',
+        "Cache-Control": "private, no-cache",
+        "X-Results-Signature": snapshot.firma
+    }
     
-    # Count votes (simplified counting - in production decrypt properly)
-    for vote in votes:
-        try:
-            # This is a simplified version - in production, properly decrypt the vote
-            # For now, we'll simulate vote counting
-            vote_data = json.loads(vote.voto_cifrado.replace("ENCRYPTED:", ""))
-            for candidate_id in vote_data.get("candidatos", []):
-                if candidate_id in results:
-                    results[candidate_id]["votes"] += 1
-        except:
-            continue
-    
-    # Calculate percentages
-    for candidate_id in results:
-        if total_votes > 0:
-            results[candidate_id]["percentage"] = (results[candidate_id]["votes"] / total_votes) * 100
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    return {
-        "election_id": str(election_id),
-        "election_title": election.titulo,
-        "total_votes": total_votes,
-        "results": results
-    }
+    return Response(content=snapshot.contenido.encode(), media_type="application/json", headers=headers)
 
 @votes_router.get("/eleccion/{election_id}/participacion")
 async def get_election_participation(
@@ -242,9 +288,13 @@ async def register_voters(
     election_id: uuid_lib.UUID,
     voter_ids: List[uuid_lib.UUID],
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    idempotency: IdempotencyGuard = Depends(idempotency_guard)
 ):
     """Register voters for an election"""
+    if idempotency.replay is not None:
+        return idempotency.replay
+    
     # Validate election exists
     election = db.query(Election).filter(Election.id == election_id).first()
     if not election:
@@ -306,7 +356,66 @@ async def register_voters(
     
     db.commit()
     
-    return {"message": f"Successfully registered {registered_count} voters"}
+    return idempotency.store({"message": f"Successfully registered {registered_count} voters"})
+
+@votes_router.put("/eleccion/{election_id}/pesos-votantes", response_model=MessageResponse)
+async def set_voter_weights(
+    election_id: uuid_lib.UUID,
+    weights: List[VoterWeight],
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Set the vote weight of registered voters (PONDERADA elections)"""
+    election = db.query(Election).filter(Election.id == election_id).first()
+    if not election:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Election not found"
+        )
+    
+    # Check tenant access and permissions
+    if current_user.rol not in ["SUPER_ADMIN", "TENANT_ADMIN"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    if current_user.rol != "SUPER_ADMIN" and current_user.tenant_id != election.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot update voters for election from different tenant"
+        )
+    
+    if election.tipo_votacion != "PONDERADA":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Vote weights only apply to PONDERADA elections"
+        )
+    
+    # Weights travel inside the ballot, so they are fixed once voting starts
+    if election.estado in ["ACTIVA", "CERRADA"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot change vote weights for active or closed election"
+        )
+    
+    updated_count = 0
+    for weight in weights:
+        updated_count += db.query(VotanteEleccion).filter(
+            VotanteEleccion.eleccion_id == election_id,
+            VotanteEleccion.votante_id == weight.votante_id
+        ).update({"peso": weight.peso}, synchronize_session=False)
+    
+    if updated_count != len(weights):
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="One or more voters are not registered in this election"
+        )
+    
+    db.commit()
+    
+    return {"message": f"Updated the vote weight of {updated_count} voters"}
 
 @votes_router.get("/mi-voto/{election_id}")
 async def get_my_vote_status(
@@ -358,3 +467,85 @@ async def get_my_vote_status(
         "vote_timestamp": None  # For privacy, don't return actual vote timestamp
     }
 
+
+def _get_auditable_election(db: Session, election_id: uuid_lib.UUID, current_user: User) -> Election:
+    election = db.query(Election).filter(Election.id == election_id).first()
+    if not election:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Election not found"
+        )
+    
+    # Check tenant access
+    if current_user.rol != "SUPER_ADMIN" and current_user.tenant_id != election.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access election from different tenant"
+        )
+    return election
+
+@votes_router.get("/eleccion/{election_id}/raiz-merkle")
+async def get_merkle_root(
+    election_id: uuid_lib.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the current Merkle root of an election's bulletin board"""
+    _get_auditable_election(db, election_id, current_user)
+    
+    tree = get_tree(db, election_id)
+    if not tree:
+        # No block sealed yet: the sealer creates the tree with the first one
+        return {
+            "election_id": str(election_id),
+            "tree_size": 0,
+            "root": EMPTY_ROOT,
+            "updated_at": None
+        }
+    
+    return {
+        "election_id": str(election_id),
+        "tree_size": tree.tamano,
+        "root": tree.raiz,
+        "updated_at": tree.fecha_actualizacion
+    }
+
+@votes_router.get("/eleccion/{election_id}/prueba-inclusion/{receipt}")
+async def get_inclusion_proof(
+    election_id: uuid_lib.UUID,
+    receipt: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the audit path proving a ballot receipt is in the election's tree
+    (available once the ballot's block is sealed)"""
+    _get_auditable_election(db, election_id, current_user)
+    
+    try:
+        bytes.fromhex(receipt)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid receipt"
+        )
+    
+    tree = get_tree(db, election_id)
+    proof = inclusion_proof(db, tree, receipt) if tree else None
+    if not proof:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Receipt not found in a sealed block of this election"
+        )
+    
+    return proof
+
+@votes_router.get("/clave-publica")
+async def get_ballot_signing_key(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the public key that verifies ballot signatures (firma_digital)"""
+    return {
+        "algorithm": "Ed25519",
+        "public_key": get_signing_public_key_pem(),
+        "signed_data": "voto_cifrado + votante_id"
+    }
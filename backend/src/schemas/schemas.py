@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 import uuid
@@ -20,6 +20,14 @@ class VotationType(str, Enum):
     MAYORITARIA = "MAYORITARIA"
     PONDERADA = "PONDERADA"
 
+class ApportionmentMethod(str, Enum):
+    DHONDT = "DHONDT"
+    RESTO_MAYOR = "RESTO_MAYOR"
+
+class BallotEncryption(str, Enum):
+    SIMETRICO = "SIMETRICO"
+    HOMOMORFICO = "HOMOMORFICO"
+
 # Base schemas
 class TenantBase(BaseModel):
     nombre: str
@@ -128,6 +136,7 @@ class ElectionBase(BaseModel):
     fecha_fin: datetime
     tipo_votacion: VotationType
     anonima: bool = True
+    cifrado_votos: BallotEncryption = BallotEncryption.SIMETRICO
 
 class ElectionCreate(ElectionBase):
     tenant_id: uuid.UUID
@@ -152,6 +161,8 @@ class Election(ElectionBase):
 class CargoBase(BaseModel):
     nombre: str
     max_candidatos_a_elegir: int
+    escanos: Optional[int] = None
+    metodo_reparto: ApportionmentMethod = ApportionmentMethod.DHONDT
 
 class CargoCreate(CargoBase):
     eleccion_id: uuid.UUID
@@ -203,6 +214,14 @@ class Vote(BaseModel):
     class Config:
         from_attributes = True
 
+class VoteReceipt(BaseModel):
+    message: str
+    receipt: str
+
+class VoterWeight(BaseModel):
+    votante_id: uuid.UUID
+    peso: int = Field(ge=1)
+
 # Simulacro schemas
 class SimulacroBase(BaseModel):
     nombre: str
@@ -219,6 +238,13 @@ class Simulacro(SimulacroBase):
     class Config:
         from_attributes = True
 
+class SimulationLoad(BaseModel):
+    cantidad: int = Field(ge=1)
+    # Relative weight per candidate id; candidates left out get no votes
+    distribucion: Optional[Dict[uuid.UUID, float]] = None
+    prefijo_votante: str = Field(default="sintetico", min_length=1, max_length=200)
+    semilla: Optional[int] = None
+
 # Metrics schemas
 class MetricasEleccion(BaseModel):
     participacion_porcentaje: float
@@ -238,6 +264,59 @@ class MetricasUso(BaseModel):
     class Config:
         from_attributes = True
 
+# Report job schemas
+class ReportType(str, Enum):
+    USO_PLATAFORMA = "USO_PLATAFORMA"
+    ACTIVIDAD_TENANT = "ACTIVIDAD_TENANT"
+
+class ReportJobStatus(str, Enum):
+    PENDIENTE = "PENDIENTE"
+    EN_PROCESO = "EN_PROCESO"
+    COMPLETADO = "COMPLETADO"
+    FALLIDO = "FALLIDO"
+
+class ReportJobCreate(BaseModel):
+    tipo: ReportType
+    tenant_id: Optional[uuid.UUID] = None
+    fecha_inicio: Optional[str] = None
+    fecha_fin: Optional[str] = None
+
+class ReportJob(BaseModel):
+    id: uuid.UUID
+    tipo: ReportType
+    estado: ReportJobStatus
+    tenant_id: Optional[uuid.UUID] = None
+    error: Optional[str] = None
+    fecha_creacion: datetime
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+# Purge job schemas
+class PurgeType(str, Enum):
+    SIMULACRO = "SIMULACRO"
+    ELECCION = "ELECCION"
+    TENANT = "TENANT"
+
+class PurgeJob(BaseModel):
+    id: uuid.UUID
+    tipo: PurgeType
+    objetivo_id: uuid.UUID
+    tenant_id: Optional[uuid.UUID] = None
+    estado: ReportJobStatus
+    paso_actual: Optional[str] = None
+    filas_eliminadas: int
+    particiones_eliminadas: int
+    error: Optional[str] = None
+    fecha_creacion: datetime
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 # Response schemas
 class MessageResponse(BaseModel):
     message: str
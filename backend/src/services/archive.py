@@ -0,0 +1,529 @@
+import hashlib
+import hmac
+import json
+import mmap
+import os
+import shutil
+import time
+import zlib
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Iterator, List, Optional, Tuple
+import uuid
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from src.models.models import (
+    ArchivoEleccion, BloqueVotos, Candidate, Cargo, ClaveEleccion, Election, ResultadoEleccion, VotanteEleccion, Vote
+)
+from src.services.homomorphic import aggregate_totals
+from src.services.partitions import detach_election_partitions, partitioning_enabled
+from src.services.purge import PURGE_PAUSE_SECONDS, delete_batch
+from src.services.results import decode_ballots, get_results_snapshot, verify_results_signature
+from src.services.sealer import GENESIS, seal_pending, sign_block, verify_blocks
+from src.services.signature_audit import audit_vote_signatures, verify_signatures
+from src.services.tally import CandidateIndex, tally_ballots
+from src.utils.crypto import ballot_receipt, block_hash, get_signing_public_key_pem, signature_cutover
+from src.utils.ids import BALLOT_ID_WINDOW_SECONDS
+from src.utils.timezones import as_utc
+
+try:
+    import zstandard
+except ImportError:  # Pinned in requirements.txt; without it archives use zlib
+    zstandard = None
+
+# Closed elections are moved out of `votos` and `votantes_eleccion` into a
+# directory of column files per election under ARCHIVE_DIR
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_PAGE_ROWS = int(os.getenv("ARCHIVE_PAGE_ROWS", "10000"))
+ARCHIVE_FORMAT = "urna-archivo/1"
+MANIFEST = "manifest.json"
+
+# Rows fetched per round trip while exporting
+EXPORT_BATCH_SIZE = 5000
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=9).compress(data)
+    return zlib.compress(data, 6)
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("The zstandard package is required to read this archive")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+def _open_column(path: str, dtype, shape: tuple) -> np.ndarray:
+    """Writable memory-mapped .npy column (empty ones can't be mapped)"""
+    if shape[0] == 0:
+        empty = np.empty(shape, dtype=dtype)
+        np.save(path, empty)
+        return empty
+    return open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+class _TextColumnWriter:
+    """Variable-length text column. Values are compressed in pages of
+    ``page_rows`` (``<name>.pages``); the byte offset of every page
+    (``<name>.off.npy``) and the length of every value (``<name>.len.npy``)
+    are plain arrays, memory-mapped when reading."""
+
+    def __init__(self, directory: str, name: str, rows: int, codec: str, page_rows: int):
+        self.codec = codec
+        self.page_rows = page_rows
+        self.lengths = _open_column(os.path.join(directory, f"{name}.len.npy"), np.int32, (rows,))
+        self.offsets = _open_column(os.path.join(directory, f"{name}.off.npy"), np.int64, (-(-rows // page_rows) + 1,))
+        self.offsets[0] = 0
+        self.file = open(os.path.join(directory, f"{name}.pages"), "wb")
+        self.buffer: List[bytes] = []
+        self.row = 0
+        self.page = 0
+
+    def append(self, value: str) -> None:
+        data = value.encode()
+        self.lengths[self.row] = len(data)
+        self.row += 1
+        self.buffer.append(data)
+        if len(self.buffer) == self.page_rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self.buffer:
+            return
+        self.file.write(_compress(self.codec, b"".join(self.buffer)))
+        self.page += 1
+        self.offsets[self.page] = self.file.tell()
+        self.buffer = []
+
+    def close(self) -> None:
+        self._flush()
+        self.file.close()
+        for column in (self.lengths, self.offsets):
+            if isinstance(column, np.memmap):
+                column.flush()
+
+def _uuid_bytes(value: uuid.UUID) -> np.ndarray:
+    return np.frombuffer(value.bytes, dtype=np.uint8)
+
+def _timestamp_micros(value: datetime, window_seconds: int = 0) -> int:
+    """Unix microseconds, floored to the start of a window when given"""
+    micros = int(as_utc(value).timestamp() * 1_000_000)
+    if window_seconds:
+        window = window_seconds * 1_000_000
+        micros = micros // window * window
+    return micros
+
+def _write_json(directory: str, name: str, content) -> None:
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+        json.dump(content, f, ensure_ascii=False, separators=(",", ":"))
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _candidate_catalog(db: Session, election_id: uuid.UUID) -> List[dict]:
+    """Candidates in the order tally_election indexes them"""
+    candidates = db.query(Candidate).join(Cargo).filter(
+        Cargo.eleccion_id == election_id
+    ).order_by(Candidate.numero_orden).all()
+    return [
+        {
+            "id": str(candidate.id),
+            "cargo_id": str(candidate.cargo_id),
+            "lista_id": str(candidate.lista_id) if candidate.lista_id else None
+        }
+        for candidate in candidates
+    ]
+
+def write_archive(db: Session, election: Election, snapshot: ResultadoEleccion, directory: str, codec: Optional[str] = None, page_rows: int = ARCHIVE_PAGE_ROWS) -> dict:
+    """Export an election's ballots (in chain order), blocks, participation,
+    candidates, results snapshot and tally key to ``directory``, and write
+    the manifest with every file's checksum. Returns the manifest.
+
+    Ballots of anonymous elections are exported without their voter and
+    with only the start of their BALLOT_ID_WINDOW_SECONDS window as cast
+    time, and the voter roll without voter ids. Their signatures cover the
+    voter id and the public key is published, so they would link ballots to
+    voters: they are verified here, the report is kept in the manifest and
+    only each ballot's receipt (all the block chain needs) is exported."""
+    codec = codec or default_codec()
+    os.makedirs(directory, exist_ok=True)
+    window_seconds = BALLOT_ID_WINDOW_SECONDS if election.anonima else 0
+
+    votes = db.query(func.count(Vote.id)).filter(Vote.eleccion_id == election.id).scalar()
+    vote_ids = _open_column(os.path.join(directory, "votos_id.npy"), np.uint8, (votes, 16))
+    voter_ids = None if election.anonima else _open_column(os.path.join(directory, "votos_votante_id.npy"), np.uint8, (votes, 16))
+    timestamps = _open_column(os.path.join(directory, "votos_timestamp.npy"), np.int64, (votes,))
+    block_numbers = _open_column(os.path.join(directory, "votos_bloque.npy"), np.int32, (votes,))
+    ballots = _TextColumnWriter(directory, "votos_voto_cifrado", votes, codec, page_rows)
+    if election.anonima:
+        receipts = _open_column(os.path.join(directory, "votos_recibo.npy"), np.uint8, (votes, 32))
+        signatures = None
+    else:
+        receipts = None
+        signatures = _TextColumnWriter(directory, "votos_firma_digital", votes, codec, page_rows)
+
+    rows = db.query(
+        Vote.id, Vote.votante_id, Vote.timestamp, BloqueVotos.numero, Vote.voto_cifrado, Vote.firma_digital
+    ).join(BloqueVotos, Vote.bloque_id == BloqueVotos.id).filter(
+        Vote.eleccion_id == election.id
+    ).order_by(BloqueVotos.numero, Vote.timestamp, Vote.id).yield_per(EXPORT_BATCH_SIZE)
+    for i, (vote_id, voter_id, timestamp, numero, voto_cifrado, firma_digital) in enumerate(rows):
+        vote_ids[i] = _uuid_bytes(vote_id)
+        if voter_ids is not None:
+            voter_ids[i] = _uuid_bytes(voter_id)
+        timestamps[i] = _timestamp_micros(timestamp, window_seconds)
+        block_numbers[i] = numero
+        ballots.append(voto_cifrado)
+        if signatures is not None:
+            signatures.append(firma_digital)
+        else:
+            receipts[i] = np.frombuffer(bytes.fromhex(ballot_receipt(voto_cifrado, firma_digital)), dtype=np.uint8)
+    ballots.close()
+    if signatures is not None:
+        signatures.close()
+    if ballots.row != votes:
+        raise ValueError("Ballots changed while the election was being archived")
+
+    voters = db.query(func.count(VotanteEleccion.votante_id)).filter(VotanteEleccion.eleccion_id == election.id).scalar()
+    registered = None if election.anonima else _open_column(os.path.join(directory, "votantes_votante_id.npy"), np.uint8, (voters, 16))
+    voted = _open_column(os.path.join(directory, "votantes_ha_votado.npy"), np.bool_, (voters,))
+    weights = _open_column(os.path.join(directory, "votantes_peso.npy"), np.int32, (voters,))
+    voter_rows = db.query(VotanteEleccion.votante_id, VotanteEleccion.ha_votado, VotanteEleccion.peso).filter(
+        VotanteEleccion.eleccion_id == election.id
+    ).order_by(VotanteEleccion.votante_id).yield_per(EXPORT_BATCH_SIZE)
+    for i, (voter_id, ha_votado, peso) in enumerate(voter_rows):
+        if registered is not None:
+            registered[i] = _uuid_bytes(voter_id)
+        voted[i] = ha_votado
+        weights[i] = peso
+    for column in (vote_ids, voter_ids, receipts, timestamps, block_numbers, registered, voted, weights):
+        if isinstance(column, np.memmap):
+            column.flush()
+
+    blocks = db.query(BloqueVotos).filter(BloqueVotos.eleccion_id == election.id).order_by(BloqueVotos.numero).all()
+    _write_json(directory, "bloques.json", [
+        {
+            "numero": block.numero,
+            "hash_anterior": block.hash_anterior,
+            "hash_bloque": block.hash_bloque,
+            "raiz_merkle": block.raiz_merkle,
+            "cantidad_votos": block.cantidad_votos,
+            "firma": block.firma
+        }
+        for block in blocks
+    ])
+    _write_json(directory, "candidatos.json", _candidate_catalog(db, election.id))
+    _write_json(directory, "resultados.json", {"contenido": snapshot.contenido, "firma": snapshot.firma})
+    key = db.query(ClaveEleccion).filter(ClaveEleccion.eleccion_id == election.id).first()
+    if key:
+        # The private key stays encrypted with the ballot key
+        _write_json(directory, "clave.json", {
+            "candidatos": key.candidatos,
+            "claves_publicas": key.claves_publicas,
+            "clave_privada": key.clave_privada
+        })
+
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        if name != MANIFEST:
+            path = os.path.join(directory, name)
+            files[name] = {"bytes": os.path.getsize(path), "sha256": _file_sha256(path)}
+
+    manifest = {
+        "formato": ARCHIVE_FORMAT,
+        "codec": codec,
+        "filas_por_pagina": page_rows,
+        "eleccion": {
+            "id": str(election.id),
+            "tenant_id": str(election.tenant_id),
+            "titulo": election.titulo,
+            "tipo_votacion": election.tipo_votacion,
+            "cifrado_votos": election.cifrado_votos,
+            "fecha_inicio": as_utc(election.fecha_inicio).isoformat(),
+            "fecha_fin": as_utc(election.fecha_fin).isoformat(),
+            "anonima": election.anonima
+        },
+        "votos": votes,
+        "votantes": voters,
+        "votantes_votaron": int(np.count_nonzero(voted)),
+        "bloques": len(blocks),
+        "ultimo_hash_bloque": blocks[-1].hash_bloque if blocks else GENESIS,
+        "archivos": files,
+        "fecha_archivo": datetime.now(timezone.utc).isoformat()
+    }
+    if election.anonima:
+        manifest["ventana_timestamp_segundos"] = window_seconds
+        manifest["firmas"] = audit_vote_signatures(db, election.id)
+    _write_json(directory, MANIFEST, manifest)
+    return manifest
+
+class ElectionArchive:
+    """Read side of an archived election. Fixed-width columns are
+    memory-mapped and text columns are decompressed one page at a time, so
+    verifying or tallying an archive needs about one page of memory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("formato") != ARCHIVE_FORMAT:
+            raise ValueError(f"Unsupported archive format: {self.manifest.get('formato')}")
+
+    @property
+    def manifest_sha256(self) -> str:
+        return _file_sha256(os.path.join(self.directory, MANIFEST))
+
+    def corrupt_files(self) -> List[str]:
+        """Files that are missing or don't match their manifest checksum"""
+        corrupt = []
+        for name, entry in self.manifest["archivos"].items():
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(path) or _file_sha256(path) != entry["sha256"]:
+                corrupt.append(name)
+        return corrupt
+
+    def column(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+
+    def load_json(self, name: str):
+        path = os.path.join(self.directory, f"{name}.json")
+        if not os.path.isfile(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def text_pages(self, name: str) -> Iterator[List[str]]:
+        """Values of a text column, one decompressed page at a time"""
+        lengths = self.column(f"{name}.len")
+        offsets = self.column(f"{name}.off")
+        if len(lengths) == 0:
+            return
+        page_rows = self.manifest["filas_por_pagina"]
+        with open(os.path.join(self.directory, f"{name}.pages"), "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as pages:
+            for page in range(len(offsets) - 1):
+                data = _decompress(self.manifest["codec"], pages[offsets[page]:offsets[page + 1]])
+                ends = np.cumsum(lengths[page * page_rows:(page + 1) * page_rows])
+                starts = ends - lengths[page * page_rows:(page + 1) * page_rows]
+                yield [data[start:end].decode() for start, end in zip(starts.tolist(), ends.tolist())]
+
+    def texts(self, name: str) -> Iterator[str]:
+        for page in self.text_pages(name):
+            yield from page
+
+    def signature_items(self) -> Iterator[Tuple[str, str, str, str, datetime]]:
+        """(vote_id, vote_data, voter_id, signature, cast_at) of every archived
+        ballot, for archives that keep voter ids (non-anonymous elections)"""
+        vote_ids = self.column("votos_id")
+        voter_ids = self.column("votos_votante_id")
+        timestamps = self.column("votos_timestamp")
+        for i, (voto_cifrado, firma_digital) in enumerate(zip(self.texts("votos_voto_cifrado"), self.texts("votos_firma_digital"))):
+            yield (
+                str(uuid.UUID(bytes=vote_ids[i].tobytes())),
+                voto_cifrado,
+                str(uuid.UUID(bytes=voter_ids[i].tobytes())),
+                firma_digital,
+                datetime.fromtimestamp(int(timestamps[i]) / 1_000_000, tz=timezone.utc)
+            )
+
+def verify_archive_chain(archive: ElectionArchive) -> dict:
+    """Recompute the block chain from the archived ballots, like
+    ``verify_blocks`` does from the hot tables. Ballots are stored in chain
+    order, so blocks are checked while the columns are streamed."""
+    blocks = archive.load_json("bloques")
+    if "votos_recibo.npy" in archive.manifest["archivos"]:
+        # Anonymous elections keep the receipts instead of the signatures
+        receipts = (receipt.tobytes().hex() for receipt in archive.column("votos_recibo"))
+    else:
+        receipts = (
+            ballot_receipt(voto_cifrado, firma_digital)
+            for voto_cifrado, firma_digital in zip(archive.texts("votos_voto_cifrado"), archive.texts("votos_firma_digital"))
+        )
+    groups = groupby(zip(map(int, archive.column("votos_bloque")), receipts), key=lambda item: item[0])
+    group = next(groups, None)
+
+    verified = 0
+    hash_anterior = GENESIS
+    for expected_numero, block in enumerate(blocks):
+        block_receipts = []
+        if group is not None and group[0] == block["numero"]:
+            block_receipts = [receipt for _, receipt in group[1]]
+            group = next(groups, None)
+        if (
+            block["numero"] != expected_numero
+            or block["hash_anterior"] != hash_anterior
+            or block["cantidad_votos"] != len(block_receipts)
+            or block["hash_bloque"] != block_hash(hash_anterior, block_receipts)
+            or not hmac.compare_digest(block["firma"], sign_block(block["hash_bloque"]))
+        ):
+            break
+        verified += 1
+        hash_anterior = block["hash_bloque"]
+
+    # Ballots left over once every block verified belong to no block
+    unsealed = 0
+    if verified == len(blocks) and group is not None:
+        unsealed = len(list(group[1])) + sum(len(list(rest)) for _, rest in groups)
+    return {
+        "valid": verified == len(blocks) and unsealed == 0,
+        "total_blocks": len(blocks),
+        "verified_blocks": verified,
+        "unsealed_votes": unsealed
+    }
+
+def audit_archive_signatures(archive: ElectionArchive) -> dict:
+    """Verify the signature of every archived ballot. Anonymous elections are
+    archived without voter ids or signatures, so the report made when
+    archiving is returned."""
+    if archive.manifest["eleccion"].get("anonima"):
+        return {**archive.manifest["firmas"], "verified_when_archived": True}
+    return verify_signatures(archive.signature_items(), get_signing_public_key_pem().encode(), signature_cutover())
+
+def tally_archive(archive: ElectionArchive) -> dict:
+    """Tally the archived ballots and compare them with the archived (signed)
+    results snapshot"""
+    election = archive.manifest["eleccion"]
+    catalog = archive.load_json("candidatos")
+    index = CandidateIndex(
+        [candidate["id"] for candidate in catalog],
+        [candidate["cargo_id"] for candidate in catalog],
+        [candidate["lista_id"] for candidate in catalog]
+    )
+
+    if election["cifrado_votos"] == "HOMOMORFICO":
+        key = archive.load_json("clave")
+        votes_by_id, weighted_by_id = aggregate_totals(
+            ClaveEleccion(**key), archive.texts("votos_voto_cifrado"),
+            lambda: int(archive.column("votantes_peso").max(initial=1))
+        ) if key else ({}, None)
+        votes = np.array([votes_by_id.get(c, 0) for c in index.candidates], dtype=np.int64)
+        weighted = np.array([(weighted_by_id or votes_by_id).get(c, 0) for c in index.candidates], dtype=np.int64)
+    else:
+        votes, weighted = tally_ballots(decode_ballots(archive.texts("votos_voto_cifrado")), index)
+
+    tally = {
+        "total_votes": archive.manifest["votos"],
+        "votes": {candidate_id: int(votes[i]) for i, candidate_id in enumerate(index.candidates)}
+    }
+    if election["tipo_votacion"] == "PONDERADA":
+        tally["weighted_votes"] = {candidate_id: int(weighted[i]) for i, candidate_id in enumerate(index.candidates)}
+
+    snapshot = archive.load_json("resultados")
+    content = json.loads(snapshot["contenido"])
+    matches = content["total_votes"] == tally["total_votes"] and all(
+        content["results"].get(candidate_id, {}).get("votes") == count
+        for candidate_id, count in tally["votes"].items()
+    ) and all(
+        content["results"].get(candidate_id, {}).get("weighted_votes") == count
+        for candidate_id, count in tally.get("weighted_votes", {}).items()
+    )
+    tally["snapshot_signature_valid"] = verify_results_signature(snapshot["contenido"].encode(), snapshot["firma"])
+    tally["matches_snapshot"] = matches
+    return tally
+
+def verify_archive(archive: ElectionArchive) -> dict:
+    """Checksums, block chain and tally of an archive"""
+    corrupt = archive.corrupt_files()
+    if corrupt:
+        return {"valid": False, "corrupt_files": corrupt}
+    chain = verify_archive_chain(archive)
+    tally = tally_archive(archive)
+    return {
+        "valid": chain["valid"] and tally["matches_snapshot"] and tally["snapshot_signature_valid"],
+        "corrupt_files": [],
+        "blockchain_integrity": chain,
+        "tally": tally
+    }
+
+def archive_path(election: Election, directory: str = ARCHIVE_DIR) -> str:
+    return os.path.join(directory, str(election.tenant_id), str(election.id))
+
+def get_archive(db: Session, election_id: uuid.UUID) -> Optional[ArchivoEleccion]:
+    return db.query(ArchivoEleccion).filter(ArchivoEleccion.eleccion_id == election_id).first()
+
+def remove_hot_rows(db: Session, election_id: uuid.UUID) -> int:
+    """Remove an archived election's ballots and participation from the hot
+    tables: its partitions are detached and dropped, remaining rows (DEFAULT
+    partition, or no partitioning) are deleted in batches. Returns the
+    number of rows deleted in batches."""
+    if partitioning_enabled(db):
+        for partition in detach_election_partitions(db, election_id).values():
+            db.execute(text(f'DROP TABLE "{partition}"'))
+        db.commit()
+
+    removed = 0
+    for model in (Vote, VotanteEleccion):
+        while True:
+            deleted = delete_batch(db, model, [model.eleccion_id == election_id])
+            if not deleted:
+                break
+            removed += deleted
+            db.commit()
+            time.sleep(PURGE_PAUSE_SECONDS)
+    return removed
+
+def archive_election(db: Session, election: Election, directory: str = ARCHIVE_DIR, keep_hot_rows: bool = False) -> ArchivoEleccion:
+    """Archive a closed election and remove its rows from the hot tables.
+
+    The archive is written to a temporary directory, re-verified from disk
+    (checksums, block chain and tally against the results snapshot) and only
+    then recorded; hot rows are removed last. Re-running it for an archived
+    election finishes an interrupted removal. Raises ValueError when the
+    election can't be archived.
+    """
+    record = get_archive(db, election.id)
+    if record is None:
+        if election.estado != "CERRADA":
+            raise ValueError("Only closed elections can be archived")
+        seal_pending(db, election.id, force=True)
+        chain = verify_blocks(db, election.id)
+        if not chain["valid"] or chain["unsealed_votes"]:
+            raise ValueError("The election's block chain does not verify")
+        snapshot = get_results_snapshot(db, election)
+
+        path = archive_path(election, directory)
+        staging = f"{path}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        write_archive(db, election, snapshot, staging)
+        archive = ElectionArchive(staging)
+        verification = verify_archive(archive)
+        if not verification["valid"]:
+            raise ValueError(f"The archive does not verify: {json.dumps(verification)}")
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(staging, path)
+
+        manifest = archive.manifest
+        record = ArchivoEleccion(
+            eleccion_id=election.id,
+            ruta=path,
+            sha256_manifiesto=_file_sha256(os.path.join(path, MANIFEST)),
+            votos=manifest["votos"],
+            votantes=manifest["votantes"],
+            votantes_votaron=manifest["votantes_votaron"],
+            tamano_bytes=sum(entry["bytes"] for entry in manifest["archivos"].values())
+        )
+        db.add(record)
+        db.commit()
+
+    if not keep_hot_rows and record.filas_activas:
+        remove_hot_rows(db, election.id)
+        record.filas_activas = False
+        db.commit()
+    return record
+
+def open_archive(record: ArchivoEleccion) -> ElectionArchive:
+    """Open a recorded archive, checking its manifest against the record"""
+    archive = ElectionArchive(record.ruta)
+    if archive.manifest_sha256 != record.sha256_manifiesto:
+        raise ValueError("The archive manifest does not match its record")
+    return archive
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+import uuid
+
+from sqlalchemy.orm import Session, joinedload
+
+from src.models.models import BoletaEleccion, Candidate, Cargo, Election, ListaPartido
+from src.services.storage import get_storage, PRESIGNED_URL_EXPIRE_SECONDS
+
+# Presigned media URLs embedded in a cached ballot must outlive the election,
+# but S3 SigV4 presigned URLs cannot exceed seven days
+MAX_MEDIA_URL_SECONDS = 7 * 24 * 3600
+
+# In-process copy of the serialized ballots: election_id -> (version, etag, body)
+_cache: Dict[uuid.UUID, Tuple[int, str, bytes]] = {}
+_lock = threading.Lock()
+
+def _media_expiry(election: Election) -> int:
+    fecha_fin = election.fecha_fin
+    if fecha_fin.tzinfo is None:
+        fecha_fin = fecha_fin.replace(tzinfo=timezone.utc)
+    remaining = int((fecha_fin - datetime.now(timezone.utc)).total_seconds()) + 3600
+    return min(max(remaining, PRESIGNED_URL_EXPIRE_SECONDS), MAX_MEDIA_URL_SECONDS)
+
+def build_ballot(db: Session, election: Election) -> dict:
+    """Assemble the full ballot of an election with a fixed number of queries"""
+    storage = get_storage()
+    expires_in = _media_expiry(election)
+
+    cargos = db.query(Cargo).filter(Cargo.eleccion_id == election.id).order_by(Cargo.nombre).all()
+    candidates = db.query(Candidate).options(joinedload(Candidate.lista)).join(Cargo).filter(
+        Cargo.eleccion_id == election.id
+    ).order_by(Candidate.numero_orden).all()
+
+    candidates_by_cargo = {}
+    listas = {}
+    for candidate in candidates:
+        lista: Optional[ListaPartido] = candidate.lista
+        if lista is not None and lista.id not in listas:
+            listas[lista.id] = {
+                "id": str(lista.id),
+                "nombre": lista.nombre,
+                "color_primario": lista.color_primario,
+                "logo_url": storage.url(lista.logo_url, expires_in) if lista.logo_url else None
+            }
+        candidates_by_cargo.setdefault(candidate.cargo_id, []).append({
+            "id": str(candidate.id),
+            "nombre": candidate.nombre,
+            "apellido": candidate.apellido,
+            "descripcion": candidate.descripcion,
+            "numero_orden": candidate.numero_orden,
+            "lista_id": str(candidate.lista_id) if candidate.lista_id else None,
+            "foto_url": storage.url(candidate.foto_url, expires_in) if candidate.foto_url else None
+        })
+
+    return {
+        "eleccion": {
+            "id": str(election.id),
+            "titulo": election.titulo,
+            "descripcion": election.descripcion,
+            "fecha_inicio": election.fecha_inicio.isoformat(),
+            "fecha_fin": election.fecha_fin.isoformat(),
+            "estado": election.estado,
+            "tipo_votacion": election.tipo_votacion,
+            "anonima": election.anonima
+        },
+        "cargos": [
+            {
+                "id": str(cargo.id),
+                "nombre": cargo.nombre,
+                "max_candidatos_a_elegir": cargo.max_candidatos_a_elegir,
+                "candidatos": candidates_by_cargo.get(cargo.id, [])
+            }
+            for cargo in cargos
+        ],
+        "listas": sorted(listas.values(), key=lambda lista: lista["nombre"])
+    }
+
+def _serialize(ballot: dict, version: int) -> Tuple[str, bytes]:
+    body = json.dumps({"version": version, **ballot}, ensure_ascii=False, separators=(",", ":")).encode()
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    return etag, body
+
+def publish_ballot(db: Session, election: Election) -> Tuple[int, str, bytes]:
+    """Build, persist and cache the ballot of an election, bumping its version"""
+    stored = db.query(BoletaEleccion).filter(BoletaEleccion.eleccion_id == election.id).first()
+    version = stored.version + 1 if stored else 1
+    etag, body = _serialize(build_ballot(db, election), version)
+
+    if stored:
+        stored.version = version
+        stored.etag = etag
+        stored.contenido = body.decode()
+        stored.fecha_generacion = datetime.utcnow()
+    else:
+        db.add(BoletaEleccion(eleccion_id=election.id, version=version, etag=etag, contenido=body.decode()))
+    db.commit()
+
+    with _lock:
+        _cache[election.id] = (version, etag, body)
+    return version, etag, body
+
+def get_ballot(db: Session, election: Election) -> Tuple[str, bytes]:
+    """Get the serialized ballot and its ETag.
+
+    Active elections are served from the published snapshot; other states are
+    built on the fly (admin preview before activation, or after eviction).
+    """
+    if election.estado != "ACTIVA":
+        return _serialize(build_ballot(db, election), 0)
+
+    # A primary-key lookup of the version keeps nodes consistent with each other
+    stored_version = db.query(BoletaEleccion.version).filter(
+        BoletaEleccion.eleccion_id == election.id
+    ).scalar()
+
+    with _lock:
+        cached = _cache.get(election.id)
+    if cached and cached[0] == stored_version:
+        return cached[1], cached[2]
+
+    if stored_version is not None:
+        stored = db.query(BoletaEleccion).filter(BoletaEleccion.eleccion_id == election.id).first()
+        body = stored.contenido.encode()
+        with _lock:
+            _cache[election.id] = (stored.version, stored.etag, body)
+        return stored.etag, body
+
+    _, etag, body = publish_ballot(db, election)
+    return etag, body
+
+def refresh_tenant_ballots(db: Session, tenant_id: uuid.UUID) -> None:
+    """Republish the ballots of a tenant's active elections (e.g. after a lista change)"""
+    elections = db.query(Election).filter(
+        Election.tenant_id == tenant_id,
+        Election.estado == "ACTIVA"
+    ).all()
+    for election in elections:
+        publish_ballot(db, election)
+
+def evict_ballot(db: Session, election_id: uuid.UUID) -> None:
+    """Drop the published ballot of an election that is no longer active"""
+    db.query(BoletaEleccion).filter(BoletaEleccion.eleccion_id == election_id).delete()
+    db.commit()
+    with _lock:
+        _cache.pop(election_id, None)
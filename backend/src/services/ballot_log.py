@@ -0,0 +1,433 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import uuid
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from src.database.database import DEFAULT_SHARD, session_for_shard
+from src.models.models import Vote, VotanteEleccion
+from src.services.sealer import notify_ballots
+
+# Ballot ingestion: "direct" commits every vote to `votos` inside the request;
+# "log" makes the ballot durable in a local append-only log (one fsync per
+# group of concurrent votes) and writes it to `votos` in background batches.
+BALLOT_INGESTION_MODE = os.getenv("BALLOT_INGESTION_MODE", "direct")
+BALLOT_LOG_DIR = os.getenv("BALLOT_LOG_DIR", "ballot_log")
+# Extra time the log waits for more ballots to join a group before fsync
+BALLOT_LOG_GROUP_COMMIT_MS = float(os.getenv("BALLOT_LOG_GROUP_COMMIT_MS", "2"))
+BALLOT_LOG_FLUSH_BATCH = int(os.getenv("BALLOT_LOG_FLUSH_BATCH", "500"))
+BALLOT_LOG_FLUSH_INTERVAL = float(os.getenv("BALLOT_LOG_FLUSH_INTERVAL", "0.5"))
+BALLOT_LOG_SEGMENT_BYTES = int(os.getenv("BALLOT_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# How long closing an election waits for its logged ballots (on every node)
+# to reach `votos` before leaving its results for a later retry
+BALLOT_CLOSE_WAIT_SECONDS = float(os.getenv("BALLOT_CLOSE_WAIT_SECONDS", "30"))
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+logger = logging.getLogger(__name__)
+
+def _segment_name(number: int) -> str:
+    return f"segment-{number:08d}.log"
+
+def _encode(record: dict) -> bytes:
+    payload = json.dumps(record, separators=(",", ":")).encode()
+    return b"%08x " % zlib.crc32(payload) + payload + b"\n"
+
+def _decode(line: bytes) -> Optional[dict]:
+    """Decode a log line; None for a torn or corrupt write"""
+    if not line.endswith(b"\n") or len(line) < 10:
+        return None
+    checksum, payload = line[:8], line[9:-1]
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+def relax_commit_durability(db: Session) -> None:
+    """Let the current transaction commit without waiting for the WAL flush.
+
+    Used for the eligibility update in log mode: the ballot itself is made
+    durable by the log, and the writer re-applies ha_votado when it flushes.
+    """
+    if db.bind.dialect.name == "postgresql":
+        db.execute(text("SET LOCAL synchronous_commit = off"))
+
+def write_ballots(db: Session, records: List[dict]) -> int:
+    """Insert logged ballots into `votos` (skipping ones already written) and
+    mark their voters. Returns the number of inserted rows."""
+    ids = [uuid.UUID(record["id"]) for record in records]
+    election_ids = {uuid.UUID(record["eleccion_id"]) for record in records}
+    existing = {vote_id for (vote_id,) in db.query(Vote.id).filter(
+        Vote.eleccion_id.in_(election_ids),
+        Vote.id.in_(ids)
+    )}
+
+    voters: Dict[str, List[uuid.UUID]] = {}
+    rows = []
+    for record in records:
+        if uuid.UUID(record["id"]) in existing:
+            continue
+        election_id = record["eleccion_id"]
+        rows.append(Vote(
+            id=uuid.UUID(record["id"]),
+            eleccion_id=uuid.UUID(election_id),
+            votante_id=uuid.UUID(record["votante_id"]),
+            voto_cifrado=record["voto_cifrado"],
+            firma_digital=record["firma_digital"],
+            timestamp=datetime.fromisoformat(record["timestamp"])
+        ))
+        voters.setdefault(election_id, []).append(uuid.UUID(record["votante_id"]))
+
+    db.add_all(rows)
+    # Re-apply eligibility consumption in case its relaxed commit was lost
+    for election_id, voter_ids in voters.items():
+        db.query(VotanteEleccion).filter(
+            VotanteEleccion.eleccion_id == uuid.UUID(election_id),
+            VotanteEleccion.votante_id.in_(voter_ids),
+            VotanteEleccion.ha_votado == False
+        ).update({"ha_votado": True}, synchronize_session=False)
+    db.commit()
+    for election_id, voter_ids in voters.items():
+        notify_ballots(uuid.UUID(election_id), len(voter_ids))
+    return len(rows)
+
+def write_sharded_ballots(records: List[dict]) -> int:
+    """Write logged ballots to the shard each was cast on (records logged
+    before sharding carry no shard and belong to the default one)"""
+    by_shard: Dict[str, List[dict]] = {}
+    for record in records:
+        by_shard.setdefault(record.get("shard", DEFAULT_SHARD), []).append(record)
+    written = 0
+    for shard, shard_records in by_shard.items():
+        db = session_for_shard(shard)
+        try:
+            written += write_ballots(db, shard_records)
+        finally:
+            db.close()
+    return written
+
+def unapplied_ballots(db: Session, election_id: uuid.UUID) -> int:
+    """Ballots acknowledged to voters but not yet in `votos`, on any node.
+
+    Eligibility is consumed before a ballot is logged and given back if the
+    append fails, so every voter marked ha_votado has a ballot in `votos` or
+    in some node's log. In direct mode both are committed together and this
+    is always 0.
+    """
+    voted = db.query(func.count()).select_from(VotanteEleccion).filter(
+        VotanteEleccion.eleccion_id == election_id,
+        VotanteEleccion.ha_votado == True
+    ).scalar()
+    stored = db.query(func.count()).select_from(Vote).filter(Vote.eleccion_id == election_id).scalar()
+    return max(voted - stored, 0)
+
+def wait_for_ballots(db: Session, election_id: uuid.UUID, timeout: float = BALLOT_CLOSE_WAIT_SECONDS) -> int:
+    """Flush this node's log and wait until every ballot of the election is
+    in `votos`. Returns how many are still missing when ``timeout`` expires
+    (0 once they are all stored)."""
+    deadline = time.monotonic() + timeout
+    ballot_log = get_ballot_log()
+    if ballot_log:
+        ballot_log.drain(election_id, timeout)
+    while True:
+        missing = unapplied_ballots(db, election_id)
+        # End the read transaction so the next poll sees other nodes' writes
+        db.commit()
+        if not missing or time.monotonic() >= deadline:
+            return missing
+        time.sleep(min(BALLOT_LOG_FLUSH_INTERVAL, max(deadline - time.monotonic(), 0)))
+
+class BallotLog:
+    """Durable append-only ballot log with group commit and write-behind.
+
+    ``append`` returns once the ballot is fsynced: concurrent appends share
+    one fsync. A writer thread then moves durable ballots to `votos` in
+    batches and records its position in a checkpoint file, so on start any
+    ballot logged but not yet written is replayed.
+    """
+
+    def __init__(self, directory: str = BALLOT_LOG_DIR):
+        self.directory = directory
+        self._cond = threading.Condition()
+        self._buffer: List[Tuple[bytes, dict, asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._writer_cond = threading.Condition()
+        self._pending: List[Tuple[dict, int, int]] = []
+        self._stopped = False
+        self._segment = 0
+        self._file = None
+        # Set when a failed group could not be cut off the log
+        self._failed: Optional[Exception] = None
+        self._threads: List[threading.Thread] = []
+
+    # Startup and recovery
+
+    def _read_checkpoint(self) -> Tuple[int, int]:
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return 0, 0
+        with open(path) as f:
+            checkpoint = json.load(f)
+        return checkpoint["segment"], checkpoint["offset"]
+
+    def _write_checkpoint(self, segment: int, offset: int) -> None:
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"segment": segment, "offset": offset}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(name[8:16]) for name in os.listdir(self.directory)
+            if name.startswith("segment-") and name.endswith(".log")
+        )
+
+    def replay(self) -> int:
+        """Write every logged ballot after the checkpoint to `votos`"""
+        checkpoint_segment, checkpoint_offset = self._read_checkpoint()
+        replayed = 0
+        for segment in self._segments():
+            if segment < checkpoint_segment:
+                continue
+            path = os.path.join(self.directory, _segment_name(segment))
+            offset = checkpoint_offset if segment == checkpoint_segment else 0
+            batch: List[dict] = []
+            with open(path, "rb+") as f:
+                f.seek(offset)
+                for line in iter(f.readline, b""):
+                    record = _decode(line)
+                    if record is None:
+                        # Torn tail from a crash mid-write: never acknowledged
+                        f.truncate(offset)
+                        break
+                    offset += len(line)
+                    batch.append(record)
+                    if len(batch) >= BALLOT_LOG_FLUSH_BATCH:
+                        replayed += self._replay_batch(batch, segment, offset)
+                        batch = []
+            if batch:
+                replayed += self._replay_batch(batch, segment, offset)
+        return replayed
+
+    def _replay_batch(self, batch: List[dict], segment: int, offset: int) -> int:
+        written = write_sharded_ballots(batch)
+        self._write_checkpoint(segment, offset)
+        return written
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        replayed = self.replay()
+        if replayed:
+            logger.warning("Replayed %s ballots from the ballot log", replayed)
+
+        # Always append to a fresh segment; older ones are fully written
+        segments = self._segments()
+        self._segment = segments[-1] + 1 if segments else 1
+        self._file = self._open_segment()
+        self._write_checkpoint(self._segment, 0)
+        self._remove_segments_before(self._segment)
+
+        self._threads = [
+            threading.Thread(target=self._sync_loop, name="ballot-log-sync", daemon=True),
+            threading.Thread(target=self._writer_loop, name="ballot-log-writer", daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Fsync and write everything still pending, then stop the threads"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._threads[0].join()
+        with self._writer_cond:
+            self._writer_cond.notify_all()
+        self._threads[1].join()
+        self._file.close()
+
+    def _open_segment(self):
+        # Unbuffered: each group is one write, and a failed one leaves nothing
+        # behind in a buffer to be flushed later
+        return open(os.path.join(self.directory, _segment_name(self._segment)), "ab", buffering=0)
+
+    def _remove_segments_before(self, segment: int) -> None:
+        for number in self._segments():
+            if number < segment:
+                os.remove(os.path.join(self.directory, _segment_name(number)))
+
+    # Group commit
+
+    async def append(self, record: dict) -> None:
+        """Append a ballot and wait until it is durable on disk"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Ballot log is stopped")
+            if self._failed:
+                raise RuntimeError("Ballot log is unavailable") from self._failed
+            self._buffer.append((_encode(record), record, loop, future))
+            self._cond.notify()
+        await future
+
+    def _sync_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._buffer and not self._stopped:
+                    self._cond.wait()
+                if not self._buffer and self._stopped:
+                    return
+
+            # Give concurrent requests a moment to join this group
+            if BALLOT_LOG_GROUP_COMMIT_MS > 0:
+                time.sleep(BALLOT_LOG_GROUP_COMMIT_MS / 1000)
+
+            with self._cond:
+                group, self._buffer = self._buffer, []
+            self._sync_group(group)
+
+    def _sync_group(self, group) -> None:
+        if self._failed:
+            for _, _, loop, future in group:
+                loop.call_soon_threadsafe(_resolve, future, RuntimeError("Ballot log is unavailable"))
+            return
+        start = self._file.tell()
+        positions = []
+        end = start
+        for line, _, _, _ in group:
+            end += len(line)
+            positions.append(end)
+        try:
+            data = memoryview(b"".join(line for line, _, _, _ in group))
+            while data:
+                data = data[self._file.write(data):]
+            os.fsync(self._file.fileno())
+        except Exception as e:
+            self._discard_group(start)
+            for _, _, loop, future in group:
+                loop.call_soon_threadsafe(_resolve, future, e)
+            return
+
+        with self._writer_cond:
+            for (_, record, _, _), offset in zip(group, positions):
+                self._pending.append((record, self._segment, offset))
+            if len(self._pending) >= BALLOT_LOG_FLUSH_BATCH:
+                self._writer_cond.notify()
+
+        for _, _, loop, future in group:
+            loop.call_soon_threadsafe(_resolve, future, None)
+
+        if positions and positions[-1] >= BALLOT_LOG_SEGMENT_BYTES:
+            self._file.close()
+            self._segment += 1
+            self._file = self._open_segment()
+
+    def _discard_group(self, start: int) -> None:
+        """Cut the lines of a group that failed to sync off the segment.
+
+        Its voters get a 503 and their eligibility back, so none of these
+        lines may ever reach `votos` (by the writer or a replay). Logging
+        continues in a fresh segment. If the lines can't be cut, the log
+        stops accepting ballots."""
+        try:
+            os.ftruncate(self._file.fileno(), start)
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._segment += 1
+            self._file = self._open_segment()
+        except Exception as e:
+            logger.critical(
+                "Could not discard a failed write from ballot log segment %s after offset %s; "
+                "the log stops accepting ballots and the segment must be truncated there before restarting",
+                self._segment, start, exc_info=True
+            )
+            with self._cond:
+                self._failed = e
+
+    # Write-behind
+
+    def drain(self, election_id: uuid.UUID, timeout: float) -> bool:
+        """Make the writer flush now and wait until no ballot of the election
+        is left in this log's buffers. False if ``timeout`` expires first."""
+        key = str(election_id)
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                buffered = any(record["eleccion_id"] == key for _, record, _, _ in self._buffer)
+            with self._writer_cond:
+                if not buffered and not any(record["eleccion_id"] == key for record, _, _ in self._pending):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._writer_cond.notify_all()
+                self._writer_cond.wait(timeout=min(remaining, BALLOT_LOG_FLUSH_INTERVAL))
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._writer_cond:
+                if not self._stopped and len(self._pending) < BALLOT_LOG_FLUSH_BATCH:
+                    self._writer_cond.wait(timeout=BALLOT_LOG_FLUSH_INTERVAL)
+                batch = self._pending[:BALLOT_LOG_FLUSH_BATCH]
+                stopping = self._stopped and len(self._pending) <= BALLOT_LOG_FLUSH_BATCH
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception:
+                    # Keep the batch pending and retry on the next round
+                    logger.exception("Failed to write ballot batch, will retry")
+                    time.sleep(BALLOT_LOG_FLUSH_INTERVAL)
+                    continue
+            if stopping:
+                return
+
+    def _write_batch(self, batch: List[Tuple[dict, int, int]]) -> None:
+        write_sharded_ballots([record for record, _, _ in batch])
+
+        with self._writer_cond:
+            del self._pending[:len(batch)]
+            # Wake drain() callers
+            self._writer_cond.notify_all()
+        _, segment, offset = batch[-1]
+        self._write_checkpoint(segment, offset)
+        self._remove_segments_before(segment)
+
+def _resolve(future: asyncio.Future, error: Optional[Exception]) -> None:
+    if future.done():
+        return
+    if error:
+        future.set_exception(error)
+    else:
+        future.set_result(None)
+
+_ballot_log: Optional[BallotLog] = None
+
+def start_ballot_log() -> Optional[BallotLog]:
+    global _ballot_log
+    if BALLOT_INGESTION_MODE == "log" and _ballot_log is None:
+        _ballot_log = BallotLog()
+        _ballot_log.start()
+    return _ballot_log
+
+def stop_ballot_log() -> None:
+    global _ballot_log
+    if _ballot_log:
+        _ballot_log.stop()
+        _ballot_log = None
+
+def get_ballot_log() -> Optional[BallotLog]:
+    """The running ballot log, or None in direct ingestion mode"""
+    return _ballot_log
@@ -0,0 +1,159 @@
+import csv
+import io
+import json
+from typing import Iterable, Iterator, List
+import uuid
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, func
+
+from src.database.database import DEFAULT_SHARD, session_for_shard
+from src.models.models import Election, User, VotanteEleccion, Vote
+from src.services.results import get_results_snapshot
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Rows fetched per round trip and rows buffered per emitted chunk
+EXPORT_BATCH_SIZE = 1000
+
+def _encode_rows(rows: Iterable[dict], columns: List[str], fmt: str) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+
+    pending = 0
+    for row in rows:
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False, default=str))
+            buffer.write("\n")
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def export_response(rows: Iterable[dict], columns: List[str], fmt: str, filename: str) -> StreamingResponse:
+    """Stream rows as CSV or NDJSON without materializing the whole export"""
+    return StreamingResponse(
+        _encode_rows(rows, columns, fmt),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
+
+# The generators below open their own session: request-scoped sessions are
+# closed before a StreamingResponse starts iterating.
+
+PARTICIPATION_COLUMNS = [
+    "election_id", "title", "status", "start_date", "end_date",
+    "registered_voters", "votes_cast", "participation_rate"
+]
+
+def participation_rows(tenant_id: uuid.UUID, shard: str = DEFAULT_SHARD) -> Iterator[dict]:
+    db = session_for_shard(shard)
+    try:
+        query = db.query(
+            Election.id,
+            Election.titulo,
+            Election.estado,
+            Election.fecha_inicio,
+            Election.fecha_fin,
+            func.count(VotanteEleccion.votante_id),
+            func.coalesce(func.sum(case((VotanteEleccion.ha_votado == True, 1), else_=0)), 0)
+        ).outerjoin(
+            VotanteEleccion, VotanteEleccion.eleccion_id == Election.id
+        ).filter(
+            Election.tenant_id == tenant_id
+        ).group_by(
+            Election.id
+        ).order_by(Election.fecha_inicio).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+        for election_id, titulo, estado, fecha_inicio, fecha_fin, registered, voted in query:
+            yield {
+                "election_id": str(election_id),
+                "title": titulo,
+                "status": estado,
+                "start_date": fecha_inicio.isoformat(),
+                "end_date": fecha_fin.isoformat(),
+                "registered_voters": registered,
+                "votes_cast": voted,
+                "participation_rate": round(voted / registered * 100, 2) if registered else 0
+            }
+    finally:
+        db.close()
+
+VOTER_ROLL_COLUMNS = ["voter_id", "email", "nombre", "apellido", "ha_votado"]
+
+def voter_roll_rows(election_id: uuid.UUID, shard: str = DEFAULT_SHARD) -> Iterator[dict]:
+    db = session_for_shard(shard)
+    try:
+        query = db.query(
+            User.id, User.email, User.nombre, User.apellido, VotanteEleccion.ha_votado
+        ).join(
+            VotanteEleccion, VotanteEleccion.votante_id == User.id
+        ).filter(
+            VotanteEleccion.eleccion_id == election_id
+        ).order_by(User.apellido, User.nombre).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+        for voter_id, email, nombre, apellido, ha_votado in query:
+            yield {
+                "voter_id": str(voter_id),
+                "email": email,
+                "nombre": nombre,
+                "apellido": apellido,
+                "ha_votado": ha_votado
+            }
+    finally:
+        db.close()
+
+HOURLY_ACTIVITY_COLUMNS = ["hour", "votes"]
+
+def _hour_bucket(db):
+    if db.bind.dialect.name == "postgresql":
+        return func.to_char(func.date_trunc("hour", Vote.timestamp), "YYYY-MM-DD HH24:00")
+    return func.strftime("%Y-%m-%d %H:00", Vote.timestamp)
+
+def hourly_activity_rows(election_id: uuid.UUID, shard: str = DEFAULT_SHARD) -> Iterator[dict]:
+    db = session_for_shard(shard)
+    try:
+        hour = _hour_bucket(db).label("hour")
+        query = db.query(hour, func.count(Vote.id)).filter(
+            Vote.eleccion_id == election_id
+        ).group_by(hour).order_by(hour)
+
+        for bucket, votes in query:
+            yield {"hour": bucket, "votes": votes}
+    finally:
+        db.close()
+
+RESULTS_COLUMNS = ["cargo", "candidate_id", "numero_orden", "candidate_name", "lista", "votes", "percentage"]
+
+def results_rows(election_id: uuid.UUID, shard: str = DEFAULT_SHARD) -> Iterator[dict]:
+    db = session_for_shard(shard)
+    try:
+        election = db.query(Election).filter(Election.id == election_id).first()
+        snapshot = json.loads(get_results_snapshot(db, election).contenido)
+    finally:
+        db.close()
+
+    ordered = sorted(snapshot["results"].items(), key=lambda item: (item[1]["cargo"], item[1]["numero_orden"]))
+    for candidate_id, result in ordered:
+        yield {
+            "cargo": result["cargo"],
+            "candidate_id": candidate_id,
+            "numero_orden": result["numero_orden"],
+            "candidate_name": result["candidate_name"],
+            "lista": result["lista"],
+            "votes": result["votes"],
+            "percentage": result["percentage"]
+        }
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import uuid
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.models.models import Candidate, Cargo, ClaveEleccion, Election, VotanteEleccion, Vote
+from src.utils import elgamal
+from src.utils.crypto import decrypt_vote, encrypt_vote
+from src.utils.parallel import map_chunks
+
+# Tallies multiply ciphertexts in chunks spread over worker processes
+TALLY_WORKERS = int(os.getenv("TALLY_WORKERS", str(os.cpu_count() or 1)))
+TALLY_CHUNK = int(os.getenv("TALLY_CHUNK", "20000"))
+
+# Elections whose fixed-base tables are kept in memory for encryption
+MAX_CACHED_KEYS = 32
+
+_public_cache: "OrderedDict[uuid.UUID, Tuple[List[str], List[elgamal.FixedBase]]]" = OrderedDict()
+_public_cache_lock = threading.Lock()
+
+def get_election_key(db: Session, election: Election) -> ClaveEleccion:
+    """The election's ElGamal keys, generated on its first ballot.
+
+    Candidates of an active election are fixed, so the key covers exactly the
+    candidates that can receive votes; PONDERADA elections get a second key
+    per candidate for the weighted choice. Concurrent first ballots race on
+    the primary key and the loser uses the winner's key.
+    """
+    key = db.query(ClaveEleccion).filter(ClaveEleccion.eleccion_id == election.id).first()
+    if key:
+        return key
+
+    candidate_ids = [
+        str(candidate_id) for (candidate_id,) in db.query(Candidate.id).join(Cargo).filter(
+            Cargo.eleccion_id == election.id
+        ).order_by(Candidate.id)
+    ]
+    slots = 2 * len(candidate_ids) if election.tipo_votacion == "PONDERADA" else len(candidate_ids)
+    private, public = elgamal.generate_keys(slots)
+    key = ClaveEleccion(
+        eleccion_id=election.id,
+        candidatos=json.dumps(candidate_ids),
+        claves_publicas=json.dumps([format(h, "x") for h in public]),
+        clave_privada=encrypt_vote(json.dumps([format(x, "x") for x in private]))
+    )
+    try:
+        with db.begin_nested():
+            db.add(key)
+    except IntegrityError:
+        key = db.query(ClaveEleccion).filter(ClaveEleccion.eleccion_id == election.id).first()
+    return key
+
+def _public_bases(db: Session, election: Election) -> Tuple[List[str], List[elgamal.FixedBase]]:
+    with _public_cache_lock:
+        if election.id in _public_cache:
+            _public_cache.move_to_end(election.id)
+            return _public_cache[election.id]
+
+    key = get_election_key(db, election)
+    entry = (
+        json.loads(key.candidatos),
+        [elgamal.FixedBase(int(h, 16)) for h in json.loads(key.claves_publicas)]
+    )
+    with _public_cache_lock:
+        _public_cache[election.id] = entry
+        while len(_public_cache) > MAX_CACHED_KEYS:
+            _public_cache.popitem(last=False)
+    return entry
+
+def encrypt_ballot(db: Session, election: Election, candidate_ids: List[uuid.UUID], weight: int = 1) -> str:
+    """Encrypt a ballot as one ElGamal ciphertext per candidate of the election
+    (and one more per candidate with the voter's weight for PONDERADA)"""
+    candidates, bases = _public_bases(db, election)
+    selected = {str(candidate_id) for candidate_id in candidate_ids}
+    choices = [1 if candidate in selected else 0 for candidate in candidates]
+    if len(bases) > len(candidates):
+        choices += [choice * weight for choice in choices]
+    return elgamal.serialize_ciphertext(elgamal.encrypt_choices(bases, choices))
+
+def homomorphic_totals(db: Session, election: Election) -> Tuple[Dict[str, int], Optional[Dict[str, int]]]:
+    """Votes (and weighted votes for PONDERADA) per candidate id, obtained by
+    multiplying every ballot's ciphertexts and decrypting only the aggregates"""
+    key = db.query(ClaveEleccion).filter(ClaveEleccion.eleccion_id == election.id).first()
+    if not key:
+        # No ballot was ever cast
+        return {}, None
+
+    ballots = (
+        voto_cifrado for (voto_cifrado,) in db.query(Vote.voto_cifrado).filter(
+            Vote.eleccion_id == election.id
+        ).yield_per(TALLY_CHUNK)
+    )
+
+    def max_weight() -> int:
+        return db.query(func.max(VotanteEleccion.peso)).filter(
+            VotanteEleccion.eleccion_id == election.id
+        ).scalar() or 1
+
+    return aggregate_totals(key, ballots, max_weight)
+
+def aggregate_totals(
+    key: ClaveEleccion,
+    ballots: Iterable[str],
+    max_weight: Callable[[], int]
+) -> Tuple[Dict[str, int], Optional[Dict[str, int]]]:
+    """Multiply serialized ballots and decrypt the aggregates with the
+    election key; ``max_weight`` bounds the weighted slots"""
+    candidates = json.loads(key.candidatos)
+    slots = len(json.loads(key.claves_publicas))
+    parts, total, _ = map_chunks(elgamal.aggregate_serialized, ballots, TALLY_CHUNK, TALLY_WORKERS, slots)
+    aggregate = elgamal.combine(slots, parts)
+
+    bounds = [total] * len(candidates)
+    if slots > len(candidates):
+        bounds += [total * max_weight()] * len(candidates)
+
+    private = [int(x, 16) for x in json.loads(decrypt_vote(key.clave_privada))]
+    totals = elgamal.decrypt_totals(private, aggregate, bounds)
+    votes = dict(zip(candidates, totals))
+    weighted = dict(zip(candidates, totals[len(candidates):])) if slots > len(candidates) else None
+    return votes, weighted
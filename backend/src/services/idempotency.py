@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Union
+
+from fastapi import Depends, Header, HTTPException, Request, Response, status
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+
+from src.database.database import SessionLocal
+from src.models.models import ClaveIdempotencia, User
+from src.services.purge import PURGE_PAUSE_SECONDS, delete_batch
+from src.utils.dependencies import get_current_active_user
+
+# How long a completed response can be replayed
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# A request still in progress after this long is considered abandoned
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+# Expired keys are deleted by the scheduler leader every this many seconds,
+# in batches, at most IDEMPOTENCY_SWEEP_MAX_BATCHES per sweep
+IDEMPOTENCY_SWEEP_SECONDS = int(os.getenv("IDEMPOTENCY_SWEEP_SECONDS", "300"))
+IDEMPOTENCY_SWEEP_MAX_BATCHES = int(os.getenv("IDEMPOTENCY_SWEEP_MAX_BATCHES", "20"))
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+class IdempotencyGuard:
+    """Reservation of an Idempotency-Key for the current request.
+
+    ``replay`` holds the stored response when the key was already used for an
+    identical request; the route returns it as-is. Otherwise the route runs
+    normally and passes its result through ``store``. Without a key every
+    method is a no-op.
+    """
+
+    def __init__(self, clave: Optional[str] = None, huella: Optional[str] = None):
+        self.clave = clave
+        self.huella = huella
+        self.replay: Optional[Response] = None
+
+    def reserve(self) -> None:
+        db = SessionLocal()
+        try:
+            now = _utcnow()
+            entry = db.query(ClaveIdempotencia).filter(ClaveIdempotencia.clave == self.clave).first()
+            if entry:
+                expira = entry.expira if entry.expira.tzinfo else entry.expira.replace(tzinfo=timezone.utc)
+                if expira > now:
+                    self.replay = self._replay(entry)
+                    return
+                # Expired or abandoned: take it over
+                db.delete(entry)
+                db.flush()
+
+            db.add(ClaveIdempotencia(
+                clave=self.clave,
+                huella=self.huella,
+                estado="EN_PROCESO",
+                expira=now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # A concurrent retry reserved the key first
+                db.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is already in progress"
+                )
+        finally:
+            db.close()
+
+    def _replay(self, entry: ClaveIdempotencia) -> Response:
+        if entry.huella != self.huella:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        if entry.estado != "COMPLETADO":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is already in progress"
+            )
+        return Response(
+            content=entry.respuesta,
+            status_code=entry.codigo_estado,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+    def store(self, content: Union[BaseModel, dict], status_code: int = 200) -> Union[BaseModel, dict]:
+        """Persist the response for replays and hand it back to the route"""
+        if not self.clave:
+            return content
+
+        body = content.model_dump_json() if isinstance(content, BaseModel) else json.dumps(content, default=str)
+        db = SessionLocal()
+        try:
+            db.query(ClaveIdempotencia).filter(ClaveIdempotencia.clave == self.clave).update({
+                "estado": "COMPLETADO",
+                "codigo_estado": status_code,
+                "respuesta": body,
+                "expira": _utcnow() + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        return content
+
+    def release(self) -> None:
+        """Drop the reservation so the client can retry after a failure"""
+        db = SessionLocal()
+        try:
+            db.query(ClaveIdempotencia).filter(
+                ClaveIdempotencia.clave == self.clave,
+                ClaveIdempotencia.estado == "EN_PROCESO"
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+async def idempotency_guard(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Dependency enabling the Idempotency-Key header on a write endpoint"""
+    if not idempotency_key:
+        yield IdempotencyGuard()
+        return
+
+    if len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Idempotency-Key is too long"
+        )
+
+    # Keys are scoped per user and endpoint; the fingerprint covers the query and body
+    scope = f"{current_user.id}:{request.method}:{request.url.path}:{idempotency_key}"
+    body = await request.body()
+    fingerprint = hashlib.sha256(request.url.query.encode() + b"\n" + body).hexdigest()
+
+    guard = IdempotencyGuard(hashlib.sha256(scope.encode()).hexdigest(), fingerprint)
+    guard.reserve()
+    if guard.replay is not None:
+        yield guard
+        return
+
+    try:
+        yield guard
+    except Exception:
+        guard.release()
+        raise
+
+def purge_expired_keys(max_batches: int = IDEMPOTENCY_SWEEP_MAX_BATCHES) -> int:
+    """Delete expired keys in short batches; returns how many were deleted.
+    Keys are otherwise only removed when reused."""
+    deleted = 0
+    db = SessionLocal()
+    try:
+        for _ in range(max_batches):
+            batch = delete_batch(db, ClaveIdempotencia, [ClaveIdempotencia.expira < _utcnow()])
+            db.commit()
+            deleted += batch
+            if not batch:
+                break
+            time.sleep(PURGE_PAUSE_SECONDS)
+    finally:
+        db.close()
+    return deleted
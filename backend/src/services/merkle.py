@@ -0,0 +1,156 @@
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import uuid
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from src.models.models import ArbolMerkle, BloqueVotos, NodoMerkle, Vote
+from src.utils.crypto import ballot_receipt
+
+# Root of a tree without leaves
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+# Domain separation between leaves and interior nodes (as in RFC 6962)
+def leaf_hash(receipt: str) -> str:
+    return hashlib.sha256(b"\x00" + bytes.fromhex(receipt)).hexdigest()
+
+def node_hash(left: str, right: str) -> str:
+    return hashlib.sha256(b"\x01" + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+def tree_height(size: int) -> int:
+    """Level of the root for a tree with ``size`` leaves"""
+    return max(size - 1, 0).bit_length()
+
+class _NodeCache:
+    """Nodes of one election touched while appending, loaded on demand"""
+
+    def __init__(self, db: Session, election_id: uuid.UUID):
+        self.db = db
+        self.election_id = election_id
+        self.nodes: Dict[Tuple[int, int], NodoMerkle] = {}
+
+    def get(self, nivel: int, indice: int) -> Optional[str]:
+        key = (nivel, indice)
+        if key not in self.nodes:
+            node = self.db.query(NodoMerkle).filter(
+                NodoMerkle.eleccion_id == self.election_id,
+                NodoMerkle.nivel == nivel,
+                NodoMerkle.indice == indice
+            ).first()
+            if not node:
+                return None
+            self.nodes[key] = node
+        return self.nodes[key].hash
+
+    def set(self, nivel: int, indice: int, value: str) -> None:
+        node = self.nodes.get((nivel, indice))
+        if node is None:
+            node = self.db.query(NodoMerkle).filter(
+                NodoMerkle.eleccion_id == self.election_id,
+                NodoMerkle.nivel == nivel,
+                NodoMerkle.indice == indice
+            ).first()
+        if node is None:
+            node = NodoMerkle(eleccion_id=self.election_id, nivel=nivel, indice=indice, hash=value)
+            self.db.add(node)
+        node.hash = value
+        self.nodes[(nivel, indice)] = node
+
+def _lock_tree(db: Session, election_id: uuid.UUID) -> ArbolMerkle:
+    """Lock the election's tree row, creating it (and backfilling ballots
+    sealed before the tree existed) on first use"""
+    tree = db.query(ArbolMerkle).filter(ArbolMerkle.eleccion_id == election_id).with_for_update().first()
+    if tree:
+        return tree
+
+    tree = ArbolMerkle(eleccion_id=election_id, tamano=0, raiz=EMPTY_ROOT)
+    db.add(tree)
+    existing = db.query(Vote.voto_cifrado, Vote.firma_digital).join(
+        BloqueVotos, Vote.bloque_id == BloqueVotos.id
+    ).filter(
+        Vote.eleccion_id == election_id
+    ).order_by(BloqueVotos.numero, Vote.timestamp, Vote.id).all()
+    _append(db, tree, [ballot_receipt(voto_cifrado, firma) for voto_cifrado, firma in existing])
+    db.flush()
+    return tree
+
+def _append(db: Session, tree: ArbolMerkle, receipts: List[str]) -> None:
+    cache = _NodeCache(db, tree.eleccion_id)
+    size = tree.tamano
+    for receipt in receipts:
+        index = size
+        size += 1
+        cache.set(0, index, leaf_hash(receipt))
+
+        # Recompute the path to the root; a node without a right child is
+        # its left child promoted unchanged
+        for nivel in range(1, tree_height(size) + 1):
+            indice = index >> nivel
+            left = cache.get(nivel - 1, 2 * indice)
+            right = cache.get(nivel - 1, 2 * indice + 1) if 2 * indice + 1 <= (size - 1) >> (nivel - 1) else None
+            cache.set(nivel, indice, node_hash(left, right) if right else left)
+
+    tree.tamano = size
+    tree.raiz = cache.get(tree_height(size), 0) if size else EMPTY_ROOT
+    tree.fecha_actualizacion = datetime.utcnow()
+
+def append_leaves(db: Session, election_id: uuid.UUID, receipts: List[str]) -> ArbolMerkle:
+    """Add ballot receipts to an election's tree in O(log n) nodes each.
+
+    Runs inside the caller's transaction so the tree commits together with
+    the ballots; the tree row lock orders concurrent appenders.
+    """
+    tree = _lock_tree(db, election_id)
+    _append(db, tree, receipts)
+    return tree
+
+def get_tree(db: Session, election_id: uuid.UUID) -> Optional[ArbolMerkle]:
+    return db.query(ArbolMerkle).filter(ArbolMerkle.eleccion_id == election_id).first()
+
+def inclusion_proof(db: Session, tree: ArbolMerkle, receipt: str) -> Optional[dict]:
+    """O(log n) audit path from a receipt's leaf to the current root"""
+    leaf = db.query(NodoMerkle.indice).filter(
+        NodoMerkle.eleccion_id == tree.eleccion_id,
+        NodoMerkle.hash == leaf_hash(receipt),
+        NodoMerkle.nivel == 0
+    ).first()
+    if not leaf:
+        return None
+
+    index, size = leaf[0], tree.tamano
+    siblings = []
+    for nivel in range(tree_height(size)):
+        sibling = (index >> nivel) ^ 1
+        if sibling <= (size - 1) >> nivel:
+            siblings.append((nivel, sibling, "left" if sibling < index >> nivel else "right"))
+
+    hashes = {}
+    if siblings:
+        hashes = {
+            (nivel, indice): value for nivel, indice, value in db.query(
+                NodoMerkle.nivel, NodoMerkle.indice, NodoMerkle.hash
+            ).filter(
+                NodoMerkle.eleccion_id == tree.eleccion_id,
+                tuple_(NodoMerkle.nivel, NodoMerkle.indice).in_([(nivel, indice) for nivel, indice, _ in siblings])
+            )
+        }
+
+    return {
+        "leaf_index": index,
+        "tree_size": size,
+        "root": tree.raiz,
+        "leaf_hash": leaf_hash(receipt),
+        "path": [{"hash": hashes[(nivel, indice)], "position": position} for nivel, indice, position in siblings]
+    }
+
+def verify_inclusion(receipt: str, path: List[dict], root: str) -> bool:
+    """Check an inclusion proof client-side"""
+    current = leaf_hash(receipt)
+    for step in path:
+        if step["position"] == "left":
+            current = node_hash(step["hash"], current)
+        else:
+            current = node_hash(current, step["hash"])
+    return current == root
@@ -0,0 +1,135 @@
+import logging
+import os
+from typing import Dict, List, Optional
+import uuid
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from src.models.models import VotanteEleccion, Vote
+
+# On PostgreSQL `votos` and `votantes_eleccion` are LIST-partitioned by
+# eleccion_id: every election gets its own partition when it is created, so
+# per-election scans touch only that election's rows and an election can be
+# archived or purged by detaching or dropping its partitions. Rows of
+# elections created before partitioning live in the DEFAULT partition.
+PARTITIONED_TABLES = (Vote.__tablename__, VotanteEleccion.__tablename__)
+
+# DDL on a partitioned table locks its parent; give up instead of queueing
+# behind long-running queries (and every ballot behind the DDL)
+PARTITION_LOCK_TIMEOUT = os.getenv("PARTITION_LOCK_TIMEOUT", "5s")
+
+logger = logging.getLogger(__name__)
+
+def partition_name(table: str, election_id: uuid.UUID) -> str:
+    return f"{table}_{election_id.hex}"
+
+def partitioning_enabled(db: Session) -> bool:
+    """Whether `votos` is a partitioned table in this database"""
+    if db.bind.dialect.name != "postgresql":
+        return False
+    return bool(db.execute(text(
+        "SELECT 1 FROM pg_partitioned_table JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid "
+        "WHERE pg_class.relname = :table"
+    ), {"table": Vote.__tablename__}).scalar())
+
+def election_partition(db: Session, table: str, election_id: uuid.UUID) -> Optional[str]:
+    """Name of the partition of ``table`` holding exactly ``election_id``, if
+    the table is LIST-partitioned on PostgreSQL"""
+    if db.bind.dialect.name != "postgresql":
+        return None
+    return db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table AND pg_get_expr(child.relpartbound, child.oid) = :bound"
+    ), {"table": table, "bound": f"FOR VALUES IN ('{election_id}')"}).scalar()
+
+def has_default_partition(db: Session, table: str) -> bool:
+    return bool(db.execute(text(
+        "SELECT 1 FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table AND pg_get_expr(child.relpartbound, child.oid) = 'DEFAULT'"
+    ), {"table": table}).scalar())
+
+def detach_partition(db: Session, table: str, partition: str) -> None:
+    """Detach one partition, committing the session first.
+
+    ``DETACH PARTITION ... CONCURRENTLY`` only takes SHARE UPDATE EXCLUSIVE on
+    the parent, so ballots keep flowing, but PostgreSQL refuses it while the
+    table has a DEFAULT partition; then the plain form is used, which holds
+    ACCESS EXCLUSIVE on the parent only for the catalog change. Either way
+    the lock is awaited for at most PARTITION_LOCK_TIMEOUT. A concurrent
+    detach that was interrupted is finalized."""
+    db.commit()
+    pending = db.execute(text(
+        "SELECT inhdetachpending FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE child.relname = :partition"
+    ), {"partition": partition}).scalar()
+    concurrent = not has_default_partition(db, table)
+    db.commit()
+    if pending:
+        statement = f'ALTER TABLE {table} DETACH PARTITION "{partition}" FINALIZE'
+    elif concurrent:
+        statement = f'ALTER TABLE {table} DETACH PARTITION "{partition}" CONCURRENTLY'
+    else:
+        statement = f'ALTER TABLE {table} DETACH PARTITION "{partition}"'
+    # CONCURRENTLY can't run in a transaction block
+    with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"SET lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+        try:
+            conn.execute(text(statement))
+        finally:
+            conn.execute(text("RESET lock_timeout"))
+
+def _create_partitions(db: Session, election_id: uuid.UUID) -> None:
+    db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    for table in PARTITIONED_TABLES:
+        db.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{partition_name(table, election_id)}" '
+            f"PARTITION OF {table} FOR VALUES IN ('{election_id}')"
+        ))
+
+def create_election_partitions(db: Session, election_id: uuid.UUID) -> bool:
+    """Create the partitions of a new election (commits). On failure, e.g. a
+    lock timeout, the election's rows go to the DEFAULT partitions."""
+    if not partitioning_enabled(db):
+        return False
+    try:
+        _create_partitions(db, election_id)
+        db.commit()
+        return True
+    except Exception:
+        db.rollback()
+        logger.warning("Could not create partitions for election %s; using the default partition", election_id, exc_info=True)
+        return False
+
+def detach_election_partitions(db: Session, election_id: uuid.UUID) -> Dict[str, str]:
+    """Detach an election's partitions (commits): its rows leave `votos` and
+    `votantes_eleccion` at once and remain in standalone tables, returned by
+    parent table, ready to be archived and dropped. Only metadata changes,
+    so it takes a brief lock instead of a long DELETE."""
+    detached = {}
+    db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    for table in PARTITIONED_TABLES:
+        partition = election_partition(db, table, election_id)
+        if partition is not None:
+            db.execute(text(f'ALTER TABLE {table} DETACH PARTITION "{partition}"'))
+            detached[table] = partition
+    db.commit()
+    return detached
+
+def list_election_partitions(db: Session) -> List[dict]:
+    """Partitions of the partitioned tables with their estimated row counts"""
+    rows = db.execute(text(
+        "SELECT parent.relname, child.relname, pg_get_expr(child.relpartbound, child.oid), child.reltuples "
+        "FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname IN :tables ORDER BY parent.relname, child.relname"
+    ).bindparams(bindparam("tables", expanding=True)), {"tables": list(PARTITIONED_TABLES)})
+    return [
+        {"tabla": parent, "particion": child, "limite": bound, "filas_estimadas": max(int(tuples), 0)}
+        for parent, child, bound, tuples in rows
+    ]
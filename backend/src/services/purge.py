@@ -0,0 +1,217 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+import uuid
+
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from src.database.database import DEFAULT_SHARD, session_for_shard, shard_names, shard_of
+from src.models.models import (
+    ArbolMerkle, ArchivoEleccion, BloqueVotos, BoletaEleccion, Candidate, Cargo, ClaveEleccion, ConteoSimulacro, Election,
+    ListaPartido, MetricaUso, NodoMerkle, ResultadoEleccion, ShardTenant, Simulacro, Tenant, TrabajoPurga, TrabajoReporte,
+    User, VotanteEleccion, Vote, VotoSimulacro
+)
+from src.services.partitions import (
+    PARTITION_LOCK_TIMEOUT, PARTITIONED_TABLES, detach_partition, election_partition, partition_name
+)
+
+# Dependent rows are deleted in short transactions of at most PURGE_BATCH_SIZE
+# rows, pausing between batches so purges never hold long locks or flood the WAL
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "5000"))
+PURGE_PAUSE_SECONDS = float(os.getenv("PURGE_PAUSE_SECONDS", "0.1"))
+PURGE_WORKERS = int(os.getenv("PURGE_WORKERS", "1"))
+
+FINISHED_STATES = ("COMPLETADO", "FALLIDO")
+
+logger = logging.getLogger(__name__)
+
+# (model, filter criteria, election id when the criteria select one election)
+PurgeStep = Tuple[Any, list, Optional[uuid.UUID]]
+
+def _simulacro_steps(simulacro_ids) -> List[PurgeStep]:
+    return [
+        (VotoSimulacro, [VotoSimulacro.simulacro_id.in_(simulacro_ids)], None),
+        (ConteoSimulacro, [ConteoSimulacro.simulacro_id.in_(simulacro_ids)], None),
+        (Simulacro, [Simulacro.id.in_(simulacro_ids)], None)
+    ]
+
+def _election_steps(election_id: uuid.UUID) -> List[PurgeStep]:
+    cargo_ids = select(Cargo.id).where(Cargo.eleccion_id == election_id)
+    # Children before parents: votos reference bloques_votos, candidates are
+    # referenced by simulacro counters
+    return _simulacro_steps(select(Simulacro.id).where(Simulacro.eleccion_id == election_id)) + [
+        (Vote, [Vote.eleccion_id == election_id], election_id),
+        (BloqueVotos, [BloqueVotos.eleccion_id == election_id], None),
+        (NodoMerkle, [NodoMerkle.eleccion_id == election_id], None),
+        (ArbolMerkle, [ArbolMerkle.eleccion_id == election_id], None),
+        (VotanteEleccion, [VotanteEleccion.eleccion_id == election_id], election_id),
+        (ResultadoEleccion, [ResultadoEleccion.eleccion_id == election_id], None),
+        (BoletaEleccion, [BoletaEleccion.eleccion_id == election_id], None),
+        (ClaveEleccion, [ClaveEleccion.eleccion_id == election_id], None),
+        (Candidate, [Candidate.cargo_id.in_(cargo_ids)], None),
+        (Cargo, [Cargo.eleccion_id == election_id], None),
+        (ArchivoEleccion, [ArchivoEleccion.eleccion_id == election_id], None),
+        (Election, [Election.id == election_id], None)
+    ]
+
+def _tenant_steps(db: Session, tenant_id: uuid.UUID) -> List[PurgeStep]:
+    steps = []
+    for (election_id,) in db.query(Election.id).filter(Election.tenant_id == tenant_id):
+        steps += _election_steps(election_id)
+    return steps + [
+        (ListaPartido, [ListaPartido.tenant_id == tenant_id], None),
+        (MetricaUso, [MetricaUso.tenant_id == tenant_id], None),
+        (TrabajoReporte, [TrabajoReporte.tenant_id == tenant_id], None),
+        (User, [User.tenant_id == tenant_id], None),
+        (ShardTenant, [ShardTenant.tenant_id == tenant_id], None),
+        (Tenant, [Tenant.id == tenant_id], None)
+    ]
+
+def purge_plan(db: Session, job: TrabajoPurga) -> List[PurgeStep]:
+    if job.tipo == "SIMULACRO":
+        return _simulacro_steps([job.objetivo_id])
+    if job.tipo == "ELECCION":
+        return _election_steps(job.objetivo_id)
+    if job.tipo == "TENANT":
+        return _tenant_steps(db, job.objetivo_id)
+    raise ValueError(f"Unknown purge type: {job.tipo}")
+
+def delete_batch(db: Session, model, criteria: list, batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Delete up to ``batch_size`` rows of ``model`` matching ``criteria`` by
+    primary key (uncommitted). Returns the number of rows deleted."""
+    keys = list(model.__mapper__.primary_key)
+    rows = db.query(*keys).filter(*criteria).limit(batch_size).all()
+    if not rows:
+        return 0
+    if len(keys) == 1:
+        condition = keys[0].in_([row[0] for row in rows])
+    else:
+        condition = tuple_(*keys).in_([tuple(row) for row in rows])
+    db.query(model).filter(condition).delete(synchronize_session=False)
+    return len(rows)
+
+def _drop_partition(db: Session, table: str, election_id: uuid.UUID) -> bool:
+    """Detach the election's partition of ``table`` and drop it. Dropping an
+    attached partition would lock the whole parent table, so the standalone
+    table is dropped once detached. When the detach times out waiting for its
+    lock the rows are deleted in batches instead."""
+    partition = election_partition(db, table, election_id)
+    if partition is None:
+        # Detached by an earlier, interrupted run of this job
+        partition = partition_name(table, election_id)
+        if db.bind.dialect.name != "postgresql" or not db.execute(
+            text("SELECT to_regclass(:partition)"), {"partition": f'"{partition}"'}
+        ).scalar():
+            return False
+    else:
+        try:
+            detach_partition(db, table, partition)
+        except OperationalError:
+            db.rollback()
+            logger.warning("Could not detach %s; deleting its rows in batches", partition, exc_info=True)
+            return False
+    db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    db.execute(text(f'DROP TABLE "{partition}"'))
+    return True
+
+_stop = threading.Event()
+
+def run_purge_job(job_id: str, shard: str = DEFAULT_SHARD) -> None:
+    """Purge the rows of a job step by step. Safe to call more than once: an
+    interrupted job resumes where it stopped, since every batch is committed."""
+    db = session_for_shard(shard)
+    try:
+        job = db.query(TrabajoPurga).filter(TrabajoPurga.id == uuid.UUID(job_id)).first()
+        if not job or job.estado in FINISHED_STATES:
+            return
+
+        job.estado = "EN_PROCESO"
+        job.fecha_inicio = job.fecha_inicio or datetime.utcnow()
+        db.commit()
+
+        try:
+            for model, criteria, election_id in purge_plan(db, job):
+                job.paso_actual = model.__tablename__
+                db.commit()
+                # A purged election's partition is dropped instead of deleted row by row
+                if election_id and model.__tablename__ in PARTITIONED_TABLES and _drop_partition(db, model.__tablename__, election_id):
+                    job.particiones_eliminadas += 1
+                    db.commit()
+                    continue
+                while True:
+                    if _stop.is_set():
+                        # Left EN_PROCESO, resumed by the next start_purger
+                        return
+                    deleted = delete_batch(db, model, criteria)
+                    if not deleted:
+                        break
+                    job.filas_eliminadas += deleted
+                    db.commit()
+                    time.sleep(PURGE_PAUSE_SECONDS)
+            job.estado = "COMPLETADO"
+            job.paso_actual = None
+        except Exception as e:
+            logger.exception("Purge job %s failed", job_id)
+            db.rollback()
+            job.estado = "FALLIDO"
+            job.error = str(e)
+
+        job.fecha_fin = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def enqueue_purge_job(job_id: uuid.UUID, shard: str = DEFAULT_SHARD) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _stop.clear()
+            _executor = ThreadPoolExecutor(max_workers=PURGE_WORKERS, thread_name_prefix="purge-job")
+        _executor.submit(run_purge_job, str(job_id), shard)
+
+def request_purge(db: Session, tipo: str, objetivo_id: uuid.UUID, tenant_id: Optional[uuid.UUID], requested_by: uuid.UUID) -> TrabajoPurga:
+    """Create and enqueue a purge job, or return the unfinished one for the
+    same object. Commits the caller's pending changes with it."""
+    job = db.query(TrabajoPurga).filter(
+        TrabajoPurga.objetivo_id == objetivo_id,
+        TrabajoPurga.estado.notin_(FINISHED_STATES)
+    ).first()
+    if job:
+        db.commit()
+        return job
+
+    job = TrabajoPurga(tipo=tipo, objetivo_id=objetivo_id, tenant_id=tenant_id, solicitado_por=requested_by)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    enqueue_purge_job(job.id, shard_of(db))
+    return job
+
+def start_purger() -> None:
+    """Resume purge jobs left unfinished by a previous process"""
+    for shard in shard_names():
+        db = session_for_shard(shard)
+        try:
+            job_ids = [job_id for (job_id,) in db.query(TrabajoPurga.id).filter(TrabajoPurga.estado.notin_(FINISHED_STATES))]
+        finally:
+            db.close()
+        for job_id in job_ids:
+            enqueue_purge_job(job_id, shard)
+
+def stop_purger() -> None:
+    """Stop running purges after their current batch"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        _stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
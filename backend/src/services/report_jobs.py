@@ -0,0 +1,84 @@
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+import uuid
+
+from src.database.database import DEFAULT_SHARD, session_for_shard
+from src.models.models import Tenant, TrabajoReporte
+from src.services.reports import parse_report_period, build_platform_usage_report, build_tenant_activity_report
+from src.services.storage import get_storage
+
+# Executor settings: "thread" runs jobs inside the API process (no broker
+# needed, used in development and tests); "celery" hands them to workers via
+# the Redis broker:  celery -A src.services.report_jobs.celery_app worker
+REPORT_EXECUTOR = os.getenv("REPORT_EXECUTOR", "thread")
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+FINISHED_STATES = ("COMPLETADO", "FALLIDO")
+
+def _build_report(db, job: TrabajoReporte) -> dict:
+    params = json.loads(job.parametros)
+    start_date, end_date = parse_report_period(params.get("fecha_inicio"), params.get("fecha_fin"))
+
+    if job.tipo == "USO_PLATAFORMA":
+        return build_platform_usage_report(db, start_date, end_date)
+
+    if job.tipo == "ACTIVIDAD_TENANT":
+        tenant = db.query(Tenant).filter(Tenant.id == job.tenant_id).first()
+        if not tenant:
+            raise ValueError("Tenant not found")
+        return build_tenant_activity_report(db, tenant, start_date, end_date)
+
+    raise ValueError(f"Unknown report type: {job.tipo}")
+
+def run_report_job(job_id: str, shard: str = DEFAULT_SHARD) -> None:
+    """Build a report and store it as an artifact. Safe to call more than once."""
+    db = session_for_shard(shard)
+    try:
+        job = db.query(TrabajoReporte).filter(TrabajoReporte.id == uuid.UUID(job_id)).first()
+        if not job or job.estado != "PENDIENTE":
+            return
+
+        job.estado = "EN_PROCESO"
+        job.fecha_inicio = datetime.utcnow()
+        db.commit()
+
+        try:
+            report = _build_report(db, job)
+            key = f"reports/{job.id}.json"
+            body = json.dumps(report, ensure_ascii=False).encode()
+            get_storage().save(key, io.BytesIO(body), "application/json")
+            job.artefacto = key
+            job.estado = "COMPLETADO"
+        except Exception as e:
+            db.rollback()
+            job.estado = "FALLIDO"
+            job.error = str(e)
+
+        job.fecha_fin = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+if REPORT_EXECUTOR == "celery":
+    from celery import Celery
+
+    celery_app = Celery("urna_virtual", broker=REDIS_URL)
+    run_report_job_task = celery_app.task(name="reports.run_report_job", acks_late=True)(run_report_job)
+
+def enqueue_report_job(job_id: uuid.UUID, shard: str = DEFAULT_SHARD) -> None:
+    """Hand a pending job to the configured executor"""
+    global _executor
+    if REPORT_EXECUTOR == "celery":
+        run_report_job_task.delay(str(job_id), shard)
+        return
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report-job")
+    _executor.submit(run_report_job, str(job_id), shard)
@@ -0,0 +1,252 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, func
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
+from src.database.database import shard_of
+from src.database.shards import fan_out, home_tenant_criteria
+from src.models.models import (
+    Election, Vote, VotanteEleccion, User, Tenant,
+    Simulacro, Candidate, Cargo
+)
+
+def parse_report_period(fecha_inicio: Optional[str], fecha_fin: Optional[str]) -> Tuple[datetime, datetime]:
+    """Parse ISO report bounds, defaulting to the last 30 days"""
+    if fecha_inicio:
+        start_date = datetime.fromisoformat(fecha_inicio.replace('Z', '+00:00'))
+    else:
+        start_date = datetime.utcnow() - timedelta(days=30)
+    
+    if fecha_fin:
+        end_date = datetime.fromisoformat(fecha_fin.replace('Z', '+00:00'))
+    else:
+        end_date = datetime.utcnow()
+    
+    return start_date, end_date
+
+def _tenant_usage(db: Session, tenant: Tenant, start_date: datetime, end_date: datetime) -> dict:
+    """Usage and billing of one tenant in a period"""
+    # Elections in period
+    elections_query = db.query(Election).filter(
+        and_(
+            Election.tenant_id == tenant.id,
+            Election.fecha_creacion >= start_date,
+            Election.fecha_creacion <= end_date
+        )
+    )
+    
+    total_elections = elections_query.count()
+    completed_elections = elections_query.filter(Election.estado == "CERRADA").count()
+    
+    # Voters registered in period
+    voters_registered = db.query(VotanteEleccion).join(Election).filter(
+        and_(
+            Election.tenant_id == tenant.id,
+            Election.fecha_creacion >= start_date,
+            Election.fecha_creacion <= end_date
+        )
+    ).count()
+    
+    # Actual votes cast
+    votes_cast = db.query(Vote).join(Election).filter(
+        and_(
+            Election.tenant_id == tenant.id,
+            Vote.timestamp >= start_date,
+            Vote.timestamp <= end_date
+        )
+    ).count()
+    
+    # Simulations run
+    simulations_run = db.query(Simulacro).join(Election).filter(
+        and_(
+            Election.tenant_id == tenant.id,
+            Simulacro.fecha_creacion >= start_date,
+            Simulacro.fecha_creacion <= end_date
+        )
+    ).count()
+    
+    # Calculate billing metrics
+    # Base pricing model (example)
+    base_cost = 50.0  # Base monthly cost
+    election_cost = total_elections * 25.0  # $25 per election
+    voter_cost = voters_registered * 0.10  # $0.10 per registered voter
+    vote_cost = votes_cast * 0.05  # $0.05 per vote cast
+    simulation_cost = simulations_run * 5.0  # $5 per simulation
+    
+    total_cost = base_cost + election_cost + voter_cost + vote_cost + simulation_cost
+    
+    return {
+        "tenant_id": str(tenant.id),
+        "tenant_name": tenant.nombre,
+        "tenant_email": tenant.email_contacto,
+        "tenant_country": tenant.pais,
+        "tenant_active": tenant.activo,
+        "usage_metrics": {
+            "total_elections": total_elections,
+            "completed_elections": completed_elections,
+            "voters_registered": voters_registered,
+            "votes_cast": votes_cast,
+            "simulations_run": simulations_run
+        },
+        "billing": {
+            "base_cost": base_cost,
+            "election_cost": election_cost,
+            "voter_cost": voter_cost,
+            "vote_cost": vote_cost,
+            "simulation_cost": simulation_cost,
+            "total_cost": round(total_cost, 2)
+        }
+    }
+
+def shard_tenant_usage(db: Session, start_date: datetime, end_date: datetime) -> List[dict]:
+    """Usage of the tenants whose home is this session's shard"""
+    tenants = db.query(Tenant).filter(*home_tenant_criteria(shard_of(db))).all()
+    return [_tenant_usage(db, tenant, start_date, end_date) for tenant in tenants]
+
+def build_platform_usage_report(db: Session, start_date: datetime, end_date: datetime) -> dict:
+    """Platform usage per tenant for billing purposes, across every shard"""
+    
+    # Get usage data per tenant
+    tenant_usage = [
+        entry for _, entries in fan_out(shard_tenant_usage, start_date, end_date, db=db)
+        for entry in entries
+    ]
+    
+    # Calculate totals
+    total_metrics = {
+        "total_tenants": len(tenant_usage),
+        "active_tenants": sum(1 for t in tenant_usage if t["tenant_active"]),
+        "total_elections": sum(t["usage_metrics"]["total_elections"] for t in tenant_usage),
+        "total_voters": sum(t["usage_metrics"]["voters_registered"] for t in tenant_usage),
+        "total_votes": sum(t["usage_metrics"]["votes_cast"] for t in tenant_usage),
+        "total_simulations": sum(t["usage_metrics"]["simulations_run"] for t in tenant_usage),
+        "total_revenue": sum(t["billing"]["total_cost"] for t in tenant_usage)
+    }
+    
+    return {
+        "report_period": {
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "days": (end_date - start_date).days
+        },
+        "summary": total_metrics,
+        "tenant_details": tenant_usage,
+        "generated_at": datetime.utcnow().isoformat()
+    }
+
+def shard_statistics(db: Session, since: datetime) -> Tuple[dict, list]:
+    """Platform counts of one shard and its (country, tenants, elections) rows"""
+    home = home_tenant_criteria(shard_of(db))
+    counts = {
+        "total_tenants": db.query(Tenant).filter(*home).count(),
+        "active_tenants": db.query(Tenant).filter(Tenant.activo == True, *home).count(),
+        "total_elections": db.query(Election).count(),
+        "active_elections": db.query(Election).filter(Election.estado == "ACTIVA").count(),
+        "completed_elections": db.query(Election).filter(Election.estado == "CERRADA").count(),
+        "total_users": db.query(User).count(),
+        "total_voters": db.query(User).filter(User.rol == "VOTANTE").count(),
+        "total_votes": db.query(Vote).count(),
+        "total_simulations": db.query(Simulacro).count(),
+        "recent_elections": db.query(Election).filter(Election.fecha_creacion >= since).count(),
+        "recent_votes": db.query(Vote).filter(Vote.timestamp >= since).count()
+    }
+    
+    # Statistics by country
+    country_stats = db.query(
+        Tenant.pais,
+        func.count(Tenant.id).label('tenants'),
+        func.count(Election.id).label('elections')
+    ).outerjoin(Election).filter(*home).group_by(Tenant.pais).all()
+    
+    return counts, [tuple(row) for row in country_stats]
+
+def build_tenant_activity_report(db: Session, tenant: Tenant, start_date: datetime, end_date: datetime) -> dict:
+    """Detailed activity of a tenant in a period"""
+    tenant_id = tenant.id
+    
+    # Get elections in period
+    elections = db.query(Election).filter(
+        and_(
+            Election.tenant_id == tenant_id,
+            Election.fecha_creacion >= start_date,
+            Election.fecha_creacion <= end_date
+        )
+    ).all()
+    
+    election_details = []
+    for election in elections:
+        # Get participation data
+        total_registered = db.query(VotanteEleccion).filter(
+            VotanteEleccion.eleccion_id == election.id
+        ).count()
+        
+        total_voted = db.query(VotanteEleccion).filter(
+            and_(
+                VotanteEleccion.eleccion_id == election.id,
+                VotanteEleccion.ha_votado == True
+            )
+        ).count()
+        
+        participation_rate = (total_voted / total_registered * 100) if total_registered > 0 else 0
+        
+        # Get candidates count
+        candidates_count = db.query(Candidate).join(Cargo).filter(
+            Cargo.eleccion_id == election.id
+        ).count()
+        
+        election_details.append({
+            "election_id": str(election.id),
+            "title": election.titulo,
+            "description": election.descripcion,
+            "status": election.estado,
+            "start_date": election.fecha_inicio.isoformat() if election.fecha_inicio else None,
+            "end_date": election.fecha_fin.isoformat() if election.fecha_fin else None,
+            "created_date": election.fecha_creacion.isoformat(),
+            "participation": {
+                "registered_voters": total_registered,
+                "votes_cast": total_voted,
+                "participation_rate": round(participation_rate, 2)
+            },
+            "candidates_count": candidates_count
+        })
+    
+    # Get user activity
+    users_created = db.query(User).filter(
+        and_(
+            User.tenant_id == tenant_id,
+            User.fecha_creacion >= start_date,
+            User.fecha_creacion <= end_date
+        )
+    ).count()
+    
+    # Get simulations
+    simulations = db.query(Simulacro).join(Election).filter(
+        and_(
+            Election.tenant_id == tenant_id,
+            Simulacro.fecha_creacion >= start_date,
+            Simulacro.fecha_creacion <= end_date
+        )
+    ).count()
+    
+    return {
+        "tenant_info": {
+            "tenant_id": str(tenant_id),
+            "name": tenant.nombre,
+            "email": tenant.email_contacto,
+            "country": tenant.pais,
+            "timezone": tenant.zona_horaria,
+            "active": tenant.activo
+        },
+        "report_period": {
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat()
+        },
+        "summary": {
+            "total_elections": len(elections),
+            "completed_elections": len([e for e in elections if e.estado == "CERRADA"]),
+            "active_elections": len([e for e in elections if e.estado == "ACTIVA"]),
+            "total_simulations": simulations,
+            "new_users": users_created
+        },
+        "elections": election_details,
+        "generated_at": datetime.utcnow().isoformat()
+    }
@@ -0,0 +1,213 @@
+import hashlib
+import hmac
+import json
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Iterator, List, Tuple
+import uuid
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+
+from src.models.models import Candidate, Cargo, Election, ResultadoEleccion, VotanteEleccion, Vote
+from src.utils.auth import SECRET_KEY
+from src.services.ballot_log import unapplied_ballots
+from src.services.homomorphic import homomorphic_totals
+from src.services.tally import CandidateIndex, apportion, cargo_lista_sums, group_sums, tally_ballots
+from src.utils.crypto import decrypt_vote
+
+# Rows fetched per round trip when streaming ballots
+BALLOT_BATCH_SIZE = 1000
+
+def iter_ballots(db: Session, election_id: uuid.UUID) -> Iterator[Tuple[List[str], int]]:
+    """Yield the selected candidate ids and the weight of every ballot of an
+    election.
+
+    Only the encrypted column is loaded and rows are streamed with
+    ``yield_per`` (a server-side cursor on PostgreSQL), so memory stays flat
+    regardless of the election size.
+    """
+    query = db.query(Vote.voto_cifrado).filter(
+        Vote.eleccion_id == election_id
+    ).execution_options(yield_per=BALLOT_BATCH_SIZE)
+
+    yield from decode_ballots(voto_cifrado for (voto_cifrado,) in query)
+
+def decode_ballots(encrypted: Iterable[str]) -> Iterator[Tuple[List[str], int]]:
+    """Decrypt symmetric ballots into (candidate ids, weight), skipping
+    unreadable ones"""
+    for voto_cifrado in encrypted:
+        try:
+            vote_data = json.loads(decrypt_vote(voto_cifrado))
+        except ValueError:
+            continue
+        yield vote_data.get("candidatos", []), vote_data.get("peso", 1)
+
+def count_votes(db: Session, election_id: uuid.UUID) -> Counter:
+    """Count votes per candidate id (as string) for an election"""
+    counts = Counter()
+    for candidates, _ in iter_ballots(db, election_id):
+        counts.update(candidates)
+    return counts
+
+def _percentage(votes: int, total: int) -> float:
+    return round(votes / total * 100, 2) if total else 0.0
+
+def _candidate_totals(db: Session, election: Election, index: CandidateIndex) -> Tuple[np.ndarray, np.ndarray]:
+    """Raw and weighted votes per candidate index"""
+    if election.cifrado_votos != "HOMOMORFICO":
+        return tally_ballots(iter_ballots(db, election.id), index)
+
+    votes_by_id, weighted_by_id = homomorphic_totals(db, election)
+    votes = np.array([votes_by_id.get(candidate_id, 0) for candidate_id in index.candidates], dtype=np.int64)
+    if weighted_by_id is None:
+        return votes, votes
+    return votes, np.array([weighted_by_id.get(candidate_id, 0) for candidate_id in index.candidates], dtype=np.int64)
+
+def tally_election(db: Session, election: Election) -> dict:
+    """Tally an election into per-candidate, per-cargo and per-lista results.
+
+    PONDERADA elections also get weighted totals, and cargos with escanos get
+    their seats apportioned between listas (on weighted totals when present).
+    """
+    weighted_election = election.tipo_votacion == "PONDERADA"
+    total_votes = db.query(func.count(Vote.id)).filter(Vote.eleccion_id == election.id).scalar()
+
+    cargos = db.query(Cargo).filter(Cargo.eleccion_id == election.id).order_by(Cargo.nombre).all()
+    candidates = db.query(Candidate).options(joinedload(Candidate.lista)).join(Cargo).filter(
+        Cargo.eleccion_id == election.id
+    ).order_by(Candidate.numero_orden).all()
+
+    index = CandidateIndex(
+        [str(candidate.id) for candidate in candidates],
+        [str(candidate.cargo_id) for candidate in candidates],
+        [str(candidate.lista_id) if candidate.lista_id else None for candidate in candidates]
+    )
+    votes, weighted = _candidate_totals(db, election, index)
+    if not weighted_election:
+        weighted = votes
+
+    total_weight = total_votes
+    if weighted_election:
+        total_weight = db.query(func.sum(VotanteEleccion.peso)).filter(
+            VotanteEleccion.eleccion_id == election.id,
+            VotanteEleccion.ha_votado == True
+        ).scalar() or 0
+
+    cargo_votes = group_sums(votes, index.cargo_of, len(index.cargos))
+    cargo_weighted = group_sums(weighted, index.cargo_of, len(index.cargos))
+    lista_votes = group_sums(votes, index.lista_of, len(index.listas))
+    lista_weighted = group_sums(weighted, index.lista_of, len(index.listas))
+    cargo_listas = cargo_lista_sums(weighted, index)
+
+    lista_names = {str(candidate.lista_id): candidate.lista.nombre for candidate in candidates if candidate.lista}
+
+    results = {}
+    cargo_results = {str(cargo.id): {"cargo": cargo.nombre, "votes": 0, "candidates": []} for cargo in cargos}
+    for i, candidate in enumerate(candidates):
+        candidate_id = index.candidates[i]
+        entry = {
+            "candidate_name": f"{candidate.nombre} {candidate.apellido}",
+            "numero_orden": candidate.numero_orden,
+            "cargo": cargo_results[str(candidate.cargo_id)]["cargo"],
+            "cargo_id": str(candidate.cargo_id),
+            "lista": candidate.lista.nombre if candidate.lista else None,
+            "votes": int(votes[i]),
+            "percentage": _percentage(int(votes[i]), total_votes)
+        }
+        if weighted_election:
+            entry["weighted_votes"] = int(weighted[i])
+            entry["weighted_percentage"] = _percentage(int(weighted[i]), total_weight)
+        results[candidate_id] = entry
+        cargo_results[str(candidate.cargo_id)]["candidates"].append(candidate_id)
+
+    for cargo in cargos:
+        cargo_id = str(cargo.id)
+        if cargo_id not in index.cargos:
+            continue
+        position = index.cargos.index(cargo_id)
+        cargo_results[cargo_id]["votes"] = int(cargo_votes[position])
+        if weighted_election:
+            cargo_results[cargo_id]["weighted_votes"] = int(cargo_weighted[position])
+
+        if cargo.escanos and index.listas:
+            seats = apportion(cargo_listas[position], cargo.escanos, cargo.metodo_reparto)
+            running = set(index.lista_of[index.cargo_of == position].tolist()) - {-1}
+            cargo_results[cargo_id]["apportionment"] = {
+                "method": cargo.metodo_reparto,
+                "seats": cargo.escanos,
+                "listas": {
+                    index.listas[j]: {
+                        "lista": lista_names[index.listas[j]],
+                        "votes": int(cargo_listas[position][j]),
+                        "seats": int(seats[j])
+                    }
+                    for j in sorted(running)
+                }
+            }
+
+    lista_results = {}
+    for j, lista_id in enumerate(index.listas):
+        entry = {
+            "lista": lista_names[lista_id],
+            "votes": int(lista_votes[j]),
+            "percentage": _percentage(int(lista_votes[j]), total_votes)
+        }
+        if weighted_election:
+            entry["weighted_votes"] = int(lista_weighted[j])
+            entry["weighted_percentage"] = _percentage(int(lista_weighted[j]), total_weight)
+        lista_results[lista_id] = entry
+
+    return {
+        "election_id": str(election.id),
+        "election_title": election.titulo,
+        "tipo_votacion": election.tipo_votacion,
+        "total_votes": total_votes,
+        "results": results,
+        "cargos": cargo_results,
+        "listas": lista_results,
+        "generated_at": datetime.utcnow().isoformat()
+    }
+
+def sign_results(body: bytes) -> str:
+    """HMAC-SHA256 of a serialized results snapshot"""
+    return hmac.new(SECRET_KEY.encode(), body, hashlib.sha256).hexdigest()
+
+def verify_results_signature(body: bytes, signature: str) -> bool:
+    return hmac.compare_digest(sign_results(body), signature)
+
+class ResultsNotReady(ValueError):
+    """The election is closed but some of its ballots are not in `votos` yet"""
+
+def snapshot_results(db: Session, election: Election) -> ResultadoEleccion:
+    """Tally a closed election once and persist the signed snapshot.
+
+    Ballots of a closed election no longer change, so the snapshot is the
+    source for every results endpoint from then on.
+    """
+    body = json.dumps(tally_election(db, election), ensure_ascii=False, separators=(",", ":")).encode()
+    signature = sign_results(body)
+
+    snapshot = db.query(ResultadoEleccion).filter(ResultadoEleccion.eleccion_id == election.id).first()
+    if not snapshot:
+        snapshot = ResultadoEleccion(eleccion_id=election.id)
+        db.add(snapshot)
+    snapshot.contenido = body.decode()
+    snapshot.firma = signature
+    snapshot.etag = hashlib.sha256(body).hexdigest()[:32]
+    snapshot.fecha_generacion = datetime.utcnow()
+    db.commit()
+    return snapshot
+
+def get_results_snapshot(db: Session, election: Election) -> ResultadoEleccion:
+    """Get the results snapshot of a closed election, building it if missing
+    (elections closed before snapshots existed). Raises ResultsNotReady while
+    ballots acknowledged to voters are still being written."""
+    snapshot = db.query(ResultadoEleccion).filter(ResultadoEleccion.eleccion_id == election.id).first()
+    if snapshot:
+        return snapshot
+    missing = unapplied_ballots(db, election.id)
+    if missing:
+        raise ResultsNotReady(f"{missing} ballots of this election are still being stored, retry shortly")
+    return snapshot_results(db, election)
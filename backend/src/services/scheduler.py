@@ -0,0 +1,375 @@
+import heapq
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import uuid
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+
+from src.database.database import DEFAULT_SHARD, SessionLocal, session_for_shard, shard_names, shard_of
+from src.models.models import BloqueoPlanificador, Election, ResultadoEleccion, VersionPlanificador
+from src.services.ballot import publish_ballot, evict_ballot
+from src.services.ballot_log import BALLOT_CLOSE_WAIT_SECONDS, wait_for_ballots
+from src.services.idempotency import IDEMPOTENCY_SWEEP_SECONDS, purge_expired_keys
+from src.services.results import snapshot_results
+from src.services.sealer import seal_pending
+from src.utils.timezones import as_utc
+
+ELECTION_SCHEDULER_ENABLED = os.getenv("ELECTION_SCHEDULER_ENABLED", "true").lower() == "true"
+# Only transitions due within the horizon are kept in memory; later ones are
+# picked up by the periodic reload. Elections created or changed on any node
+# bump a version row, and the leader reloads as soon as it sees it change.
+SCHEDULER_HORIZON_SECONDS = int(os.getenv("SCHEDULER_HORIZON_SECONDS", "3600"))
+SCHEDULER_RELOAD_SECONDS = int(os.getenv("SCHEDULER_RELOAD_SECONDS", "300"))
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+# Retry interval for publishing the results of a closed election whose
+# ballots are still being written
+SCHEDULER_PUBLISH_RETRY_SECONDS = int(os.getenv("SCHEDULER_PUBLISH_RETRY_SECONDS", "10"))
+
+LEASE_NAME = "elecciones"
+OPEN = "ABRIR"
+CLOSE = "CERRAR"
+PUBLISH = "PUBLICAR"
+
+logger = logging.getLogger(__name__)
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def schedule_version(db: Session) -> int:
+    return db.query(VersionPlanificador.version).filter(VersionPlanificador.nombre == LEASE_NAME).scalar() or 0
+
+def bump_schedule_version() -> None:
+    """Record that an election's schedule changed, for the leader on any node"""
+    db = SessionLocal()
+    try:
+        updated = db.query(VersionPlanificador).filter(VersionPlanificador.nombre == LEASE_NAME).update(
+            {"version": VersionPlanificador.version + 1}, synchronize_session=False
+        )
+        if not updated:
+            db.add(VersionPlanificador(nombre=LEASE_NAME, version=1))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another node created the row first
+            db.rollback()
+            db.query(VersionPlanificador).filter(VersionPlanificador.nombre == LEASE_NAME).update(
+                {"version": VersionPlanificador.version + 1}, synchronize_session=False
+            )
+            db.commit()
+    finally:
+        db.close()
+
+def open_due_election(db: Session, election_id: uuid.UUID, now: datetime) -> bool:
+    """Activate a pending election whose start has passed.
+
+    The conditional UPDATE makes the transition idempotent: only one caller,
+    on any node, sees a matched row and runs the follow-up work.
+    """
+    updated = db.query(Election).filter(
+        Election.id == election_id,
+        Election.estado == "PENDIENTE",
+        Election.fecha_inicio <= now
+    ).update({"estado": "ACTIVA"}, synchronize_session=False)
+    db.commit()
+
+    if updated:
+        election = db.query(Election).filter(Election.id == election_id).first()
+        publish_ballot(db, election)
+    return bool(updated)
+
+def results_published(db: Session, election_id: uuid.UUID) -> bool:
+    return db.query(ResultadoEleccion.eleccion_id).filter(ResultadoEleccion.eleccion_id == election_id).first() is not None
+
+def _results_pending(db: Session, election_id: uuid.UUID) -> bool:
+    """Closed, but its results are not published yet"""
+    closed = db.query(Election.id).filter(Election.id == election_id, Election.estado == "CERRADA").first()
+    return bool(closed) and not results_published(db, election_id)
+
+def publish_closed_election(db: Session, election_id: uuid.UUID, timeout: float = BALLOT_CLOSE_WAIT_SECONDS) -> bool:
+    """Seal the last ballots of a closed election and persist its results
+    snapshot, once every ballot acknowledged to a voter is in `votos` (see
+    wait_for_ballots, which gets ``timeout``). While some are still being
+    written nothing is sealed or published and False is returned, so the
+    caller can retry."""
+    if results_published(db, election_id):
+        return True
+    missing = wait_for_ballots(db, election_id, timeout)
+    if missing:
+        logger.warning("Election %s: %s ballots still being stored, results not published yet", election_id, missing)
+        return False
+    seal_pending(db, election_id, force=True)
+    snapshot_results(db, db.query(Election).filter(Election.id == election_id).first())
+    return True
+
+def close_due_election(db: Session, election_id: uuid.UUID, now: datetime) -> bool:
+    """Close an active election whose end has passed (idempotent, see above)
+    and publish its results"""
+    updated = db.query(Election).filter(
+        Election.id == election_id,
+        Election.estado == "ACTIVA",
+        Election.fecha_fin <= now
+    ).update({"estado": "CERRADA"}, synchronize_session=False)
+    db.commit()
+
+    if updated:
+        evict_ballot(db, election_id)
+        # Don't wait for ballots here: a wait as long as the lease would let
+        # another node take over mid-close. _fire queues a PUBLISH retry.
+        publish_closed_election(db, election_id, timeout=0)
+    return bool(updated)
+
+def publish_due_results(db: Session, election_id: uuid.UUID, now: datetime) -> bool:
+    """Retry publishing the results of a closed election"""
+    return _results_pending(db, election_id) and publish_closed_election(db, election_id, timeout=0)
+
+_ACTIONS = {OPEN: open_due_election, CLOSE: close_due_election, PUBLISH: publish_due_results}
+
+def _next_transition(election: Election) -> Optional[Tuple[datetime, str]]:
+    if election.estado == "PENDIENTE":
+        return as_utc(election.fecha_inicio), OPEN
+    if election.estado == "ACTIVA":
+        return as_utc(election.fecha_fin), CLOSE
+    return None
+
+class ElectionScheduler:
+    """Opens and closes elections at their scheduled time.
+
+    Upcoming transitions live in a heap and the worker thread sleeps until the
+    earliest one, the next reload or the next lease renewal. Every node keeps
+    a heap, but only the holder of the DB lease fires transitions.
+    """
+
+    def __init__(self, node_id: Optional[str] = None):
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._heap: List[Tuple[datetime, int, str, uuid.UUID, str]] = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._next_reload = None
+        self._version: Optional[int] = None
+        self._next_sweep = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        thread = threading.Thread(target=self._run, name="election-scheduler", daemon=True)
+        thread.start()
+        self._thread = thread
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self.is_leader:
+            self._release_lease()
+
+    def _push(self, when: datetime, action: str, election_id: uuid.UUID, shard: str) -> None:
+        self._seq += 1
+        heapq.heappush(self._heap, (when, self._seq, action, election_id, shard))
+
+    def schedule(self, election: Election) -> None:
+        """Queue the next transition of an election created or changed on this node"""
+        transition = _next_transition(election)
+        if not transition:
+            return
+        when, action = transition
+        if when > _utcnow() + timedelta(seconds=SCHEDULER_HORIZON_SECONDS):
+            return
+        session = object_session(election)
+        with self._cond:
+            self._push(when, action, election.id, shard_of(session) if session else DEFAULT_SHARD)
+            self._cond.notify()
+
+    def schedule_publish(self, election_id: uuid.UUID, shard: str, when: datetime) -> None:
+        """Queue a retry of publishing a closed election's results"""
+        with self._cond:
+            self._push(when, PUBLISH, election_id, shard)
+            self._cond.notify()
+
+    def reload(self) -> None:
+        """Rebuild the heap from the database (includes overdue transitions)"""
+        horizon = _utcnow() + timedelta(seconds=SCHEDULER_HORIZON_SECONDS)
+        transitions = []
+        for shard in shard_names():
+            db = session_for_shard(shard)
+            try:
+                elections = db.query(Election).filter(
+                    or_(
+                        (Election.estado == "PENDIENTE") & (Election.fecha_inicio <= horizon),
+                        (Election.estado == "ACTIVA") & (Election.fecha_fin <= horizon)
+                    )
+                ).all()
+                transitions += [(*_next_transition(election), election.id, shard) for election in elections]
+                # Closed elections whose results are still waiting for ballots
+                unpublished = db.query(Election.id).outerjoin(
+                    ResultadoEleccion, ResultadoEleccion.eleccion_id == Election.id
+                ).filter(Election.estado == "CERRADA", ResultadoEleccion.eleccion_id.is_(None)).all()
+                transitions += [(_utcnow(), PUBLISH, election_id, shard) for (election_id,) in unpublished]
+            finally:
+                db.close()
+        with self._cond:
+            self._heap = []
+            for when, action, election_id, shard in transitions:
+                self._push(when, action, election_id, shard)
+
+    def _renew_lease(self, now: datetime) -> bool:
+        db = SessionLocal()
+        try:
+            updated = db.query(BloqueoPlanificador).filter(
+                BloqueoPlanificador.nombre == LEASE_NAME,
+                or_(BloqueoPlanificador.propietario == self.node_id, BloqueoPlanificador.expira < now)
+            ).update({
+                "propietario": self.node_id,
+                "expira": now + timedelta(seconds=SCHEDULER_LEASE_SECONDS)
+            }, synchronize_session=False)
+            if updated:
+                db.commit()
+                return True
+
+            if db.query(BloqueoPlanificador.nombre).filter(BloqueoPlanificador.nombre == LEASE_NAME).first():
+                db.rollback()
+                return False
+
+            db.add(BloqueoPlanificador(
+                nombre=LEASE_NAME,
+                propietario=self.node_id,
+                expira=now + timedelta(seconds=SCHEDULER_LEASE_SECONDS)
+            ))
+            try:
+                db.commit()
+                return True
+            except IntegrityError:
+                # Another node created the lease first
+                db.rollback()
+                return False
+        finally:
+            db.close()
+
+    def _schedule_version(self) -> int:
+        db = SessionLocal()
+        try:
+            return schedule_version(db)
+        finally:
+            db.close()
+
+    def _release_lease(self) -> None:
+        db = SessionLocal()
+        try:
+            db.query(BloqueoPlanificador).filter(
+                BloqueoPlanificador.nombre == LEASE_NAME,
+                BloqueoPlanificador.propietario == self.node_id
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _fire(self, action: str, election_id: uuid.UUID, shard: str, now: datetime) -> None:
+        db = session_for_shard(shard)
+        try:
+            if _ACTIONS[action](db, election_id, now):
+                logger.info("Election %s: %s", election_id, action)
+                if action == OPEN:
+                    # Queue the close right away instead of waiting for a reload
+                    election = db.query(Election).filter(Election.id == election_id).first()
+                    self.schedule(election)
+            if action in (CLOSE, PUBLISH) and _results_pending(db, election_id):
+                self.schedule_publish(election_id, shard, now + timedelta(seconds=SCHEDULER_PUBLISH_RETRY_SECONDS))
+        finally:
+            db.close()
+
+    def tick(self) -> Optional[datetime]:
+        """Run one scheduling round; return when the next round is due"""
+        now = _utcnow()
+        was_leader = self.is_leader
+        self.is_leader = self._renew_lease(now)
+
+        # A new leader may have missed transitions the previous one owned, and
+        # the leader may not have heard of elections changed on other nodes
+        version = self._schedule_version() if self.is_leader else None
+        changed = version is not None and version != self._version
+        if self._next_reload is None or now >= self._next_reload or (self.is_leader and not was_leader) or changed:
+            if version is not None:
+                self._version = version
+            self.reload()
+            self._next_reload = now + timedelta(seconds=SCHEDULER_RELOAD_SECONDS)
+
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+
+        if self.is_leader:
+            for _, _, action, election_id, shard in due:
+                try:
+                    self._fire(action, election_id, shard, now)
+                except Exception:
+                    logger.exception("Scheduled transition %s failed for election %s", action, election_id)
+
+        # Housekeeping, also on the leader only
+        if self.is_leader and (self._next_sweep is None or now >= self._next_sweep):
+            self._next_sweep = now + timedelta(seconds=IDEMPOTENCY_SWEEP_SECONDS)
+            try:
+                purge_expired_keys()
+            except Exception:
+                logger.exception("Sweeping expired idempotency keys failed")
+
+        wake_at = min(self._next_reload, now + timedelta(seconds=SCHEDULER_LEASE_SECONDS / 3))
+        with self._cond:
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0][0])
+        return wake_at
+
+    def _run(self) -> None:
+        while True:
+            try:
+                wake_at = self.tick()
+            except Exception:
+                logger.exception("Election scheduler round failed")
+                wake_at = _utcnow() + timedelta(seconds=SCHEDULER_LEASE_SECONDS / 3)
+
+            with self._cond:
+                if self._stopped:
+                    return
+                self._cond.wait(timeout=max((wake_at - _utcnow()).total_seconds(), 0))
+                if self._stopped:
+                    return
+
+_scheduler: Optional[ElectionScheduler] = None
+
+def start_scheduler() -> Optional[ElectionScheduler]:
+    global _scheduler
+    if ELECTION_SCHEDULER_ENABLED and _scheduler is None:
+        _scheduler = ElectionScheduler()
+        _scheduler.start()
+    return _scheduler
+
+def stop_scheduler() -> None:
+    global _scheduler
+    if _scheduler:
+        _scheduler.stop()
+        _scheduler = None
+
+def schedule_election(election: Election) -> None:
+    """Tell the schedulers about a new or rescheduled election: the local one
+    right away, the leader (possibly on another node) on its next round"""
+    if _scheduler:
+        _scheduler.schedule(election)
+    bump_schedule_version()
+
+def schedule_results(election: Election) -> None:
+    """Have the scheduler retry publishing a closed election's results"""
+    bump_schedule_version()
+    if _scheduler:
+        session = object_session(election)
+        _scheduler.schedule_publish(
+            election.id, shard_of(session) if session else DEFAULT_SHARD,
+            _utcnow() + timedelta(seconds=SCHEDULER_PUBLISH_RETRY_SECONDS)
+        )
@@ -0,0 +1,222 @@
+import hashlib
+import hmac
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import uuid
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.database.database import session_for_shard, shard_names
+from src.models.models import BloqueVotos, Vote
+from src.services.merkle import append_leaves
+from src.utils.auth import SECRET_KEY
+from src.utils.crypto import ballot_receipt, block_hash
+
+# Ballots are stored unchained and sealed into blocks of up to
+# BLOCK_MAX_VOTES, or fewer once the oldest pending ballot has waited
+# BLOCK_SEAL_SECONDS.
+BLOCK_SEALER_ENABLED = os.getenv("BLOCK_SEALER_ENABLED", "true").lower() == "true"
+BLOCK_MAX_VOTES = int(os.getenv("BLOCK_MAX_VOTES", "500"))
+BLOCK_SEAL_SECONDS = float(os.getenv("BLOCK_SEAL_SECONDS", "5"))
+
+GENESIS = "genesis"
+
+logger = logging.getLogger(__name__)
+
+def sign_block(hash_bloque: str) -> str:
+    """HMAC-SHA256 of a block hash"""
+    return hmac.new(SECRET_KEY.encode(), hash_bloque.encode(), hashlib.sha256).hexdigest()
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def seal_block(db: Session, election_id: uuid.UUID, force: bool = False) -> Optional[BloqueVotos]:
+    """Seal the election's oldest unsealed ballots into the next block.
+
+    A partial block is only sealed when ``force`` is set or its oldest ballot
+    is older than BLOCK_SEAL_SECONDS. Concurrent sealers (other threads or
+    nodes) are ordered by the (eleccion_id, numero) unique constraint: the
+    loser rolls back and returns None.
+    """
+    pending = db.query(Vote.id, Vote.voto_cifrado, Vote.firma_digital, Vote.timestamp).filter(
+        Vote.eleccion_id == election_id,
+        Vote.bloque_id.is_(None)
+    ).order_by(Vote.timestamp, Vote.id).limit(BLOCK_MAX_VOTES).all()
+    if not pending:
+        return None
+    if len(pending) < BLOCK_MAX_VOTES and not force:
+        oldest = _as_utc(pending[0].timestamp)
+        if oldest > datetime.now(timezone.utc) - timedelta(seconds=BLOCK_SEAL_SECONDS):
+            return None
+
+    previous = db.query(BloqueVotos.numero, BloqueVotos.hash_bloque).filter(
+        BloqueVotos.eleccion_id == election_id
+    ).order_by(BloqueVotos.numero.desc()).first()
+    numero, hash_anterior = (previous[0] + 1, previous[1]) if previous else (0, GENESIS)
+
+    receipts = [ballot_receipt(vote.voto_cifrado, vote.firma_digital) for vote in pending]
+    hash_bloque = block_hash(hash_anterior, receipts)
+
+    try:
+        # Extend the Merkle tree first: its backfill only sees ballots of
+        # blocks that were already sealed
+        tree = append_leaves(db, election_id, receipts)
+        block = BloqueVotos(
+            eleccion_id=election_id,
+            numero=numero,
+            hash_anterior=hash_anterior,
+            hash_bloque=hash_bloque,
+            raiz_merkle=tree.raiz,
+            cantidad_votos=len(receipts),
+            firma=sign_block(hash_bloque)
+        )
+        db.add(block)
+        db.flush()
+
+        sealed = db.query(Vote).filter(
+            Vote.eleccion_id == election_id,
+            Vote.id.in_([vote.id for vote in pending]),
+            Vote.bloque_id.is_(None)
+        ).update({"bloque_id": block.id, "hash_bloque": hash_bloque}, synchronize_session=False)
+        if sealed != len(pending):
+            db.rollback()
+            return None
+        db.commit()
+        return block
+    except IntegrityError:
+        # Another sealer took this block number
+        db.rollback()
+        return None
+
+def seal_pending(db: Session, election_id: uuid.UUID, force: bool = False) -> int:
+    """Seal every block that is due for an election; returns the block count"""
+    count = 0
+    while seal_block(db, election_id, force=force):
+        count += 1
+    return count
+
+def verify_blocks(db: Session, election_id: uuid.UUID) -> dict:
+    """Recompute an election's block chain from the stored ballots"""
+    blocks = db.query(BloqueVotos).filter(
+        BloqueVotos.eleccion_id == election_id
+    ).order_by(BloqueVotos.numero).all()
+
+    verified = 0
+    hash_anterior = GENESIS
+    for expected_numero, block in enumerate(blocks):
+        ballots = db.query(Vote.voto_cifrado, Vote.firma_digital).filter(
+            Vote.bloque_id == block.id
+        ).order_by(Vote.timestamp, Vote.id).all()
+        receipts = [ballot_receipt(voto_cifrado, firma) for voto_cifrado, firma in ballots]
+        if (
+            block.numero != expected_numero
+            or block.hash_anterior != hash_anterior
+            or block.cantidad_votos != len(receipts)
+            or block.hash_bloque != block_hash(hash_anterior, receipts)
+            or not hmac.compare_digest(block.firma, sign_block(block.hash_bloque))
+        ):
+            break
+        verified += 1
+        hash_anterior = block.hash_bloque
+
+    unsealed = db.query(Vote).filter(
+        Vote.eleccion_id == election_id,
+        Vote.bloque_id.is_(None)
+    ).count()
+
+    return {
+        "valid": verified == len(blocks),
+        "total_blocks": len(blocks),
+        "verified_blocks": verified,
+        "unsealed_votes": unsealed
+    }
+
+class BlockSealer:
+    """Seals due blocks for every election with unsealed ballots.
+
+    Runs every BLOCK_SEAL_SECONDS, or earlier once this node has seen
+    BLOCK_MAX_VOTES new ballots for an election.
+    """
+
+    def __init__(self):
+        self._pending: Dict[uuid.UUID, int] = {}
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        thread = threading.Thread(target=self._run, name="block-sealer", daemon=True)
+        thread.start()
+        self._thread = thread
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def notify(self, election_id: uuid.UUID, count: int = 1) -> None:
+        with self._cond:
+            self._pending[election_id] = self._pending.get(election_id, 0) + count
+            if self._pending[election_id] >= BLOCK_MAX_VOTES:
+                self._cond.notify()
+
+    def seal_round(self) -> int:
+        count = 0
+        for shard in shard_names():
+            db = session_for_shard(shard)
+            try:
+                election_ids: List[uuid.UUID] = [
+                    election_id for (election_id,) in db.query(Vote.eleccion_id).filter(
+                        Vote.bloque_id.is_(None)
+                    ).distinct()
+                ]
+                for election_id in election_ids:
+                    try:
+                        count += seal_pending(db, election_id)
+                    except Exception:
+                        db.rollback()
+                        logger.exception("Sealing failed for election %s", election_id)
+            finally:
+                db.close()
+        return count
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                if max(self._pending.values(), default=0) < BLOCK_MAX_VOTES:
+                    self._cond.wait(timeout=BLOCK_SEAL_SECONDS)
+                if self._stopped:
+                    return
+                self._pending = {}
+            try:
+                self.seal_round()
+            except Exception:
+                logger.exception("Block sealing round failed")
+
+_sealer: Optional[BlockSealer] = None
+
+def start_sealer() -> Optional[BlockSealer]:
+    global _sealer
+    if BLOCK_SEALER_ENABLED and _sealer is None:
+        _sealer = BlockSealer()
+        _sealer.start()
+    return _sealer
+
+def stop_sealer() -> None:
+    global _sealer
+    if _sealer:
+        _sealer.stop()
+        _sealer = None
+
+def notify_ballots(election_id: uuid.UUID, count: int = 1) -> None:
+    """Tell the local sealer about newly stored ballots"""
+    if _sealer:
+        _sealer.notify(election_id, count)
@@ -0,0 +1,172 @@
+import json
+import os
+import time
+from datetime import datetime
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import uuid
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.models.models import Candidate, Cargo, ConteoSimulacro, Simulacro, VotoSimulacro
+from src.utils.crypto import encrypt_votes
+from src.utils.ids import uuid7
+from src.utils.parallel import imap_chunks
+
+# Synthetic simulacro ballots are encrypted in chunks across worker processes
+# and each chunk is bulk-inserted as soon as it is ready
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", str(os.cpu_count() or 1)))
+SIMULATION_CHUNK = int(os.getenv("SIMULATION_CHUNK", "5000"))
+SIMULATION_MAX_BALLOTS = int(os.getenv("SIMULATION_MAX_BALLOTS", "1000000"))
+
+# Per cargo: selections a ballot makes, candidate ids and their weights
+BallotDefinition = List[Tuple[int, List[str], np.ndarray]]
+
+def load_ballot_definition(db: Session, election_id: uuid.UUID, distribution: Optional[Dict[str, float]] = None) -> BallotDefinition:
+    """Ballot definition of an election. Without a distribution every
+    candidate is equally likely; with one, candidates left out get weight 0.
+    Raises ValueError for weights of unknown candidates or negative weights."""
+    definition = []
+    known = set()
+    for cargo in db.query(Cargo).filter(Cargo.eleccion_id == election_id).order_by(Cargo.id):
+        candidate_ids = [
+            str(candidate_id) for (candidate_id,) in db.query(Candidate.id).filter(
+                Candidate.cargo_id == cargo.id
+            ).order_by(Candidate.id)
+        ]
+        if not candidate_ids:
+            continue
+        known.update(candidate_ids)
+        if distribution is None:
+            cargo_weights = np.ones(len(candidate_ids))
+        else:
+            cargo_weights = np.array([float(distribution.get(c, 0)) for c in candidate_ids])
+        definition.append((cargo.max_candidatos_a_elegir, candidate_ids, cargo_weights))
+
+    if distribution is not None:
+        unknown = set(distribution) - known
+        if unknown:
+            raise ValueError(f"Unknown candidates in distribution: {', '.join(sorted(unknown))}")
+        if any(weight < 0 for weight in distribution.values()):
+            raise ValueError("Distribution weights must not be negative")
+    return definition
+
+def sample_selections(rng: np.random.Generator, weights: np.ndarray, picks: int, count: int) -> np.ndarray:
+    """(count, picks) candidate indices drawn without replacement in
+    proportion to ``weights`` (Gumbel top-k), never picking weight 0"""
+    picks = min(picks, int((weights > 0).sum()))
+    if picks == 0:
+        return np.empty((count, 0), dtype=np.int64)
+    if picks == 1:
+        return rng.choice(len(weights), size=(count, 1), p=weights / weights.sum())
+    with np.errstate(divide="ignore"):
+        keys = np.log(weights) + rng.gumbel(size=(count, len(weights)))
+    return np.argsort(-keys, axis=1)[:, :picks]
+
+def synthetic_ballots(
+    definition: BallotDefinition,
+    count: int,
+    voter_prefix: str,
+    first_number: int,
+    rng: np.random.Generator,
+    block_size: int = SIMULATION_CHUNK
+) -> Iterator[Tuple[str, List[str]]]:
+    """(votante_prueba, selected candidate ids) for ``count`` ballots, sampled
+    one block at a time"""
+    for block_start in range(0, count, block_size):
+        size = min(block_size, count - block_start)
+        per_cargo = []
+        for picks, candidate_ids, weights in definition:
+            per_cargo.append((candidate_ids, sample_selections(rng, weights, picks, size).tolist()))
+        for i in range(size):
+            ballot = [candidate_ids[c] for candidate_ids, chosen in per_cargo for c in chosen[i]]
+            yield f"{voter_prefix}-{first_number + block_start + i}", ballot
+
+def encrypt_simulation_chunk(simulacro_id: str, ballots: Sequence[Tuple[str, List[str]]]) -> Tuple[List[Tuple[str, str]], Dict[str, int]]:
+    """(votante_prueba, voto_cifrado) for a chunk of synthetic ballots, with
+    the same content as a ballot cast through the API, and the chunk's votes
+    per candidate"""
+    timestamp = datetime.utcnow().isoformat()
+    contents = [
+        json.dumps({
+            "simulacro_id": simulacro_id,
+            "candidatos": candidate_ids,
+            "timestamp": timestamp,
+            "votante_prueba": voter
+        })
+        for voter, candidate_ids in ballots
+    ]
+    counts = Counter(candidate_id for _, candidate_ids in ballots for candidate_id in candidate_ids)
+    return list(zip((voter for voter, _ in ballots), encrypt_votes(contents))), dict(counts)
+
+def add_to_tally(db: Session, simulacro_id: uuid.UUID, counts: Dict[str, int], ballots: int) -> None:
+    """Add inserted ballots to the simulacro's running tally, in the caller's
+    transaction. Counters are updated in candidate order so concurrent
+    ballots lock them in the same order; a missing counter is created, and a
+    concurrent creation falls back to the increment."""
+    for candidate_id in sorted(counts):
+        candidate_uuid = uuid.UUID(str(candidate_id))
+        increment = {"votos": ConteoSimulacro.votos + counts[candidate_id]}
+        counter = db.query(ConteoSimulacro).filter(
+            ConteoSimulacro.simulacro_id == simulacro_id,
+            ConteoSimulacro.candidato_id == candidate_uuid
+        )
+        if counter.update(increment, synchronize_session=False):
+            continue
+        try:
+            with db.begin_nested():
+                db.add(ConteoSimulacro(simulacro_id=simulacro_id, candidato_id=candidate_uuid, votos=counts[candidate_id]))
+        except IntegrityError:
+            counter.update(increment, synchronize_session=False)
+    db.query(Simulacro).filter(Simulacro.id == simulacro_id).update(
+        {"total_votos": Simulacro.total_votos + ballots}, synchronize_session=False
+    )
+
+def simulation_tally(db: Session, simulacro: Simulacro) -> Tuple[int, Dict[str, int]]:
+    """Ballots and votes per candidate id of a simulacro, from its counters"""
+    counters = db.query(ConteoSimulacro.candidato_id, ConteoSimulacro.votos).filter(
+        ConteoSimulacro.simulacro_id == simulacro.id
+    )
+    return simulacro.total_votos, {str(candidate_id): votos for candidate_id, votos in counters}
+
+def generate_simulation_votes(
+    db: Session,
+    simulacro: Simulacro,
+    count: int,
+    distribution: Optional[Dict[str, float]] = None,
+    voter_prefix: str = "sintetico",
+    seed: Optional[int] = None,
+    workers: int = SIMULATION_WORKERS,
+    chunk_size: int = SIMULATION_CHUNK
+) -> dict:
+    """Generate, encrypt and insert ``count`` synthetic ballots for a
+    simulacro, committing each chunk, and report the throughput"""
+    start = time.perf_counter()
+    definition = load_ballot_definition(db, simulacro.eleccion_id, distribution)
+    first_number = simulacro.total_votos + 1
+    ballots = synthetic_ballots(definition, count, voter_prefix, first_number, np.random.default_rng(seed), chunk_size)
+
+    chunk_results, used_workers = imap_chunks(encrypt_simulation_chunk, ballots, chunk_size, workers, str(simulacro.id))
+    inserted = 0
+    selections: Counter = Counter()
+    for (encrypted, counts), _ in chunk_results:
+        db.bulk_insert_mappings(VotoSimulacro, [
+            {"id": uuid7(), "simulacro_id": simulacro.id, "votante_prueba": voter, "voto_cifrado": voto_cifrado}
+            for voter, voto_cifrado in encrypted
+        ])
+        add_to_tally(db, simulacro.id, counts, len(encrypted))
+        db.commit()
+        inserted += len(encrypted)
+        selections.update(counts)
+
+    seconds = time.perf_counter() - start
+    return {
+        "simulacro_id": str(simulacro.id),
+        "generated_votes": inserted,
+        "selections": dict(selections),
+        "workers": used_workers,
+        "seconds": round(seconds, 3),
+        "ballots_per_second": round(inserted / seconds, 1) if seconds > 0 else 0
+    }
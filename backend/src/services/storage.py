@@ -0,0 +1,224 @@
+import hashlib
+import hmac
+import mimetypes
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Iterator, Optional
+from urllib.parse import quote, urlencode
+
+from src.utils.auth import SECRET_KEY
+
+# Storage settings
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # local, s3
+UPLOAD_DIRECTORY = os.getenv("UPLOAD_DIRECTORY", "uploads")
+MEDIA_URL_PREFIX = os.getenv("MEDIA_URL_PREFIX", "/api/v1/media")
+PRESIGNED_URL_EXPIRE_SECONDS = int(os.getenv("PRESIGNED_URL_EXPIRE_SECONDS", "3600"))
+CHUNK_SIZE = 64 * 1024
+
+class StorageError(Exception):
+    """Raised when a storage backend cannot complete an operation"""
+
+class StorageBackend(ABC):
+    """Interface shared by all media storage backends.
+
+    Objects are addressed by a relative key such as ``candidates/<uuid>.jpg``;
+    that key is what gets persisted in ``foto_url`` / ``logo_url``.
+    """
+
+    @abstractmethod
+    def save(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> None:
+        ...
+
+    @abstractmethod
+    def open(self, key: str) -> Iterator[bytes]:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def url(self, key: str, expires_in: int = PRESIGNED_URL_EXPIRE_SECONDS) -> str:
+        ...
+
+class LocalStorage(StorageBackend):
+    """Store media on the local filesystem, served through signed media URLs"""
+
+    def __init__(self, base_dir: str = UPLOAD_DIRECTORY):
+        self.base_dir = os.path.abspath(base_dir)
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.base_dir, key))
+        if os.path.commonpath([path, self.base_dir]) != self.base_dir:
+            raise StorageError(f"Invalid storage key: {key}")
+        return path
+
+    def save(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see partial uploads
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(fileobj, f, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def open(self, key: str) -> Iterator[bytes]:
+        path = self._path(key)
+        if not os.path.isfile(path):
+            raise StorageError(f"Object not found: {key}")
+
+        def iter_file():
+            with open(path, "rb") as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return iter_file()
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass  # File might not exist
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def url(self, key: str, expires_in: int = PRESIGNED_URL_EXPIRE_SECONDS) -> str:
+        expires = int(time.time()) + expires_in
+        query = urlencode({"expires": expires, "signature": sign_media_key(key, expires)})
+        return f"{MEDIA_URL_PREFIX}/{quote(key)}?{query}"
+
+class S3Storage(StorageBackend):
+    """Store media in an S3-compatible object store (AWS S3, MinIO, ...)"""
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None
+    ):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise StorageError("boto3 is required for the s3 storage backend")
+
+        self.bucket = bucket
+        self._client_error = ClientError
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key
+        )
+
+    def save(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> None:
+        extra_args = {"ContentType": content_type or _guess_content_type(key)}
+        # upload_fileobj streams the file and switches to multipart for large objects
+        self.client.upload_fileobj(fileobj, self.bucket, key, ExtraArgs=extra_args)
+
+    def open(self, key: str) -> Iterator[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except self._client_error:
+            raise StorageError(f"Object not found: {key}")
+        return response["Body"].iter_chunks(CHUNK_SIZE)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=key)
+        except self._client_error:
+            pass
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self._client_error:
+            return False
+
+    def url(self, key: str, expires_in: int = PRESIGNED_URL_EXPIRE_SECONDS) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expires_in
+        )
+
+def sign_media_key(key: str, expires: int) -> str:
+    """Sign a media key so it can be fetched without a bearer token"""
+    message = f"{key}:{expires}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+def verify_media_signature(key: str, expires: int, signature: str) -> bool:
+    """Verify a signed media URL"""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sign_media_key(key, expires), signature)
+
+def new_media_key(prefix: str, extension: str) -> str:
+    """Generate a unique object key under a prefix"""
+    return f"{prefix}/{uuid.uuid4()}{extension}"
+
+def _guess_content_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+def read_upload_limited(fileobj: BinaryIO, max_size: int) -> Optional[BinaryIO]:
+    """Spool an upload in chunks, returning None as soon as it exceeds max_size"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    total = 0
+    while True:
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_size:
+            spooled.close()
+            return None
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+_storage: Optional[StorageBackend] = None
+
+def create_storage(backend: str = STORAGE_BACKEND) -> StorageBackend:
+    """Build a storage backend from environment configuration"""
+    if backend == "local":
+        return LocalStorage(UPLOAD_DIRECTORY)
+    if backend == "s3":
+        return S3Storage(
+            bucket=os.getenv("AWS_BUCKET_NAME", "urna-virtual-files"),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+            region=os.getenv("AWS_REGION") or None,
+            access_key=os.getenv("AWS_ACCESS_KEY_ID") or None,
+            secret_key=os.getenv("AWS_SECRET_ACCESS_KEY") or None
+        )
+    raise StorageError(f"Unknown storage backend: {backend}")
+
+def get_storage() -> StorageBackend:
+    """Get the configured storage backend"""
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
@@ -0,0 +1,110 @@
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Seat apportionment methods for cargos with escanos
+DHONDT = "DHONDT"
+RESTO_MAYOR = "RESTO_MAYOR"
+
+# Ballots converted to index arrays per vectorized step
+TALLY_BATCH_SIZE = 100000
+
+class CandidateIndex:
+    """Integer positions for an election's candidates, cargos and listas.
+
+    Candidate i belongs to cargo ``cargo_of[i]`` and lista ``lista_of[i]``
+    (-1 when it runs without a lista), so per-cargo and per-lista sums are a
+    single ``bincount`` over the candidate totals.
+    """
+
+    def __init__(self, candidate_ids: Sequence[str], cargo_ids: Sequence[str], lista_ids: Sequence[Optional[str]]):
+        self.candidates = list(candidate_ids)
+        self.position = {candidate_id: i for i, candidate_id in enumerate(self.candidates)}
+        self.cargos = sorted(set(cargo_ids))
+        self.listas = sorted({lista_id for lista_id in lista_ids if lista_id})
+        cargo_position = {cargo_id: i for i, cargo_id in enumerate(self.cargos)}
+        lista_position = {lista_id: i for i, lista_id in enumerate(self.listas)}
+        self.cargo_of = np.array([cargo_position[cargo_id] for cargo_id in cargo_ids], dtype=np.int64)
+        self.lista_of = np.array([lista_position[lista_id] if lista_id else -1 for lista_id in lista_ids], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+def ballot_arrays(ballots: Iterable[Tuple[List[str], int]], index: CandidateIndex) -> Tuple[np.ndarray, np.ndarray]:
+    """Flatten (selected candidate ids, weight) ballots into one candidate
+    index and one weight per selection; unknown candidates are dropped"""
+    positions: List[int] = []
+    weights: List[int] = []
+    for candidates, weight in ballots:
+        for candidate_id in candidates:
+            position = index.position.get(candidate_id)
+            if position is not None:
+                positions.append(position)
+                weights.append(weight)
+    return np.array(positions, dtype=np.int64), np.array(weights, dtype=np.int64)
+
+def candidate_totals(positions: np.ndarray, weights: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Raw and weighted votes per candidate index"""
+    votes = np.bincount(positions, minlength=size).astype(np.int64)
+    weighted = np.bincount(positions, weights=weights, minlength=size).astype(np.int64)
+    return votes, weighted
+
+def tally_ballots(ballots: Iterable[Tuple[List[str], int]], index: CandidateIndex, batch_size: int = TALLY_BATCH_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """Raw and weighted votes per candidate, converting the ballot stream to
+    index arrays one batch at a time so memory stays bounded"""
+    votes = np.zeros(len(index), dtype=np.int64)
+    weighted = np.zeros(len(index), dtype=np.int64)
+    batch = []
+    for ballot in ballots:
+        batch.append(ballot)
+        if len(batch) == batch_size:
+            batch_votes, batch_weighted = candidate_totals(*ballot_arrays(batch, index), len(index))
+            votes += batch_votes
+            weighted += batch_weighted
+            batch = []
+    if batch:
+        batch_votes, batch_weighted = candidate_totals(*ballot_arrays(batch, index), len(index))
+        votes += batch_votes
+        weighted += batch_weighted
+    return votes, weighted
+
+def group_sums(values: np.ndarray, groups: np.ndarray, size: int) -> np.ndarray:
+    """Sum of ``values`` per group index, ignoring entries with group -1"""
+    mask = groups >= 0
+    return np.bincount(groups[mask], weights=values[mask], minlength=size).astype(np.int64)
+
+def cargo_lista_sums(values: np.ndarray, index: CandidateIndex) -> np.ndarray:
+    """(cargo, lista) matrix of candidate totals"""
+    width = max(len(index.listas), 1)
+    groups = np.where(index.lista_of >= 0, index.cargo_of * width + index.lista_of, -1)
+    return group_sums(values, groups, len(index.cargos) * width).reshape(len(index.cargos), width)
+
+def dhondt(votes: np.ndarray, seats: int) -> np.ndarray:
+    """D'Hondt: seats go to the highest votes / divisor quotients"""
+    votes = np.asarray(votes, dtype=np.int64)
+    if seats <= 0 or not votes.any():
+        return np.zeros(len(votes), dtype=np.int64)
+    divisors = np.arange(1, seats + 1)
+    quotients = (votes[:, None] / divisors[None, :]).ravel()
+    owners = np.repeat(np.arange(len(votes)), seats)
+    # Ties go to the lista with more votes, then to the first one
+    winners = np.lexsort((owners, -votes[owners], -quotients))[:seats]
+    return np.bincount(owners[winners], minlength=len(votes)).astype(np.int64)
+
+def largest_remainder(votes: np.ndarray, seats: int) -> np.ndarray:
+    """Hare quota and largest remainders, in exact integer arithmetic"""
+    votes = np.asarray(votes, dtype=np.int64)
+    total = int(votes.sum())
+    if seats <= 0 or not total:
+        return np.zeros(len(votes), dtype=np.int64)
+    allocated = votes * seats // total
+    remainders = votes * seats - allocated * total
+    left = seats - int(allocated.sum())
+    winners = np.lexsort((np.arange(len(votes)), -votes, -remainders))[:left]
+    allocated[winners] += 1
+    return allocated
+
+APPORTIONMENT_METHODS = {DHONDT: dhondt, RESTO_MAYOR: largest_remainder}
+
+def apportion(votes: np.ndarray, seats: int, method: str = DHONDT) -> np.ndarray:
+    return APPORTIONMENT_METHODS[method](votes, seats)
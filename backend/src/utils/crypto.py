@@ -1,58 +1,189 @@
 import hashlib
+import hmac
 import json
 import base64
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
+from cryptography.exceptions import InvalidSignature
+from cryptography.fernet import Fernet, MultiFernet
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import os
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
 
-# Generate a key for encryption (in production, use proper key management)
-def get_encryption_key():
-    """Get or generate encryption key"""
-    key_file = "encryption.key"
-    if os.path.exists(key_file):
-        with open(key_file, "rb") as f:
-            return f.read()
-    else:
-        key = Fernet.generate_key()
-        with open(key_file, "wb") as f:
-            f.write(key)
-        return key
+from src.utils.timezones import as_utc
+
+# Ed25519 key the server signs ballots with (PEM, PKCS#8); generated on first
+# use when missing
+BALLOT_SIGNING_KEY_FILE = os.getenv("BALLOT_SIGNING_KEY_FILE", "ballot_signing.key")
+
+# Ballots signed before Ed25519 carry a bare sha256 hex digest. Anyone can
+# compute one, so it is only accepted for ballots stored before the
+# deployment started signing with Ed25519 (BALLOT_SIGNATURE_CUTOVER, ISO-8601
+# UTC); without a recorded cutover no digest is accepted
+LEGACY_SIGNATURE_LENGTH = 64
+BALLOT_SIGNATURE_CUTOVER = os.getenv("BALLOT_SIGNATURE_CUTOVER", "")
+
+# Outcomes of check_vote_signature
+SIGNATURE_VALID = "valid"
+SIGNATURE_LEGACY = "legacy"
+SIGNATURE_INVALID = "invalid"
+
+_signing_key: Optional[Ed25519PrivateKey] = None
+
+# Fernet key ballots (and homomorphic private keys) are encrypted with. Set
+# VOTE_ENCRYPTION_KEY in production; without it a key file is generated in the
+# working directory, which is only meant for development and must never be
+# committed
+VOTE_ENCRYPTION_KEY_FILE = os.getenv("VOTE_ENCRYPTION_KEY_FILE", "encryption.key")
+
+def _valid_fernet_key(key: bytes, source: str) -> bytes:
+    try:
+        Fernet(key)
+    except (ValueError, TypeError):
+        raise ValueError(f"{source} is not a Fernet key (32 url-safe base64-encoded bytes)")
+    return key
+
+def get_encryption_key() -> bytes:
+    """Current ballot encryption key: VOTE_ENCRYPTION_KEY, else the key file
+    (generated when missing)"""
+    key = os.getenv("VOTE_ENCRYPTION_KEY", "").strip()
+    if key:
+        return _valid_fernet_key(key.encode(), "VOTE_ENCRYPTION_KEY")
+    if os.path.exists(VOTE_ENCRYPTION_KEY_FILE):
+        with open(VOTE_ENCRYPTION_KEY_FILE, "rb") as f:
+            return _valid_fernet_key(f.read().strip(), VOTE_ENCRYPTION_KEY_FILE)
+    key = Fernet.generate_key()
+    with open(VOTE_ENCRYPTION_KEY_FILE, "wb") as f:
+        f.write(key)
+    return key
+
+def _ballot_cipher() -> MultiFernet:
+    """Encrypts with the current key and decrypts with it or any key listed in
+    VOTE_ENCRYPTION_PREVIOUS_KEYS (ballots stored before a rotation)"""
+    key = get_encryption_key()
+    previous = [
+        _valid_fernet_key(previous_key.strip().encode(), "VOTE_ENCRYPTION_PREVIOUS_KEYS")
+        for previous_key in os.getenv("VOTE_ENCRYPTION_PREVIOUS_KEYS", "").split(",") if previous_key.strip()
+    ]
+    return MultiFernet([Fernet(key), *[Fernet(previous_key) for previous_key in previous]])
 
 def encrypt_vote(vote_data: str) -> str:
     """Encrypt vote data"""
+    # A missing or invalid key is an error, never a reason to store plaintext
+    f = _ballot_cipher()
     try:
-        key = get_encryption_key()
-        f = Fernet(key)
         encrypted_data = f.encrypt(vote_data.encode())
         return base64.b64encode(encrypted_data).decode()
     except Exception:
         # Fallback to simple encoding for demo purposes
         return f"ENCRYPTED:{base64.b64encode(vote_data.encode()).decode()}"
 
+def encrypt_votes(votes_data: Sequence[str]) -> List[str]:
+    """Encrypt many votes, reading the key once"""
+    f = _ballot_cipher()
+    return [base64.b64encode(f.encrypt(vote_data.encode())).decode() for vote_data in votes_data]
+
 def decrypt_vote(encrypted_data: str) -> str:
     """Decrypt vote data"""
+    # Configuration errors (invalid key) are raised
+    f = None if encrypted_data.startswith("ENCRYPTED:") else _ballot_cipher()
     try:
-        if encrypted_data.startswith("ENCRYPTED:"):
+        if f is None:
             # Handle fallback encoding
             return base64.b64decode(encrypted_data[10:]).decode()
-        
-        key = get_encryption_key()
-        f = Fernet(key)
+
         decoded_data = base64.b64decode(encrypted_data.encode())
         decrypted_data = f.decrypt(decoded_data)
         return decrypted_data.decode()
     except Exception:
         return encrypted_data
 
+def get_signing_key() -> Ed25519PrivateKey:
+    """Load (or generate) the ballot signing key"""
+    global _signing_key
+    if _signing_key is None:
+        if os.path.exists(BALLOT_SIGNING_KEY_FILE):
+            with open(BALLOT_SIGNING_KEY_FILE, "rb") as f:
+                _signing_key = serialization.load_pem_private_key(f.read(), password=None)
+        else:
+            _signing_key = Ed25519PrivateKey.generate()
+            with open(BALLOT_SIGNING_KEY_FILE, "wb") as f:
+                f.write(_signing_key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.PKCS8,
+                    serialization.NoEncryption()
+                ))
+    return _signing_key
+
+def get_signing_public_key_pem() -> str:
+    """Public half of the ballot signing key, for external auditors"""
+    return get_signing_key().public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+
 def create_vote_signature(vote_data: str, voter_id: str) -> str:
-    """Create a digital signature for the vote"""
-    # Simplified signature - in production use proper digital signatures
-    signature_data = f"{vote_data}{voter_id}"
-    return hashlib.sha256(signature_data.encode()).hexdigest()
+    """Ed25519 signature of the vote by the server key (hex)"""
+    return get_signing_key().sign(f"{vote_data}{voter_id}".encode()).hex()
+
+def signature_cutover() -> Optional[datetime]:
+    """When Ed25519 signing started, if recorded"""
+    return as_utc(datetime.fromisoformat(BALLOT_SIGNATURE_CUTOVER)) if BALLOT_SIGNATURE_CUTOVER else None
+
+def check_vote_signature(
+    vote_data: str,
+    voter_id: str,
+    signature: str,
+    cast_at: Optional[datetime] = None,
+    public_key: Optional[Ed25519PublicKey] = None,
+    cutover: Optional[datetime] = None
+) -> str:
+    """SIGNATURE_VALID for an Ed25519 signature by the server key,
+    SIGNATURE_LEGACY for the matching sha256 digest of a ballot stored
+    (``cast_at``) before ``cutover``, SIGNATURE_INVALID otherwise"""
+    signature_data = f"{vote_data}{voter_id}".encode()
+    if len(signature) == LEGACY_SIGNATURE_LENGTH:
+        before_cutover = cutover is not None and cast_at is not None and as_utc(cast_at) < cutover
+        if before_cutover and hmac.compare_digest(hashlib.sha256(signature_data).hexdigest(), signature):
+            return SIGNATURE_LEGACY
+        return SIGNATURE_INVALID
+    try:
+        (public_key or get_signing_key().public_key()).verify(bytes.fromhex(signature), signature_data)
+        return SIGNATURE_VALID
+    except (InvalidSignature, ValueError):
+        return SIGNATURE_INVALID
+
+def verify_vote_signature(vote_data: str, voter_id: str, signature: str, public_key: Optional[Ed25519PublicKey] = None) -> bool:
+    """Verify a server (Ed25519) vote signature"""
+    return check_vote_signature(vote_data, voter_id, signature, public_key=public_key) == SIGNATURE_VALID
+
+def verify_signature_chunk(
+    public_key_pem: bytes,
+    cutover: Optional[datetime],
+    items: Sequence[Tuple[str, str, str, str, Optional[datetime]]]
+) -> Tuple[List[str], List[str]]:
+    """Check (vote_id, vote_data, voter_id, signature, cast_at) tuples and
+    return the ids of invalid and of legacy signatures. Runs in the audit
+    worker processes."""
+    public_key = serialization.load_pem_public_key(public_key_pem)
+    invalid, legacy = [], []
+    for vote_id, vote_data, voter_id, signature, cast_at in items:
+        outcome = check_vote_signature(vote_data, voter_id, signature, cast_at, public_key, cutover)
+        if outcome == SIGNATURE_INVALID:
+            invalid.append(vote_id)
+        elif outcome == SIGNATURE_LEGACY:
+            legacy.append(vote_id)
+    return invalid, legacy
+
 
-def verify_vote_signature(vote_data: str, voter_id: str, signature: str) -> bool:
-    """Verify vote signature"""
-    expected_signature = create_vote_signature(vote_data, voter_id)
-    return signature == expected_signature
+def block_hash(previous_hash: str, receipts: List[str]) -> str:
+    """Hash of a sealed block: its ordered ballot receipts linked to the previous block"""
+    digest = hashlib.sha256(previous_hash.encode())
+    for receipt in receipts:
+        digest.update(receipt.encode())
+    return digest.hexdigest()
 
+def ballot_receipt(voto_cifrado: str, firma_digital: str) -> str:
+    """Receipt handed to the voter: the hash of the stored ballot"""
+    return hashlib.sha256(f"{voto_cifrado}{firma_digital}".encode()).hexdigest()
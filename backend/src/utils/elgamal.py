@@ -0,0 +1,131 @@
+import base64
+import json
+import math
+import secrets
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Exponential ElGamal over the RFC 3526 2048-bit MODP group.
+#
+# A ballot is a vector of 0/1 choices, one per candidate, encrypted with one
+# key per candidate and a single shared randomness (multi-recipient ElGamal):
+# (g^r, g^m_1 * h_1^r, ..., g^m_k * h_k^r). Multiplying ballots component-wise
+# adds the choices in the exponent, so a tally decrypts only the per-candidate
+# aggregates and never an individual ballot.
+
+# RFC 3526 group 14. P is a safe prime and P = 7 (mod 8), so G = 2 generates
+# the subgroup of prime order Q = (P - 1) / 2.
+P = int(
+    "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74"
+    "020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437"
+    "4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+    "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05"
+    "98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB"
+    "9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B"
+    "E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718"
+    "3995497CEA956AE515D2261898FA051015728E5A8AACAA68FFFFFFFFFFFFFFFF",
+    16
+)
+Q = (P - 1) // 2
+G = 2
+
+# Short exponents (128-bit security, like the group itself) make every
+# exponentiation ~8x cheaper than a full-size one
+EXPONENT_BITS = 256
+ELEMENT_BYTES = 256
+WINDOW_BITS = 5
+
+Ciphertext = Tuple[int, List[int]]
+
+class FixedBase:
+    """Precomputed powers of a fixed base: base^e costs one multiplication
+    per WINDOW_BITS bits of the exponent and no squarings"""
+
+    def __init__(self, base: int):
+        self.table = []
+        for _ in range(0, EXPONENT_BITS, WINDOW_BITS):
+            row = [1]
+            for _ in range((1 << WINDOW_BITS) - 1):
+                row.append(row[-1] * base % P)
+            self.table.append(row)
+            base = row[-1] * base % P
+
+    def pow(self, exponent: int) -> int:
+        result = 1
+        mask = (1 << WINDOW_BITS) - 1
+        for row in self.table:
+            if exponent & mask:
+                result = result * row[exponent & mask] % P
+            exponent >>= WINDOW_BITS
+        return result
+
+_generator = None
+
+def generator() -> FixedBase:
+    global _generator
+    if _generator is None:
+        _generator = FixedBase(G)
+    return _generator
+
+def random_exponent() -> int:
+    return secrets.randbits(EXPONENT_BITS) or 1
+
+def generate_keys(count: int) -> Tuple[List[int], List[int]]:
+    """(private, public) keys for ``count`` candidates"""
+    private = [random_exponent() for _ in range(count)]
+    return private, [generator().pow(x) for x in private]
+
+def encrypt_choices(public_bases: Sequence[FixedBase], choices: Sequence[int]) -> Ciphertext:
+    r = random_exponent()
+    return generator().pow(r), [
+        pow(G, m, P) * base.pow(r) % P for base, m in zip(public_bases, choices)
+    ]
+
+def encode_element(value: int) -> str:
+    return base64.b64encode(value.to_bytes(ELEMENT_BYTES, "big")).decode()
+
+def decode_element(value: str) -> int:
+    return int.from_bytes(base64.b64decode(value), "big")
+
+def serialize_ciphertext(ciphertext: Ciphertext) -> str:
+    c1, c2 = ciphertext
+    return json.dumps({"c1": encode_element(c1), "c2": [encode_element(c) for c in c2]})
+
+def aggregate_serialized(size: int, ballots: Iterable[str]) -> Ciphertext:
+    """Component-wise product of serialized ballots (one chunk of a tally)"""
+    c1 = 1
+    c2 = [1] * size
+    for ballot in ballots:
+        data = json.loads(ballot)
+        c1 = c1 * decode_element(data["c1"]) % P
+        for i, value in enumerate(data["c2"]):
+            c2[i] = c2[i] * decode_element(value) % P
+    return c1, c2
+
+def combine(size: int, parts: Iterable[Ciphertext]) -> Ciphertext:
+    c1 = 1
+    c2 = [1] * size
+    for part_c1, part_c2 in parts:
+        c1 = c1 * part_c1 % P
+        c2 = [a * b % P for a, b in zip(c2, part_c2)]
+    return c1, c2
+
+def discrete_log(value: int, bound: int) -> int:
+    """m in [0, bound] with G^m = value (baby-step giant-step)"""
+    step = math.isqrt(bound) + 1
+    baby: Dict[int, int] = {}
+    current = 1
+    for j in range(step):
+        baby.setdefault(current, j)
+        current = current * G % P
+    giant = pow(G, -step, P)
+    current = value
+    for i in range(step + 1):
+        if current in baby:
+            return i * step + baby[current]
+        current = current * giant % P
+    raise ValueError("Aggregate out of range")
+
+def decrypt_totals(private: Sequence[int], ciphertext: Ciphertext, bounds: Sequence[int]) -> List[int]:
+    """Per-slot totals of an aggregated ciphertext, each at most its bound"""
+    c1, c2 = ciphertext
+    return [discrete_log(c * pow(c1, -x, P) % P, bound) for x, c, bound in zip(private, c2, bounds)]
@@ -0,0 +1,57 @@
+import os
+import secrets
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+# Ballot ids of anonymous elections only carry the start of this window, so
+# they don't reveal when (or in which order) each vote was cast
+BALLOT_ID_WINDOW_SECONDS = int(os.getenv("BALLOT_ID_WINDOW_SECONDS", "3600"))
+
+def uuid7(unix_ms: Optional[int] = None, sub_ms: Optional[int] = None) -> uuid.UUID:
+    """Time-ordered UUID (RFC 9562 version 7): 48 bits of Unix milliseconds,
+    12 bits of sub-millisecond precision (random when ``sub_ms`` is None and
+    ``unix_ms`` is given) and 62 random bits. New ids land at the right edge
+    of a B-tree index instead of at random pages."""
+    if unix_ms is None:
+        nanoseconds = time.time_ns()
+        unix_ms, remainder = divmod(nanoseconds, 1_000_000)
+        sub_ms = remainder * 4096 // 1_000_000
+    elif sub_ms is None:
+        sub_ms = secrets.randbits(12)
+    value = (unix_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76
+    value |= (sub_ms & 0xFFF) << 64
+    value |= 0b10 << 62
+    value |= secrets.randbits(62)
+    return uuid.UUID(int=value)
+
+def uuid7_time_ms(value: uuid.UUID) -> int:
+    """Unix milliseconds embedded in a version 7 UUID"""
+    return value.int >> 80
+
+def windowed_uuid7(window_seconds: int = BALLOT_ID_WINDOW_SECONDS, unix_ms: Optional[int] = None) -> uuid.UUID:
+    """Version 7 UUID carrying only the start of the time window of
+    ``unix_ms`` (default now) and random bits below it: ids of the same window
+    are unordered among themselves but still clustered in the index"""
+    window_ms = max(window_seconds, 1) * 1000
+    if unix_ms is None:
+        unix_ms = time.time_ns() // 1_000_000
+    return uuid7(unix_ms // window_ms * window_ms)
+
+def uuid7_datetime(value: uuid.UUID) -> datetime:
+    """UTC time embedded in a version 7 UUID"""
+    return datetime.fromtimestamp(uuid7_time_ms(value) / 1000, tz=timezone.utc)
+
+def ballot_id(anonymous: bool = True) -> uuid.UUID:
+    """Primary key of a new ballot. Anonymous elections get a windowed id:
+    ballot ids are shown in audit reports and archives, where a precise cast
+    time could be matched against when each voter was seen voting."""
+    return windowed_uuid7() if anonymous else uuid7()
+
+def ballot_timestamp(vote_id: uuid.UUID) -> datetime:
+    """Stored cast time of a ballot: the time its id carries, so anonymous
+    ballots keep only the start of their window in ``votos.timestamp`` too
+    (the row also holds ``votante_id``, which the signature covers)"""
+    return uuid7_datetime(vote_id)
@@ -0,0 +1,56 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from typing import Any, Callable, Iterable, Iterator, List, Tuple
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def imap_chunks(func: Callable, items: Iterable[Any], chunk_size: int, workers: int, *args) -> Tuple[Iterator[Tuple[Any, int]], int]:
+    """Lazy form of ``map_chunks``: an iterator of (result, chunk length) in
+    chunk order, consumed while later chunks are still running, and the
+    number of processes used"""
+    chunks = _chunks(items, chunk_size)
+    first = next(chunks, [])
+    second = next(chunks, None)
+
+    if second is None or workers <= 1:
+        chunks = chain([first], [second] if second else [], chunks)
+        return ((func(*args, chunk), len(chunk)) for chunk in chunks), 1
+    return _pool_results(func, chain([first, second], chunks), workers, args), workers
+
+def _pool_results(func: Callable, chunks: Iterable[List[Any]], workers: int, args: tuple) -> Iterator[Tuple[Any, int]]:
+    # Spawned workers don't inherit the web server's threads or sessions
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        in_flight = deque()
+        for chunk in chunks:
+            if len(in_flight) >= 2 * workers:
+                future, size = in_flight.popleft()
+                yield future.result(), size
+            in_flight.append((executor.submit(func, *args, chunk), len(chunk)))
+        while in_flight:
+            future, size = in_flight.popleft()
+            yield future.result(), size
+
+def map_chunks(func: Callable, items: Iterable[Any], chunk_size: int, workers: int, *args) -> Tuple[List[Any], int, int]:
+    """Run ``func(*args, chunk)`` over consecutive chunks of ``items``.
+
+    Inputs that fit in a single chunk run in-process; larger ones go to a pool
+    of ``workers`` processes with at most two chunks per worker in flight, so
+    memory stays bounded while the items are streamed. Returns the results in
+    chunk order, the number of items and the number of processes used.
+    """
+    chunk_results, used_workers = imap_chunks(func, items, chunk_size, workers, *args)
+    results = []
+    total = 0
+    for result, size in chunk_results:
+        results.append(result)
+        total += size
+    return results, total, used_workers
@@ -0,0 +1,219 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this many milliseconds are logged with the statements
+# they ran (without their parameters); 0 disables the log
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+# Statements kept per request for that log
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Requests that matched no route share one label, so unknown paths can't
+# create new series
+UNMATCHED_ROUTE = "unmatched"
+
+class RequestStats:
+    """SQL statements run while serving one request. Shard fan-out threads
+    record into the same object, so the DB time is summed over threads."""
+
+    def __init__(self, keep_statements: bool):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.log: Optional[List[Tuple[float, str]]] = [] if keep_statements else None
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.statements += 1
+            self.db_seconds += seconds
+            if seconds >= self.slowest_seconds:
+                self.slowest_seconds = seconds
+                self.slowest_statement = statement
+            if self.log is not None and len(self.log) < SLOW_REQUEST_MAX_STATEMENTS:
+                self.log.append((seconds, statement))
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _current_request.get()
+
+# Registered on the Engine class, so every shard engine is covered. Outside
+# a request (scheduler, sealer, scripts) nothing is recorded.
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_request.get() is not None and context is not None:
+        context._request_metrics_start = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_request.get()
+    start = getattr(context, "_request_metrics_start", None)
+    if stats is not None and start is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """Cumulative Prometheus histogram, one series per label tuple"""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [per-bucket counts, sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            base = _labels(self.label_names, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{base},le="{_number(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {_number(total)}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+class RequestMetrics:
+    """Per-route aggregates of this process (each worker exposes its own)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        route = ("method", "route")
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.duration = Histogram(
+            "urna_http_request_duration_seconds", "Wall time of HTTP requests", route, SECONDS_BUCKETS
+        )
+        self.db_time = Histogram(
+            "urna_http_request_db_seconds", "Time spent in SQL statements per HTTP request", route, SECONDS_BUCKETS
+        )
+        self.statements = Histogram(
+            "urna_http_request_db_statements", "SQL statements run per HTTP request", route, STATEMENT_BUCKETS
+        )
+        self.slowest = Histogram(
+            "urna_http_request_slowest_statement_seconds", "Slowest SQL statement of each HTTP request", route, SECONDS_BUCKETS
+        )
+
+    def observe(self, method: str, route: str, status_code: int, seconds: float, stats: RequestStats) -> None:
+        labels = (method, route)
+        with self._lock:
+            key = (method, route, str(status_code))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.duration.observe(labels, seconds)
+            self.db_time.observe(labels, stats.db_seconds)
+            self.statements.observe(labels, stats.statements)
+            self.slowest.observe(labels, stats.slowest_seconds)
+
+    def mean_duration(self) -> Optional[float]:
+        """Mean wall time of every request served so far, in seconds"""
+        with self._lock:
+            total = sum(series[1] for series in self.duration._series.values())
+            count = sum(series[2] for series in self.duration._series.values())
+        return total / count if count else None
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP urna_http_requests_total HTTP requests served",
+                "# TYPE urna_http_requests_total counter"
+            ]
+            for labels, count in sorted(self.requests.items()):
+                lines.append(f"urna_http_requests_total{{{_labels(('method', 'route', 'status'), labels)}}} {count}")
+            for histogram in (self.duration, self.db_time, self.statements, self.slowest):
+                lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+request_metrics = RequestMetrics()
+
+def _route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        return UNMATCHED_ROUTE
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or UNMATCHED_ROUTE
+
+def _log_slow_request(method: str, route: str, status_code: int, seconds: float, stats: RequestStats) -> None:
+    statements = "\n".join(
+        f"  {statement_seconds * 1000:9.1f} ms  {' '.join(statement.split())}"
+        for statement_seconds, statement in stats.log or []
+    )
+    omitted = stats.statements - len(stats.log or [])
+    if omitted > 0:
+        statements += f"\n  ... {omitted} more, the slowest of all:\n"
+        statements += f"  {stats.slowest_seconds * 1000:9.1f} ms  {' '.join(stats.slowest_statement.split())}"
+    logger.warning(
+        "Slow request %s %s -> %s: %.1f ms, %d SQL statements, %.1f ms in the database%s",
+        method, route, status_code, seconds * 1000, stats.statements, stats.db_seconds * 1000,
+        f"\n{statements}" if statements else ""
+    )
+
+class RequestMetricsMiddleware:
+    """Record wall time, status and SQL statements of every HTTP request
+    under its route template (``/api/v1/elecciones/{election_id}``)"""
+
+    def __init__(self, app: ASGIApp, slow_request_ms: float = SLOW_REQUEST_MS) -> None:
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(keep_statements=self.slow_request_ms > 0)
+        token = _current_request.set(stats)
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            _current_request.reset(token)
+            method, route = scope["method"], _route_template(scope)
+            request_metrics.observe(method, route, status_code, seconds, stats)
+            if self.slow_request_ms > 0 and seconds * 1000 >= self.slow_request_ms:
+                _log_slow_request(method, route, status_code, seconds, stats)
@@ -0,0 +1,69 @@
+from functools import lru_cache
+from typing import Any, List, Type
+
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+DefaultJSONResponse = ORJSONResponse
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+def orm_list_response(schema: Type[BaseModel], rows: List[Any]) -> Response:
+    """Serialize ORM rows straight to JSON bytes.
+
+    FastAPI would validate the returned objects against ``response_model``,
+    dump them to Python dicts and then encode those again. Rows coming from our
+    own queries are already trusted, so a single from-attributes pass through
+    pydantic-core's serializer is enough. Keep ``response_model`` on the route
+    so the OpenAPI schema is unchanged.
+    """
+    adapter = _list_adapter(schema)
+    content = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    return Response(content=content, media_type="application/json")
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 4) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        compressed = self.compressor.process(body)
+        if more_body:
+            return compressed + self.compressor.flush()
+        return compressed + self.compressor.finish()
+
+class CompressionMiddleware(GZipMiddleware):
+    """Compress responses above ``minimum_size`` with brotli when the client
+    accepts it and the module is installed, otherwise with gzip."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, compresslevel: int = 6, brotli_quality: int = 4) -> None:
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("Accept-Encoding", "")
+        responder: ASGIApp
+        if brotli is not None and "br" in accept_encoding:
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif "gzip" in accept_encoding:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+
+        await responder(scope, receive, send)
@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+import pytz
+
+def to_utc(value: datetime, zona_horaria: str = "UTC") -> datetime:
+    """Normalize a datetime to aware UTC.
+
+    Naive values are wall-clock times in the tenant's timezone, so they are
+    localized with ``zona_horaria`` (DST-aware) before converting.
+    """
+    if value.tzinfo is None:
+        value = pytz.timezone(zona_horaria).localize(value)
+    return value.astimezone(timezone.utc)
+
+def as_utc(value: datetime) -> datetime:
+    """Read back a stored timestamp as aware UTC (SQLite drops the offset)"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
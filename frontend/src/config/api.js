@@ -61,6 +61,7 @@ export const API_ENDPOINTS = {
     DELETE: (id) => `/elecciones/${id}`,
     ACTIVATE: (id) => `/elecciones/${id}/activate`,
     CLOSE: (id) => `/elecciones/${id}/close`,
+    BALLOT: (id) => `/elecciones/${id}/boleta`,
     ACTIVE: '/elecciones/active'
   },
   
@@ -59,6 +59,25 @@ class ElectionService {
     }
   }
   
+  // Obtener la boleta completa (cargos, candidatos y listas) en una sola llamada
+  async getBallot(id) {
+    try {
+      const response = await apiClient.get(API_ENDPOINTS.ELECTIONS.BALLOT(id));
+      return {
+        success: true,
+        data: response.data || response,
+        message: 'Boleta obtenida exitosamente'
+      };
+    } catch (error) {
+      return {
+        success: false,
+        data: null,
+        message: error.message,
+        error: error
+      };
+    }
+  }
+  
   // Crear nueva elección
   async createElection(electionData) {
     try {
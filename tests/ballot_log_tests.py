@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Pruebas de fallos de escritura del log de votos
+Urna Virtual - Sistema de Votación Electrónica
+
+Inyecta un error de fsync en un grupo de votos del log (BALLOT_INGESTION_MODE=log)
+y comprueba que esos votos, rechazados con error al votante (que recupera su
+habilitación), nunca llegan a `votos`: ni por el escritor ni al reproducir el
+log tras un reinicio. Los votos de los grupos siguientes sí.
+
+No necesita base de datos: la escritura en `votos` se sustituye por una lista.
+
+Uso:
+    python tests/ballot_log_tests.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from src.services import ballot_log
+from src.services.ballot_log import BallotLog, _encode
+
+class BallotLogTester:
+    def __init__(self):
+        self.failures = []
+        self.passed = 0
+
+    def check(self, title, condition, evidence=""):
+        """Registra el resultado de una comprobación"""
+        if condition:
+            self.passed += 1
+            print(f"   ✅ {title}")
+        else:
+            self.failures.append((title, evidence))
+            print(f"   ❌ {title}")
+            if evidence:
+                print(f"      Evidence: {evidence}")
+
+    @staticmethod
+    def ballot():
+        return {
+            "id": str(uuid.uuid4()),
+            "eleccion_id": str(uuid.uuid4()),
+            "votante_id": str(uuid.uuid4()),
+            "voto_cifrado": "gAAAAAB" + "x" * 100,
+            "firma_digital": "ab" * 64,
+            "timestamp": "2026-01-01T00:00:00+00:00",
+            "shard": "default"
+        }
+
+    def sync(self, log, loop, records, fail_fsync=False):
+        """Sincroniza un grupo como lo hace el hilo del log; devuelve sus futures"""
+        group = []
+        for record in records:
+            group.append((_encode(record), record, loop, loop.create_future()))
+        real_fsync = ballot_log.os.fsync
+        calls = []
+
+        def failing_fsync(fd):
+            # Solo falla el fsync del grupo; el del truncado funciona
+            calls.append(fd)
+            if len(calls) == 1:
+                raise OSError(5, "Input/output error (inyectado)")
+            real_fsync(fd)
+
+        if fail_fsync:
+            ballot_log.os.fsync = failing_fsync
+        try:
+            log._sync_group(group)
+        finally:
+            ballot_log.os.fsync = real_fsync
+        # Deja que se resuelvan las futures (call_soon_threadsafe)
+        loop.run_until_complete(asyncio.sleep(0))
+        return [future for _, _, _, future in group]
+
+    def test_fsync_failure(self):
+        print("\n🗳️ Testing fsync failure in the ballot log...")
+        written = []
+        real_write = ballot_log.write_sharded_ballots
+        ballot_log.write_sharded_ballots = lambda records: written.extend(records) or len(records)
+        loop = asyncio.new_event_loop()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                log = BallotLog(directory)
+                log._segment = 1
+                log._file = log._open_segment()
+
+                before = [self.ballot()]
+                failed = [self.ballot(), self.ballot(), self.ballot()]
+                after = [self.ballot()]
+                self.sync(log, loop, before)
+                failed_futures = self.sync(log, loop, failed, fail_fsync=True)
+                after_futures = self.sync(log, loop, after)
+
+                self.check(
+                    "el grupo con fsync fallido se rechaza al votante",
+                    all(future.done() and isinstance(future.exception(), OSError) for future in failed_futures)
+                )
+                self.check(
+                    "el grupo siguiente se confirma",
+                    all(future.done() and future.exception() is None for future in after_futures)
+                )
+                pending_ids = [record["id"] for record, _, _ in log._pending]
+                expected = [record["id"] for record in before + after]
+                self.check("el escritor solo recibe los votos confirmados", pending_ids == expected, str(pending_ids))
+
+                # Reinicio sin que el escritor haya llegado a `votos`
+                log._file.close()
+                BallotLog(directory).replay()
+                replayed = [record["id"] for record in written]
+                self.check("la reproducción del log no incluye los votos rechazados", replayed == expected, str(replayed))
+        finally:
+            ballot_log.write_sharded_ballots = real_write
+            loop.close()
+
+    def run_all_tests(self):
+        self.test_fsync_failure()
+        self.generate_report()
+        return not self.failures
+
+    def generate_report(self):
+        """Genera reporte de resultados"""
+        print("\n" + "=" * 60)
+        print("🗳️ BALLOT LOG TESTING REPORT")
+        print("=" * 60)
+        print(f"\n   Passed: {self.passed}")
+        print(f"   Failed: {len(self.failures)}")
+        for title, evidence in self.failures:
+            print(f"\n   {title}")
+            if evidence:
+                print(f"   Evidence: {evidence}")
+
+if __name__ == "__main__":
+    print("🗳️ Urna Virtual - Ballot Log Testing")
+    print("=" * 50)
+
+    tester = BallotLogTester()
+    sys.exit(0 if tester.run_all_tests() else 1)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Pruebas de poda de particiones en PostgreSQL
+Urna Virtual - Sistema de Votación Electrónica
+
+Para cada consulta por elección que ejecuta el backend (escrutinio, sellado
+de bloques, participación, elegibilidad) obtiene su plan con
+``EXPLAIN (FORMAT JSON)`` y falla si recorre particiones de otras elecciones
+o la DEFAULT, o si no recorre la de la propia elección.
+
+Crea particiones para dos elecciones ficticias dentro de una transacción que
+se deshace al terminar: no modifica la base de datos.
+
+Uso (DATABASE_URL apuntando a un PostgreSQL ya particionado):
+    python tests/partition_pruning_tests.py
+"""
+
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from sqlalchemy import func, select, text, update
+
+from src.database.database import engine
+from src.models.models import VotanteEleccion, Vote
+from src.services.partitions import PARTITIONED_TABLES, partition_name
+
+def plan_relations(node, relations=None) -> set:
+    """Relation names scanned anywhere in a JSON plan node"""
+    relations = set() if relations is None else relations
+    if "Relation Name" in node:
+        relations.add(node["Relation Name"])
+    for child in node.get("Plans", []):
+        plan_relations(child, relations)
+    return relations
+
+def pruning_queries(election_id: uuid.UUID):
+    """(description, table, statement) of the per-election queries"""
+    voter_id = uuid.uuid4()
+    return [
+        ("Escrutinio: total de votos", Vote.__tablename__,
+         select(func.count(Vote.id)).where(Vote.eleccion_id == election_id)),
+        ("Escrutinio: votos cifrados", Vote.__tablename__,
+         select(Vote.voto_cifrado).where(Vote.eleccion_id == election_id)),
+        ("Sellado: votos pendientes", Vote.__tablename__,
+         select(Vote.id, Vote.voto_cifrado, Vote.firma_digital, Vote.timestamp).where(
+             Vote.eleccion_id == election_id, Vote.bloque_id.is_(None)
+         ).order_by(Vote.timestamp, Vote.id).limit(500)),
+        ("Sellado: asignar bloque", Vote.__tablename__,
+         update(Vote).where(
+             Vote.eleccion_id == election_id, Vote.id.in_([uuid.uuid4()]), Vote.bloque_id.is_(None)
+         ).values(bloque_id=uuid.uuid4())),
+        ("Participación", VotanteEleccion.__tablename__,
+         select(func.count()).select_from(VotanteEleccion).where(
+             VotanteEleccion.eleccion_id == election_id, VotanteEleccion.ha_votado.is_(True)
+         )),
+        ("Elegibilidad del votante", VotanteEleccion.__tablename__,
+         select(VotanteEleccion).where(
+             VotanteEleccion.eleccion_id == election_id, VotanteEleccion.votante_id == voter_id
+         )),
+    ]
+
+class PartitionPruningTester:
+    def __init__(self):
+        self.failures = []
+        self.passed = 0
+
+    def check(self, title, condition, evidence=""):
+        """Registra el resultado de una comprobación"""
+        if condition:
+            self.passed += 1
+            print(f"   ✅ {title}")
+        else:
+            self.failures.append((title, evidence))
+            print(f"   ❌ {title}")
+            if evidence:
+                print(f"      Evidence: {evidence}")
+
+    def test_pruning(self, conn):
+        print("\n🗂️ Testing partition pruning...")
+        election_id, other_id = uuid.uuid4(), uuid.uuid4()
+        for table in PARTITIONED_TABLES:
+            for eid in (election_id, other_id):
+                conn.execute(text(
+                    f'CREATE TABLE "{partition_name(table, eid)}" PARTITION OF {table} FOR VALUES IN (\'{eid}\')'
+                ))
+
+        for description, table, statement in pruning_queries(election_id):
+            sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+            plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+            scanned = {name for name in plan_relations(plan[0]["Plan"]) if name.startswith(f"{table}_")}
+            own = partition_name(table, election_id)
+            others = sorted(scanned - {own})
+
+            self.check(
+                f"{description}: no recorre particiones de otras elecciones ni la DEFAULT",
+                not others, f"recorre {', '.join(others)}"
+            )
+            self.check(f"{description}: recorre {own}", own in scanned, f"recorre {', '.join(sorted(scanned)) or 'ninguna partición'}")
+
+    def run_all_tests(self):
+        if engine.dialect.name != "postgresql":
+            self.failures.append(("Requiere PostgreSQL", f"DATABASE_URL usa {engine.dialect.name}"))
+            print("\n❌ Requiere PostgreSQL (DATABASE_URL)")
+        else:
+            with engine.connect() as conn:
+                transaction = conn.begin()
+                try:
+                    self.test_pruning(conn)
+                finally:
+                    transaction.rollback()
+        self.generate_report()
+        return not self.failures
+
+    def generate_report(self):
+        """Genera reporte de resultados"""
+        print("\n" + "=" * 60)
+        print("🗂️ PARTITION PRUNING REPORT")
+        print("=" * 60)
+        print(f"\n   Passed: {self.passed}")
+        print(f"   Failed: {len(self.failures)}")
+        for title, evidence in self.failures:
+            print(f"\n   {title}")
+            if evidence:
+                print(f"   Evidence: {evidence}")
+
+if __name__ == "__main__":
+    print("🗂️ Urna Virtual - Partition Pruning Testing")
+    print("=" * 50)
+
+    tester = PartitionPruningTester()
+    sys.exit(0 if tester.run_all_tests() else 1)
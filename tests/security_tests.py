@@ -4,6 +4,7 @@ Script de Pruebas de Penetración y Seguridad Avanzada
 Urna Virtual - Sistema de Votación Electrónica
 """
 
+import os
 import requests
 import json
 import time
@@ -330,6 +331,59 @@ class SecurityTester:
         except Exception as e:
             print(f"   ⚠️ Business logic testing failed: {e}")
     
+    def test_double_vote_race(self):
+        """Pruebas de doble voto concurrente"""
+        print("\n🗳️ Testing Concurrent Double Voting...")
+        
+        # Requiere un votante registrado que aún no haya votado en una elección ACTIVA
+        voter_email = os.getenv("RACE_VOTER_EMAIL")
+        voter_password = os.getenv("RACE_VOTER_PASSWORD")
+        election_id = os.getenv("RACE_ELECTION_ID")
+        candidate_id = os.getenv("RACE_CANDIDATE_ID")
+        attempts = int(os.getenv("RACE_ATTEMPTS", "50"))
+        
+        if not all([voter_email, voter_password, election_id, candidate_id]):
+            print("   ℹ️ Set RACE_VOTER_EMAIL, RACE_VOTER_PASSWORD, RACE_ELECTION_ID and RACE_CANDIDATE_ID to run")
+            return
+        
+        try:
+            response = self.session.post(
+                urljoin(self.base_url, "/api/v1/auth/login"),
+                json={"email": voter_email, "password": voter_password}
+            )
+            if response.status_code != 200:
+                print(f"   ⚠️ Voter login failed: {response.status_code}")
+                return
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            
+            # Release all requests at once to maximize overlap
+            barrier = threading.Barrier(attempts)
+            
+            def cast(_):
+                barrier.wait()
+                return requests.post(
+                    urljoin(self.base_url, "/api/v1/votos/"),
+                    json={"eleccion_id": election_id, "candidatos_seleccionados": [candidate_id]},
+                    headers=headers
+                ).status_code
+            
+            with ThreadPoolExecutor(max_workers=attempts) as executor:
+                status_codes = list(executor.map(cast, range(attempts)))
+            
+            accepted = status_codes.count(200)
+            print(f"   {attempts} concurrent votes: {accepted} accepted, {status_codes.count(400)} rejected")
+            
+            if accepted > 1:
+                self.log_vulnerability(
+                    "critical",
+                    "Double Voting Race Condition",
+                    "The same voter cast several votes with concurrent requests",
+                    f"{accepted} of {attempts} concurrent votes were accepted"
+                )
+                
+        except Exception as e:
+            print(f"   ⚠️ Double vote testing failed: {e}")
+    
     def test_security_headers(self):
         """Pruebas de headers de seguridad"""
         print("\n📋 Testing Security Headers...")
@@ -394,6 +448,7 @@ class SecurityTester:
             self.test_rate_limiting,
             self.test_session_management,
             self.test_business_logic,
+            self.test_double_vote_race,
             self.test_security_headers,
             self.test_file_upload_vulnerabilities
         ]
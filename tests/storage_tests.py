@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los backends de almacenamiento de medios
+Urna Virtual - Sistema de Votación Electrónica
+
+Sube, lee, firma (URL) y borra un objeto con cada backend de
+src/services/storage.py: el local y el S3 contra S3_ENDPOINT_URL (MinIO).
+El bucket AWS_BUCKET_NAME se crea si no existe.
+
+Uso:
+    docker run -p 9000:9000 -e MINIO_ROOT_USER=minio -e MINIO_ROOT_PASSWORD=minio123 minio/minio server /data
+    S3_ENDPOINT_URL=http://localhost:9000 AWS_ACCESS_KEY_ID=minio AWS_SECRET_ACCESS_KEY=minio123 \\
+        python tests/storage_tests.py
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, unquote, urlparse
+from urllib.request import urlopen
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from src.services.storage import (
+    MEDIA_URL_PREFIX, LocalStorage, S3Storage, StorageError, create_storage, new_media_key, verify_media_signature
+)
+
+class StorageTester:
+    def __init__(self):
+        self.failures = []
+        self.passed = 0
+
+    def check(self, backend_name, title, condition, evidence=""):
+        """Registra el resultado de una comprobación"""
+        if condition:
+            self.passed += 1
+            print(f"   ✅ {title}")
+        else:
+            self.failures.append((backend_name, title, evidence))
+            print(f"   ❌ {title}")
+            if evidence:
+                print(f"      Evidence: {evidence}")
+
+    def round_trip(self, name, storage, fetch_url):
+        """put / get / url / delete de un objeto"""
+        print(f"\n📦 Testing {name} storage...")
+        key = new_media_key("storage-tests", ".jpg")
+        content = os.urandom(200 * 1024) + b"urna-virtual"
+
+        storage.save(key, io.BytesIO(content), "image/jpeg")
+        self.check(name, "save: el objeto existe", storage.exists(key))
+
+        stored = b"".join(storage.open(key))
+        self.check(name, "open: devuelve el mismo contenido", stored == content, f"{len(stored)} de {len(content)} bytes")
+
+        url = storage.url(key, expires_in=60)
+        fetched = fetch_url(key, url)
+        self.check(name, "url: descarga el mismo contenido", fetched == content, url)
+
+        storage.delete(key)
+        self.check(name, "delete: el objeto ya no existe", not storage.exists(key))
+        try:
+            b"".join(storage.open(key))
+            self.check(name, "open de un objeto borrado falla con StorageError", False)
+        except StorageError:
+            self.check(name, "open de un objeto borrado falla con StorageError", True)
+
+        # Borrar dos veces no es un error
+        storage.delete(key)
+
+    def test_local(self):
+        with tempfile.TemporaryDirectory() as directory:
+            storage = LocalStorage(directory)
+
+            def fetch_url(key, url):
+                # Sirve la URL firmada como lo hace /api/v1/media
+                parsed = urlparse(url)
+                query = parse_qs(parsed.query)
+                if unquote(parsed.path) != f"{MEDIA_URL_PREFIX}/{key}":
+                    return None
+                if not verify_media_signature(key, int(query["expires"][0]), query["signature"][0]):
+                    return None
+                return b"".join(storage.open(key))
+
+            self.round_trip("local", storage, fetch_url)
+
+    def test_s3(self):
+        if not os.getenv("S3_ENDPOINT_URL"):
+            self.failures.append(("s3", "S3_ENDPOINT_URL no está configurado", "apúntalo a un MinIO de pruebas"))
+            print("\n❌ S3_ENDPOINT_URL no está configurado")
+            return
+
+        storage = create_storage("s3")
+        assert isinstance(storage, S3Storage)
+        try:
+            storage.client.head_bucket(Bucket=storage.bucket)
+        except storage._client_error:
+            storage.client.create_bucket(Bucket=storage.bucket)
+
+        def fetch_url(key, url):
+            # URL prefirmada: se descarga sin credenciales
+            try:
+                with urlopen(url, timeout=10) as response:
+                    return response.read()
+            except HTTPError:
+                return None
+
+        self.round_trip("s3", storage, fetch_url)
+
+    def run_all_tests(self):
+        start = time.time()
+        self.test_local()
+        self.test_s3()
+        self.generate_report(time.time() - start)
+        return not self.failures
+
+    def generate_report(self, seconds):
+        """Genera reporte de resultados"""
+        print("\n" + "=" * 60)
+        print("📦 STORAGE TESTING REPORT")
+        print("=" * 60)
+        print(f"\n   Passed: {self.passed}")
+        print(f"   Failed: {len(self.failures)}")
+        print(f"   Time:   {seconds:.2f}s")
+        for backend_name, title, evidence in self.failures:
+            print(f"\n   [{backend_name}] {title}")
+            if evidence:
+                print(f"   Evidence: {evidence}")
+
+if __name__ == "__main__":
+    print("📦 Urna Virtual - Storage Backend Testing")
+    print("=" * 50)
+
+    tester = StorageTester()
+    sys.exit(0 if tester.run_all_tests() else 1)